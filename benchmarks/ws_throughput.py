@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Synthetic websocket throughput benchmark
+
+Generates realistic frames for every message type in utils.WS_MSG_TYPES and drives
+them through Bfxwss with a stubbed send_to_users, no network is used.
+
+    python benchmarks/ws_throughput.py --frames 100000
+    python benchmarks/ws_throughput.py --mix pu=20,wu=10,ou=10,default=1 --rate 2000
+    python benchmarks/ws_throughput.py --allocations
+"""
+
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bfxtelegram import utils  # noqa: E402
+from bfxtelegram.bfxwss import Bfxwss  # noqa: E402
+
+SYMBOLS = ['tIOTUSD', 'tBTCUSD', 'tETHUSD', 'tIOTBTC']
+FUNDING_SYMBOLS = ['fUSD', 'fBTC', 'fIOT']
+# number of distinct orders/positions/offers the frames refer to
+ENTITIES = 50
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+def order(status="ACTIVE"):
+    amount = random.choice([-1, 1]) * round(random.uniform(1, 1000), 2)
+    return [
+        random.randint(1, ENTITIES), None, now_ms(), random.choice(SYMBOLS), now_ms(), now_ms(),
+        amount, amount, 'EXCHANGE LIMIT', None, None, None, 0, status, None, None,
+        round(random.uniform(0.4, 0.6), 5), 0, 0, 0, None, None, None, 0, 0, None
+    ]
+
+
+def position():
+    return [
+        random.choice(SYMBOLS), 'ACTIVE', round(random.uniform(-1000, 1000), 2), 0.5378,
+        0.12, 0, round(random.uniform(-50, 50), 4), 1.2, 0.31, 3.3
+    ]
+
+
+def wallet():
+    return [random.choice(['exchange', 'margin', 'funding']), random.choice(['USD', 'BTC', 'IOT']),
+            round(random.uniform(0, 10000), 8), 0, None]
+
+
+def trade():
+    return [random.randint(1, 10 ** 9), random.choice(SYMBOLS), now_ms(), random.randint(1, ENTITIES),
+            round(random.uniform(-100, 100), 2), 0.5378, 'EXCHANGE LIMIT', 0.5378, 1, -0.1, 'USD']
+
+
+def funding_offer():
+    return [random.randint(1, ENTITIES), random.choice(FUNDING_SYMBOLS), now_ms(), now_ms(),
+            round(random.uniform(50, 5000), 2), 5000, 'lend', None, None, 0, 'ACTIVE',
+            None, None, None, round(random.uniform(0.0001, 0.001), 6), 2, 0, 0, None, 0, None]
+
+
+def funding_credit():
+    return [random.randint(1, ENTITIES), random.choice(FUNDING_SYMBOLS), 1, now_ms(), now_ms(),
+            round(random.uniform(50, 5000), 2), 0, 'ACTIVE', None, None, None,
+            round(random.uniform(0.0001, 0.001), 6), 2, now_ms(), now_ms(), 0, 0, None, 0, None,
+            0, random.choice(SYMBOLS)]
+
+
+def funding_trade():
+    return [random.randint(1, 10 ** 9), random.choice(FUNDING_SYMBOLS), now_ms(),
+            random.randint(1, ENTITIES), 100, 0.0003, 2, 1]
+
+
+def notification(inner_type, data, text="Submitting exchange limit buy order for 100 IOT."):
+    return [now_ms(), inner_type, None, None, data, None, 'SUCCESS', text]
+
+
+def snapshot(factory, size=20):
+    return [factory() for _ in range(size)]
+
+
+FRAME_FACTORIES = {
+    'bu': lambda: [0, 'bu', [12000.5, 11000.2]],
+    'ps': lambda: [0, 'ps', snapshot(position, 5)],
+    'pn': lambda: [0, 'pn', position()],
+    'pu': lambda: [0, 'pu', position()],
+    'pc': lambda: [0, 'pc', position()],
+    'ws': lambda: [0, 'ws', snapshot(wallet, 10)],
+    'wu': lambda: [0, 'wu', wallet()],
+    'os': lambda: [0, 'os', snapshot(order)],
+    'on': lambda: [0, 'on', order()],
+    'on-req': lambda: [0, 'n', notification('on-req', order())],
+    'ou': lambda: [0, 'ou', order()],
+    'oc': lambda: [0, 'oc', order(random.choice(["CANCELED", "EXECUTED @ 0.5378(100.0)"]))],
+    'oc-req': lambda: [0, 'n', notification('oc-req', order(), "Submitted for cancellation")],
+    'oc_multi-req': lambda: [0, 'n', notification('oc_multi-req', snapshot(order, 3))],
+    'te': lambda: [0, 'te', trade()],
+    'tu': lambda: [0, 'tu', trade()],
+    'fte': lambda: [0, 'fte', funding_trade()],
+    'ftu': lambda: [0, 'ftu', funding_trade()],
+    'hos': lambda: [0, 'hos', snapshot(order)],
+    'mis': lambda: [0, 'mis', ['base', [-12.5, 0.3, 15000.2, 14000.1]]],
+    'miu': lambda: [0, 'miu', ['base', [-12.5, 0.3, 15000.2, 14000.1]]],
+    'n': lambda: [0, 'n', notification('info', None, "Websocket test notification")],
+    'fos': lambda: [0, 'fos', snapshot(funding_offer)],
+    'fon': lambda: [0, 'fon', funding_offer()],
+    'fou': lambda: [0, 'fou', funding_offer()],
+    'foc': lambda: [0, 'foc', funding_offer()],
+    'hfos': lambda: [0, 'hfos', snapshot(funding_offer)],
+    'fcs': lambda: [0, 'fcs', snapshot(funding_credit)],
+    'fcn': lambda: [0, 'fcn', funding_credit()],
+    'fcu': lambda: [0, 'fcu', funding_credit()],
+    'fcc': lambda: [0, 'fcc', funding_credit()],
+    'hfcs': lambda: [0, 'hfcs', snapshot(funding_credit)],
+    'fls': lambda: [0, 'fls', snapshot(lambda: funding_credit()[:-1])],
+    'fln': lambda: [0, 'fln', funding_credit()[:-1]],
+    'flu': lambda: [0, 'flu', funding_credit()[:-1]],
+    'flc': lambda: [0, 'flc', funding_credit()[:-1]],
+    'hfls': lambda: [0, 'hfls', snapshot(lambda: funding_credit()[:-1])],
+    'hfts': lambda: [0, 'hfts', snapshot(funding_trade)],
+    'hb': lambda: [0, 'hb'],
+    'uca': lambda: [0, 'n', notification(
+        'uca', ['price:tIOTUSD:0.55', 'price', 'tIOTUSD', 0.55, 99, 1], "price alert")],
+    'ou-req': lambda: [0, 'n', notification('ou-req', order(), "Submitting update to order")],
+    'wallet_transfer': lambda: [0, 'n', notification(
+        'wallet_transfer', None, "100 USD transfered from Exchange to Margin")],
+}
+
+
+def parse_mix(mix):
+    """
+        "pu=20,wu=10,default=1" -> weight per message type, default applies to all other types
+    """
+    weights = {}
+    for item in mix.split(','):
+        mtype, weight = item.split('=')
+        weights[mtype] = float(weight)
+    default = weights.pop('default', 1.0 if not weights else 0.0)
+    return {mtype: weights.get(mtype, default) for mtype in utils.WS_MSG_TYPES}
+
+
+def generate(count, weights):
+    types = [mtype for mtype, weight in weights.items() if weight > 0]
+    chosen = random.choices(types, weights=[weights[mtype] for mtype in types], k=count)
+    return [(mtype, FRAME_FACTORIES[mtype]()) for mtype in chosen]
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run(frames, coalesce_window, rate):
+    sent = []
+
+    def send_to_users(mtype, message, key=None):
+        sent.append(mtype)
+
+    wss = Bfxwss(send_to_users, coalesce_window=coalesce_window, autostart=False)
+    latencies = {}
+    started = time.perf_counter()
+    for index, (mtype, frame) in enumerate(frames):
+        if rate:
+            delay = started + index / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        frame_start = time.perf_counter()
+        wss._auth_messages(frame)
+        latencies.setdefault(mtype, []).append(time.perf_counter() - frame_start)
+    elapsed = time.perf_counter() - started
+    return latencies, elapsed, len(sent)
+
+
+def measure_allocations(frames, coalesce_window):
+    """
+        memory of every frame measured around its handler with tracemalloc :
+        transient, the highest traced memory above the level before the frame,
+        retained, the traced memory still allocated after it.
+        returns {mtype: (mean transient bytes, mean retained bytes)}.
+        CPython counts allocations only in debug builds, these are byte amounts
+    """
+    wss = Bfxwss(lambda mtype, message, key=None: None, coalesce_window=coalesce_window,
+                 autostart=False)
+    measured = {}
+    tracemalloc.start()
+    for mtype, frame in frames:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        wss._auth_messages(frame)
+        current, peak = tracemalloc.get_traced_memory()
+        measured.setdefault(mtype, []).append((peak - before, current - before))
+    tracemalloc.stop()
+    return {
+        mtype: (sum(peak for peak, _retained in values) / len(values),
+                sum(retained for _peak, retained in values) / len(values))
+        for mtype, values in measured.items()
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="websocket dispatch and formatting throughput")
+    parser.add_argument("--frames", type=int, default=50000, help="number of frames to generate")
+    parser.add_argument("--mix", default="default=1",
+                        help="weights per message type, e.g. pu=20,wu=10,default=1")
+    parser.add_argument("--rate", type=float, default=0,
+                        help="frames per second to feed, 0 feeds as fast as possible")
+    parser.add_argument("--coalesce-window", type=float, default=0,
+                        help="Bfxwss coalescing window in seconds")
+    parser.add_argument("--allocations", action="store_true",
+                        help="also measure transient and retained memory per frame (slower)")
+    parser.add_argument("--log", action="store_true",
+                        help="keep logging enabled, it is disabled to measure the handlers only")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    if not args.log:
+        logging.disable(logging.CRITICAL)
+
+    random.seed(args.seed)
+    frames = generate(args.frames, parse_mix(args.mix))
+    latencies, elapsed, messages = run(frames, args.coalesce_window, args.rate)
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    print(f"{len(frames)} frames -> {messages} messages in {elapsed:.3f}s")
+    print(f"throughput : {len(frames) / elapsed:.0f} frames/s")
+    print(f"latency    : p50 {percentile(all_latencies, 0.5) * 1e6:.1f}us "
+          f"p99 {percentile(all_latencies, 0.99) * 1e6:.1f}us")
+    print(f"\n{'type':<16}{'frames':>8}{'p50 us':>10}{'p99 us':>10}")
+    for mtype in sorted(latencies):
+        values = latencies[mtype]
+        print(f"{mtype:<16}{len(values):>8}"
+              f"{percentile(values, 0.5) * 1e6:>10.1f}{percentile(values, 0.99) * 1e6:>10.1f}")
+
+    if args.allocations:
+        measured = measure_allocations(frames, args.coalesce_window)
+        counts = {mtype: len(values) for mtype, values in latencies.items()}
+        total = sum(counts.values())
+        transient = sum(measured[mtype][0] * counts[mtype] for mtype in measured) / total
+        retained = sum(measured[mtype][1] * counts[mtype] for mtype in measured) / total
+        print(f"\nmemory per frame : {transient:.0f} bytes transient, {retained:.0f} bytes retained")
+        print(f"\n{'type':<16}{'transient':>10}{'retained':>10}")
+        for mtype in sorted(measured):
+            print(f"{mtype:<16}{measured[mtype][0]:>10.0f}{measured[mtype][1]:>10.0f}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -29,15 +29,34 @@ __version__ = "1.0.0"
 __license__ = "MIT"
 
 import os
-from bfxtelegram.btfxbot import Btfxbot
+from bfxtelegram import aio
 
 
 def main():
+    mode = os.environ.get('BOT_MODE', "polling")
+    if mode == "asyncio":
+        # before the websocket client imports the default twisted reactor
+        aio.install_reactor()
+    from bfxtelegram import utils
+    from bfxtelegram.btfxbot import Btfxbot
+    from bfxtelegram.accounts import read_accounts
     Btfxbot(
         os.environ.get('TELEGRAM_TOKEN'),
         os.environ.get('AUTH_PASS'),
         os.environ.get('BFX_API_KEY'),
-        os.environ.get('BFX_API_SECRET')
+        os.environ.get('BFX_API_SECRET'),
+        coalesce_window=float(os.environ.get('COALESCE_WINDOW', 1.0)),
+        live_interval=float(os.environ.get('LIVE_PANEL_INTERVAL', 3.0)),
+        record_file=os.environ.get('WS_RECORD_FILE'),
+        accounts=read_accounts(os.environ),
+        admin_chats=[int(chat_id) for chat_id in os.environ.get('ADMIN_CHAT_IDS', "").split()],
+        metrics_port=int(os.environ.get('METRICS_PORT', 0)),
+        outbox_file=os.environ.get('OUTBOX_FILE', utils.OUTBOX_FILE),
+        mode=mode,
+        webhook_url=os.environ.get('WEBHOOK_URL'),
+        webhook_port=int(os.environ.get('WEBHOOK_PORT', 8443)),
+        webhook_secret=os.environ.get('WEBHOOK_SECRET'),
+        users_file=os.environ.get('USERS_FILE', utils.USERS_FILE)
     )
 
 
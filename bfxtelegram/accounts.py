@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Bitfinex accounts hosted by one bot process
+"""
+
+import functools
+
+from bfxtelegram.bfxwss import Bfxwss
+from bfxtelegram.readiness import READINESS
+from bfxtelegram.rest import (TimedClient, CachedClient, ScheduledClient, PooledClient,
+                              PooledClient2, REST_CACHE, INVALIDATES)
+
+# account configured with BFX_API_KEY / BFX_API_SECRET, chats use it unless /set accounts
+DEFAULT_ACCOUNT = "main"
+
+
+def read_accounts(environ):
+    """
+        Extra accounts are listed in BFX_ACCOUNTS="sub1 sub2" with their credentials
+        in BFX_API_KEY_SUB1 / BFX_API_SECRET_SUB1
+        returns a dictionary name -> (key, secret)
+    """
+    accounts = {}
+    for name in environ.get('BFX_ACCOUNTS', "").replace(",", " ").split():
+        name = name.lower()
+        if name == DEFAULT_ACCOUNT:
+            continue
+        key = environ.get(f"BFX_API_KEY_{name.upper()}")
+        secret = environ.get(f"BFX_API_SECRET_{name.upper()}")
+        if not key or not secret:
+            raise ValueError(f"missing BFX_API_KEY_{name.upper()} or BFX_API_SECRET_{name.upper()}")
+        accounts[name] = (key, secret)
+    return accounts
+
+
+class Account:
+    """
+        Rest clients and authenticated socket of one account.
+        send_to_users and order_reply receive the account name,
+        market_data is shared by all accounts. The socket is opened by start(),
+        its authentication is the readiness stage "websocket <name>"
+    """
+    def __init__(self, name, key, secret, send_to_users, market_data=None, coalesce_window=1.0,
+                 recorder=None, order_reply=None):
+        self.name = name
+        # cache hits skip the scheduler, the rest timings exclude the scheduler wait
+        self.btfx_client = CachedClient(
+            ScheduledClient(TimedClient(PooledClient(key, secret)), name), "v1", name
+        )
+        self.btfx_client2 = CachedClient(
+            ScheduledClient(TimedClient(PooledClient2(key, secret)), name), "v2", name
+        )
+        self.btfxwss = Bfxwss(
+            functools.partial(send_to_users, account=name),
+            key=key,
+            secret=secret,
+            coalesce_window=coalesce_window,
+            market_data=market_data,
+            recorder=recorder,
+            order_reply=functools.partial(order_reply, account=name) if order_reply else None,
+            account_changed=self.account_changed,
+            auth_changed=self.auth_changed,
+            autostart=False
+        )
+        self.stage = f"websocket {name}"
+        READINESS.add(self.stage)
+
+    def start(self):
+        self.btfxwss.connect()
+
+    def stop(self):
+        self.btfxwss.stop()
+
+    @property
+    def connected(self):
+        """
+            True once the socket is authenticated, orders and funding need it
+        """
+        return READINESS.is_ready(self.stage)
+
+    def auth_changed(self, state, detail=None):
+        READINESS.set(self.stage, state, detail)
+
+    def account_changed(self, msg_type):
+        """
+            called by the socket for every message, drops the cached rest state it changes
+        """
+        endpoints = INVALIDATES.get(msg_type)
+        if endpoints:
+            REST_CACHE.invalidate(self.name, endpoints)
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Asyncio mode : telegram updates, telegram http calls and the websocket share one event
+loop, the twisted reactor of the websocket client runs on it
+"""
+
+import json
+import signal
+import asyncio
+import logging
+import functools
+import threading
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from twisted.web.client import Agent, HTTPConnectionPool, FileBodyProducer, readBody
+from twisted.web.http_headers import Headers
+from telegram import Update
+from telegram.error import (TelegramError, NetworkError, TimedOut, BadRequest, Unauthorized,
+                            RetryAfter, ChatMigrated)
+from bfxtelegram import utils
+from bfxtelegram.stats import STATS
+
+# Enable logging
+logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                    level=logging.ERROR)
+LOGGER = logging.getLogger(__name__)
+
+# seconds of a telegram request, long polls add their own timeout
+TIMEOUT = 10
+# long poll timeout of getUpdates
+POLL_TIMEOUT = 60
+# persistent connections kept per host
+MAX_PER_HOST = 100
+# threads running the commands without a native coroutine and the cpu heavy work
+EXECUTOR_WORKERS = 8
+TELEGRAM_URL = "https://api.telegram.org"
+
+
+def install_reactor():
+    """
+        makes twisted, and so the bitfinex websocket, run on a new asyncio loop.
+        Must be called before anything imports twisted.internet.reactor,
+        returns the loop
+    """
+    from twisted.internet import asyncioreactor
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    asyncioreactor.install(loop)
+    return loop
+
+
+class AsyncHttp:
+    """
+        Non blocking http client over a pool of keep alive connections,
+        request returns (status code, body bytes)
+    """
+    def __init__(self, reactor, loop, max_per_host=MAX_PER_HOST):
+        self.reactor = reactor
+        self.loop = loop
+        pool = HTTPConnectionPool(reactor, persistent=True)
+        pool.maxPersistentPerHost = max_per_host
+        self.agent = Agent(reactor, connectTimeout=TIMEOUT, pool=pool)
+
+    async def request(self, method, url, headers=None, body=None, timeout=TIMEOUT):
+        request_headers = Headers({name: [value] for name, value in (headers or {}).items()})
+        producer = FileBodyProducer(BytesIO(body)) if body is not None else None
+        deferred = self.agent.request(method.encode(), url.encode(), request_headers, producer)
+        deferred.addCallback(self._read)
+        # cancelling the future on timeout cancels the request
+        return await asyncio.wait_for(deferred.asFuture(self.loop), timeout)
+
+    @staticmethod
+    def _read(response):
+        return readBody(response).addCallback(lambda body: (response.code, body))
+
+
+class AsyncTelegram:
+    """
+        Bot api calls with the errors of python-telegram-bot,
+        so Delivery handles them the same way in both modes
+    """
+    def __init__(self, token, http):
+        self.url = f"{TELEGRAM_URL}/bot{token}"
+        self.http = http
+
+    async def call(self, method, request_timeout=TIMEOUT, **params):
+        params = {name: value for name, value in params.items() if value is not None}
+        try:
+            status, body = await self.http.request(
+                "POST",
+                f"{self.url}/{method}",
+                {"Content-Type": "application/json"},
+                json.dumps(params).encode(),
+                timeout=request_timeout
+            )
+        except asyncio.TimeoutError:
+            raise TimedOut()
+        except Exception as error:
+            raise NetworkError(str(error))
+        return self.parse(status, body)
+
+    @staticmethod
+    def parse(status, body):
+        try:
+            data = json.loads(body.decode())
+        except ValueError:
+            raise NetworkError(f"invalid server response, status {status}")
+        if data.get("ok"):
+            return data["result"]
+        description = data.get("description", f"status {status}")
+        parameters = data.get("parameters", {})
+        if "retry_after" in parameters:
+            raise RetryAfter(parameters["retry_after"])
+        if "migrate_to_chat_id" in parameters:
+            raise ChatMigrated(parameters["migrate_to_chat_id"])
+        if status in (401, 403):
+            raise Unauthorized(description)
+        if status == 400:
+            raise BadRequest(description)
+        raise NetworkError(description)
+
+    async def get_updates(self, offset=None, timeout=POLL_TIMEOUT):
+        return await self.call("getUpdates", request_timeout=timeout + TIMEOUT, offset=offset,
+                               timeout=timeout)
+
+    async def send_message(self, chat_id, text, parse_mode='HTML', reply_markup=None):
+        return await self.call("sendMessage", chat_id=chat_id, text=text, parse_mode=parse_mode,
+                               reply_markup=reply_markup)
+
+
+def parse_command(data):
+    """
+        returns (command, args) of a text message starting with /, (None, None) otherwise
+    """
+    text = (data.get("message") or {}).get("text") or ""
+    if not text.startswith("/"):
+        return None, None
+    words = text.split()
+    # /ticker@botname in groups
+    command = words[0][1:].split("@")[0].lower()
+    return command, words[1:]
+
+
+class AsyncCore:
+    """
+        Long polls telegram on the loop and answers /ticker and /getbalance with non blocking
+        telegram calls, as many at once as there are updates. Their bitfinex calls go through
+        the rest clients of the account in the executor, so they share the cache, the scheduler
+        and the pooled connections of the other commands. Every other update is handled by the
+        python-telegram-bot dispatcher in the executor, like graph rendering
+    """
+    def __init__(self, bot, dispatcher, loop=None, http=None, executor_workers=EXECUTOR_WORKERS):
+        self.bot = bot
+        self.dispatcher = dispatcher
+        self.loop = loop or asyncio.get_event_loop()
+        if http is None:
+            from twisted.internet import reactor
+            http = AsyncHttp(reactor, self.loop)
+        self.telegram = AsyncTelegram(bot.tbot.token, http)
+        self.executor = ThreadPoolExecutor(executor_workers, thread_name_prefix="executor")
+        self.commands = {
+            "ticker": self.cmd_ticker,
+            "getbalance": self.cmd_get_balance,
+        }
+        # running handlers, the loop only keeps weak references to tasks
+        self.tasks = set()
+        self.stopped = threading.Event()
+        self.polling = None
+
+    def run(self):
+        """
+            starts polling and blocks until SIGINT or SIGTERM
+        """
+        self.polling = asyncio.run_coroutine_threadsafe(self.poll(), self.loop)
+        # the websocket client thread runs the reactor, and so the loop
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda _signum, _frame: self.stopped.set())
+        while not self.stopped.wait(1):
+            pass
+
+    def stop(self):
+        """
+            cancels the long poll and ends the executor, the loop itself stops with the reactor
+        """
+        self.stopped.set()
+        if self.polling is not None:
+            self.polling.cancel()
+        self.executor.shutdown(wait=False)
+
+    def send_message(self, chat_id, text):
+        """
+            blocking send for the delivery threads
+        """
+        future = asyncio.run_coroutine_threadsafe(
+            self.telegram.send_message(chat_id, text), self.loop
+        )
+        return future.result()
+
+    async def poll(self):
+        offset = None
+        while not self.stopped.is_set():
+            try:
+                updates = await self.telegram.get_updates(offset)
+            except TelegramError as error:
+                LOGGER.warning(f"getUpdates failed : {error}")
+                await asyncio.sleep(1)
+                continue
+            for data in updates:
+                offset = data["update_id"] + 1
+                self.spawn(self.handle(data))
+
+    def spawn(self, coroutine):
+        task = self.loop.create_task(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def handle(self, data):
+        command, args = parse_command(data)
+        handler = self.commands.get(command)
+        try:
+            if handler is not None:
+                chat_id = data["message"]["chat"]["id"]
+                user_data = self.bot.userdata.get(chat_id, {})
+                # unauthenticated chats and wrong arguments get the dispatcher answers
+                if user_data.get('authenticated') == "yes" and await handler(chat_id, args):
+                    return
+            await self.loop.run_in_executor(self.executor, self.process_update, data)
+        except Exception:
+            STATS.increment("errors", "async handler")
+            LOGGER.exception(f"failed to handle update {data.get('update_id')}")
+
+    def rest(self, method, *args, **kwargs):
+        """
+            future of a blocking rest client call made in the executor
+        """
+        return self.loop.run_in_executor(
+            self.executor, functools.partial(method, *args, **kwargs)
+        )
+
+    def process_update(self, data):
+        self.dispatcher.process_update(Update.de_json(data, self.bot.tbot))
+
+    async def cmd_ticker(self, chat_id, args):
+        symbol = args[0] if args else self.bot.userdata[chat_id].get('defaultpair')
+        if symbol not in self.bot.btfx_symbols:
+            return False
+        with STATS.timer("/ticker"):
+            tradepair = f"t{symbol.upper()}"
+            ticker = self.bot.btfxwss.market_data.ticker(tradepair)
+            STATS.increment("cache_hits" if ticker is not None else "cache_misses", "ticker")
+            if ticker is None:
+                self.bot.btfxwss.lease('ticker', tradepair)
+                ticker = await self.rest(self.bot.account(chat_id).btfx_client2.ticker,
+                                         symbol=tradepair)
+            await self.telegram.send_message(chat_id, self.bot.format_ticker(tradepair, ticker))
+        return True
+
+    async def cmd_get_balance(self, chat_id, _args):
+        currencies = self.bot.userdata[chat_id].get('getbalance')
+        if not currencies:
+            return False
+        with STATS.timer("/getbalance"):
+            balances = await self.rest(self.bot.account(chat_id).btfx_client.balances)
+            formated_balances = utils.format_balance(currencies, balances)
+            await self.telegram.send_message(chat_id, f"<pre>{formated_balances}</pre>")
+        return True
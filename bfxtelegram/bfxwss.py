@@ -3,17 +3,36 @@
 Module Docstring
 source : https://github.com/Crypto-toolbox/btfxwss/blob/master/btfxwss/connection.py
 """
+import json
+import time
 import logging
 import threading
+import functools
 from bitfinex import WssClient
+from bfxtelegram.funding import FundingBook
+from bfxtelegram.coalescer import Coalescer
+from bfxtelegram.marketdata import MarketData
+from bfxtelegram.orderops import OrderOps
+from bfxtelegram.stats import STATS
+from bfxtelegram.readiness import STARTING, READY, FAILED
 # Enable logging
 logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
                     level=logging.ERROR)
 LOGGER = logging.getLogger(__name__)
 
+# public channels requested once stay subscribed for this many seconds
+LEASE_SECONDS = 600
+CANDLES_TIMEFRAME = '1h'
+# conf flag that adds a checksum message after every book update
+BOOK_CHECKSUM_FLAG = 131072
+# public channels subscribed on one connection, bitfinex allows 25
+MAX_CHANNELS = 25
+
 
 class Bfxwss(WssClient):
-    def __init__(self, send_to_users, key="", secret=""):
+    def __init__(self, send_to_users, key="", secret="", coalesce_window=1.0, market_data=None,
+                 recorder=None, order_reply=None, account_changed=None, auth_changed=None,
+                 autostart=True):
         self.msg_type_func = {
             'bu': self._send_bu_msg,
             'ps': self._send_ps_msg,
@@ -37,20 +56,20 @@ class Bfxwss(WssClient):
             'mis': self._send_mis_msg,
             'miu': self._send_miu_msg,
             'n': self._send_n_msg,
-            'fos': self._send_fos_msg,
-            'fon': self._send_fon_msg,
-            'fou': self._send_fou_msg,
-            'foc': self._send_foc_msg,
+            'fos': self._send_funding_msg,
+            'fon': self._send_funding_msg,
+            'fou': self._send_funding_msg,
+            'foc': self._send_funding_msg,
             'hfos': self._send_hfos_msg,
-            'fcs': self._send_fcs_msg,
-            'fcn': self._send_fcn_msg,
-            'fcu': self._send_fcu_msg,
-            'fcc': self._send_fcc_msg,
+            'fcs': self._send_funding_msg,
+            'fcn': self._send_funding_msg,
+            'fcu': self._send_funding_msg,
+            'fcc': self._send_funding_msg,
             'hfcs': self._send_hfcs_msg,
-            'fls': self._send_fls_msg,
-            'fln': self._send_fln_msg,
-            'flu': self._send_flu_msg,
-            'flc': self._send_flc_msg,
+            'fls': self._send_funding_msg,
+            'fln': self._send_funding_msg,
+            'flu': self._send_funding_msg,
+            'flc': self._send_funding_msg,
             'hfls': self._send_hfls_msg,
             'hfts': self._send_hfts_msg,
             'uca': self._send_uca_msg,
@@ -60,12 +79,64 @@ class Bfxwss(WssClient):
         }
 
         super().__init__(key=key, secret=secret)
-        self.send_to_users = send_to_users
+        # handlers deliver through _send_formatted which times the formatting
+        self.deliver = send_to_users
+        self.send_to_users = self._send_formatted
+        self.funding_book = FundingBook()
+        # pu, wu and order updates for the same entity are merged into the latest one
+        self.coalescer = Coalescer(self._send_coalesced, window=coalesce_window)
+        # public channels stay subscribed while they have references
+        self.market_data = market_data if market_data is not None else MarketData()
+        self.subscriptions = {}
+        self.subscriptions_lock = threading.Lock()
+        # the public channels share connections of up to MAX_CHANNELS channels,
+        # connection id -> set of (channel, symbol) and the reverse
+        self.public_connections = {}
+        self.channel_connections = {}
+        # connection id -> {chanId: (channel, symbol)} of the subscribed channels,
+        # a public connection is open while it is a key
+        self.channel_ids = {}
+        # connection id -> protocol whose conf was acknowledged
+        self.confirmed = {}
+        # optional FrameRecorder that logs every raw frame
+        self.recorder = recorder
+        # new, update and cancel orders sent by the bot, their replies go to
+        # order_reply(chat_id, msg_type, notification, latency) instead of every chat
+        self.order_ops = OrderOps(self._send_auth_frame, failed=self._order_failed)
+        self.order_reply = order_reply
+        # account_changed(msg_type) is called for every authenticated message
+        self.account_changed = account_changed
+        # auth_changed(state, detail) follows the authentication, starting on every
+        # (re)connection then ready or failed with the auth reply
+        self.auth_changed = auth_changed
         self.connection_timer = None
         self.connection_timeout = 15
+        self.last_heartbeat = None
+        # set by connect(), replayed clients never arm the connection watchdog
+        self.online = False
+        # autostart=False keeps the client offline, used to replay recorded frames
+        if autostart:
+            self.connect()
+
+    def connect(self):
+        """Opens the authenticated socket, the auth reply arrives on the reactor thread"""
+        self._auth_state(STARTING)
+        self.online = True
         self.authenticate(self._auth_messages)
+        # the reactor runs once per process, the thread of every account after the first
+        # ends with ReactorAlreadyRunning and its connection runs on the first one
         self.start()
 
+    def stop(self):
+        """Closes the connections for good, the watchdog does not reconnect them"""
+        self.online = False
+        self._stop_timers()
+        self.close()
+
+    def _auth_state(self, state, detail=None):
+        if self.auth_changed:
+            self.auth_changed(state, detail)
+
     def _stop_timers(self):
         """Stops connection timers."""
         if self.connection_timer:
@@ -76,6 +147,9 @@ class Bfxwss(WssClient):
         """Resets and starts timers for API data and connection."""
         LOGGER.info("_start_timers(): Resetting timers..")
         self._stop_timers()
+        # there is nothing to reconnect while replaying
+        if not self.online:
+            return
         # Automatically reconnect if we didnt receive data
         self.connection_timer = threading.Timer(self.connection_timeout, self._connection_timed_out)
         self.connection_timer.start()
@@ -89,6 +163,10 @@ class Bfxwss(WssClient):
 
     def _heartbeat_handler(self):
         LOGGER.info("_hb_handler()  : new heart beat")
+        now = time.monotonic()
+        if self.last_heartbeat is not None:
+            STATS.observe("ws heartbeat gap", now - self.last_heartbeat)
+        self.last_heartbeat = now
         self._start_timers()
 
     def _system_handler(self, data):
@@ -102,7 +180,11 @@ class Bfxwss(WssClient):
             LOGGER.info(f"_system_handler(): Distributing {data} to _info_handler..")
             self._info_handler(data)
         elif event == 'auth':
-            pass
+            if data.get('status') == "OK":
+                self._auth_state(READY)
+            else:
+                LOGGER.error(f"authentication failed : {data}")
+                self._auth_state(FAILED, data.get('msg'))
         else:
             LOGGER.error("Unhandled event: %s, data: %s", event, data)
 
@@ -137,15 +219,34 @@ class Bfxwss(WssClient):
             raise
 
     def _auth_messages(self, data):
-        # Handle data
-        if isinstance(data, dict):
-            self._system_handler(data)
-        else:
-            # This is a list of data
-            if data[1] == 'hb':
-                self._heartbeat_handler()
+        STATS.frame_received()
+        if self.recorder:
+            self.recorder.record("auth", data)
+        try:
+            # Handle data
+            if isinstance(data, dict):
+                STATS.increment("ws_frames", "event")
+                self._system_handler(data)
             else:
-                self._data_handler(data)
+                STATS.increment("ws_frames", data[1])
+                if self.account_changed:
+                    self.account_changed(data[1])
+                # This is a list of data
+                if data[1] == 'hb':
+                    self._heartbeat_handler()
+                else:
+                    self._data_handler(data)
+        except Exception:
+            STATS.increment("errors", "ws handler")
+            raise
+        finally:
+            STATS.frame_done()
+
+    def _send_formatted(self, msg_type, message, key=None):
+        age = STATS.frame_age()
+        if age is not None:
+            STATS.observe("ws format", age)
+        self.deliver(msg_type, message, key=key)
 
     def _data_handler(self, data):
         # Pass the data up to the Client
@@ -235,16 +336,17 @@ class Bfxwss(WssClient):
             f"Leverage     : {message[2][9]} "
             "</pre>"
         )
-        # send message to everyone who is authenticated
-        self.send_to_users(msg_type, formated_message)
+        self.coalescer.push(msg_type, ('pu', message[2][0]), formated_message)
 
     def _send_pc_msg(self, msg_type, message):
+        self.coalescer.discard(('pu', message[2][0]))
         formated_message = (
             "<pre>"
             f"{msg_type} message is : {message}"
             "</pre>"
         )
-        self.send_to_users(msg_type, formated_message)
+        # same key as the position updates, its live panel is closed
+        self.send_to_users(msg_type, formated_message, key=('pu', message[2][0]))
 
     def _send_ws_msg(self, msg_type, message):
         formated_message = (
@@ -264,7 +366,7 @@ class Bfxwss(WssClient):
             f"{coin} {wtype} wallet updated,  new balance is {balance}"
             "</pre>"
         )
-        self.send_to_users(msg_type, formated_message)
+        self.coalescer.push(msg_type, ('wu', wtype, coin), formated_message)
 
     def _send_os_msg(self, msg_type, message):
         formated_message = (
@@ -289,8 +391,8 @@ class Bfxwss(WssClient):
             f"{plus_sign}{order_volume} @ {order_price} PLACED"
             "</pre>"
         )
-        # send message to everyone who is authenticated
-        self.send_to_users(msg_type, formated_message)
+        # on-req and on describe the same order, only the latest one is sent
+        self.coalescer.push(msg_type, ('order', order_id), formated_message)
 
     def _send_onreq_msg(self, msg_type, message):
         formated_message = (
@@ -299,7 +401,7 @@ class Bfxwss(WssClient):
             f"{message[2][7]}"
             "</pre>"
         )
-        self.send_to_users(msg_type, formated_message)
+        self._send_order_notification(msg_type, message, formated_message)
 
     def _send_ou_msg(self, msg_type, message):
         order_id = message[2][0]
@@ -316,7 +418,7 @@ class Bfxwss(WssClient):
             f"{plus_sign}{order_volume} @ {order_price}"
             "</pre>"
         )
-        self.send_to_users(msg_type, formated_message)
+        self.coalescer.push(msg_type, ('order', order_id), formated_message)
 
     def _send_oc_msg(self, msg_type, message):
         order_id = message[2][0]
@@ -335,7 +437,8 @@ class Bfxwss(WssClient):
             "</pre>"
         )
 
-        # send message to everyone who is authenticated
+        # the order is gone, pending placed/updated messages are outdated
+        self.coalescer.discard(('order', order_id))
         self.send_to_users(msg_type, formated_message)
 
     def _send_ocreq_msg(self, msg_type, message):
@@ -345,7 +448,50 @@ class Bfxwss(WssClient):
             f"{message[2][7]}"
             "</pre>"
         )
-        self.send_to_users(msg_type, formated_message)
+        self._send_order_notification(msg_type, message, formated_message)
+
+    def _send_order_notification(self, msg_type, message, formated_message):
+        """
+            on-req, ou-req and oc-req notifications are coalesced with the
+            on, ou and oc messages that describe the same order
+        """
+        order = message[2][4]
+        if self.order_reply is not None:
+            replied = self.order_ops.reply(msg_type, order)
+            if replied is not None:
+                chat_id, latency = replied
+                self.order_reply(chat_id, msg_type, message[2], latency)
+                return
+        if not order:
+            self.send_to_users(msg_type, formated_message)
+            return
+        self.coalescer.push(msg_type, ('order', order[0]), formated_message)
+
+    def _send_coalesced(self, msg_type, key, message):
+        self.send_to_users(msg_type, message, key=key)
+
+    def _send_auth_frame(self, frame):
+        """
+            returns False when the authenticated socket is not connected
+        """
+        factory = self.factories.get("auth")
+        if factory is None or factory.protocol_instance is None:
+            LOGGER.error(f"authenticated socket is not connected, dropping {frame}")
+            return False
+        payload = json.dumps(frame, ensure_ascii=False).encode('utf8')
+        factory.protocol_instance.sendMessage(payload, isBinary=False)
+        return True
+
+    def _order_failed(self, chat_id, op, latency):
+        """
+            answers the chat at once with an error notification shaped like the req reply
+        """
+        if self.order_reply is None:
+            return
+        msg_type = f"{op}-req"
+        notification = [int(time.time() * 1000), msg_type, None, None, None, None, "ERROR",
+                        "not connected to bitfinex, the order was not sent"]
+        self.order_reply(chat_id, msg_type, notification, latency)
 
     def _send_ocmultireq_msg(self, msg_type, message):
         formated_message = (
@@ -423,34 +569,16 @@ class Bfxwss(WssClient):
             )
             self.send_to_users(msg_type, formated_message)
 
-    def _send_fos_msg(self, msg_type, message):
-        formated_message = (
-            "<pre>"
-            f"{msg_type} message is : {message}"
-            "</pre>"
-        )
-        self.send_to_users(msg_type, formated_message)
-
-    def _send_fon_msg(self, msg_type, message):
-        formated_message = (
-            "<pre>"
-            f"{msg_type} message is : {message}"
-            "</pre>"
-        )
-        self.send_to_users(msg_type, formated_message)
-
-    def _send_fou_msg(self, msg_type, message):
-        formated_message = (
-            "<pre>"
-            f"{msg_type} message is : {message}"
-            "</pre>"
-        )
-        self.send_to_users(msg_type, formated_message)
-
-    def _send_foc_msg(self, msg_type, message):
+    def _send_funding_msg(self, msg_type, message):
+        self.funding_book.update(msg_type, message[2])
+        if msg_type.endswith('s'):
+            body = self.funding_book.summary()
+        else:
+            body = self.funding_book.format_entry(msg_type, message[2])
         formated_message = (
             "<pre>"
-            f"{msg_type} message is : {message}"
+            f"{msg_type} msg\n"
+            f"{body}"
             "</pre>"
         )
         self.send_to_users(msg_type, formated_message)
@@ -463,38 +591,6 @@ class Bfxwss(WssClient):
         )
         self.send_to_users(msg_type, formated_message)
 
-    def _send_fcs_msg(self, msg_type, message):
-        formated_message = (
-            "<pre>"
-            f"{msg_type} message is : {message}"
-            "</pre>"
-        )
-        self.send_to_users(msg_type, formated_message)
-
-    def _send_fcn_msg(self, msg_type, message):
-        formated_message = (
-            "<pre>"
-            f"{msg_type} message is : {message}"
-            "</pre>"
-        )
-        self.send_to_users(msg_type, formated_message)
-
-    def _send_fcu_msg(self, msg_type, message):
-        formated_message = (
-            "<pre>"
-            f"{msg_type} message is : {message}"
-            "</pre>"
-        )
-        self.send_to_users(msg_type, formated_message)
-
-    def _send_fcc_msg(self, msg_type, message):
-        formated_message = (
-            "<pre>"
-            f"{msg_type} message is : {message}"
-            "</pre>"
-        )
-        self.send_to_users(msg_type, formated_message)
-
     def _send_hfcs_msg(self, msg_type, message):
         formated_message = (
             "<pre>"
@@ -503,38 +599,6 @@ class Bfxwss(WssClient):
         )
         self.send_to_users(msg_type, formated_message)
 
-    def _send_fls_msg(self, msg_type, message):
-        formated_message = (
-            "<pre>"
-            f"{msg_type} message is : {message}"
-            "</pre>"
-        )
-        self.send_to_users(msg_type, formated_message)
-
-    def _send_fln_msg(self, msg_type, message):
-        formated_message = (
-            "<pre>"
-            f"{msg_type} message is : {message}"
-            "</pre>"
-        )
-        self.send_to_users(msg_type, formated_message)
-
-    def _send_flu_msg(self, msg_type, message):
-        formated_message = (
-            "<pre>"
-            f"{msg_type} message is : {message}"
-            "</pre>"
-        )
-        self.send_to_users(msg_type, formated_message)
-
-    def _send_flc_msg(self, msg_type, message):
-        formated_message = (
-            "<pre>"
-            f"{msg_type} message is : {message}"
-            "</pre>"
-        )
-        self.send_to_users(msg_type, formated_message)
-
     def _send_hfls_msg(self, msg_type, message):
         formated_message = (
             "<pre>"
@@ -552,7 +616,7 @@ class Bfxwss(WssClient):
         self.send_to_users(msg_type, formated_message)
 
     def _send_uca_msg(self, msg_type, message):
-        print(f"uca is {message}")
+        LOGGER.info(f"uca is {message}")
         message = message[2][4]
         direction = "under" if message[5] < 0 else "above"
         expires = message[4]
@@ -568,7 +632,7 @@ class Bfxwss(WssClient):
             f"{message[2][7]}"
             "</pre>"
         )
-        self.send_to_users(msg_type, formated_message)
+        self._send_order_notification(msg_type, message, formated_message)
 
     def _send_wallettransfer_msg(self, msg_type, message):
         formated_message = (
@@ -579,12 +643,204 @@ class Bfxwss(WssClient):
         )
         self.send_to_users(msg_type, formated_message)
 
+    def acquire(self, channel, symbol):
+        """
+            Take a reference on a public channel (ticker, trades, candles, book)
+            for symbol (tIOTUSD), the first reference subscribes to the channel
+        """
+        with self.subscriptions_lock:
+            refs = self.subscriptions.get((channel, symbol), 0)
+            self.subscriptions[(channel, symbol)] = refs + 1
+            if refs == 0:
+                self._subscribe(channel, symbol)
+
+    def release(self, channel, symbol):
+        """
+            Drop a reference on a public channel, the last one unsubscribes
+        """
+        with self.subscriptions_lock:
+            refs = self.subscriptions.get((channel, symbol), 0)
+            if refs > 1:
+                self.subscriptions[(channel, symbol)] = refs - 1
+                return
+            if refs == 0:
+                return
+            del self.subscriptions[(channel, symbol)]
+            self._unsubscribe(channel, symbol)
+
+    def lease(self, channel, symbol, seconds=LEASE_SECONDS):
+        """
+            Reference a public channel for a limited time, used for symbols
+            requested once that are not the default pair of any chat
+        """
+        self.acquire(channel, symbol)
+        timer = threading.Timer(seconds, self.release, [channel, symbol])
+        timer.daemon = True
+        timer.start()
+
+    def _subscribe(self, channel, symbol):
+        LOGGER.info(f"_subscribe(): {channel} {symbol}")
+        key = (channel, symbol)
+        connection = self.channel_connections.get(key)
+        if connection is None:
+            connection = self._public_connection()
+            self.public_connections[connection].add(key)
+            self.channel_connections[key] = connection
+        # the socket is added to _conns later, on the reactor thread
+        if connection not in self.channel_ids:
+            self._open_public(connection)
+            return
+        self._send_public(connection, self._subscribe_data(channel, symbol))
+
+    def _public_connection(self):
+        """
+            id of a public connection with room for one more channel
+        """
+        for connection, channels in self.public_connections.items():
+            if len(channels) < MAX_CHANNELS:
+                return connection
+        index = 0
+        while f"public_{index}" in self.public_connections:
+            index += 1
+        connection = f"public_{index}"
+        self.public_connections[connection] = set()
+        return connection
+
+    def _open_public(self, connection):
+        """
+            the conf enabling the book checksums is sent first, its acknowledgement
+            subscribes the channels of the connection, on reconnections too
+        """
+        self.channel_ids[connection] = {}
+        payload = json.dumps({'event': 'conf', 'flags': BOOK_CHECKSUM_FLAG}).encode('utf8')
+        callback = functools.partial(self._public_frame, connection)
+        self._start_socket(connection, payload, callback)
+
+    def _send_public(self, connection, data):
+        """
+            sends data on the connection once its conf is acknowledged, until then
+            the acknowledgement subscribes every channel of the connection
+        """
+        factory = self.factories.get(connection)
+        protocol = getattr(factory, 'protocol_instance', None)
+        if protocol is None or self.confirmed.get(connection) is not protocol:
+            return
+        protocol.sendMessage(json.dumps(data, ensure_ascii=False).encode('utf8'), isBinary=False)
+
+    @staticmethod
+    def _subscribe_data(channel, symbol):
+        data = {'event': 'subscribe', 'channel': channel}
+        if channel == 'candles':
+            data['key'] = f"trade:{CANDLES_TIMEFRAME}:{symbol}"
+        else:
+            data['symbol'] = symbol
+        if channel == 'book':
+            data.update({'prec': 'P0', 'freq': 'F0', 'len': '100'})
+        return data
+
+    def _unsubscribe(self, channel, symbol):
+        """
+            a channel still referenced, the book being resynced, is subscribed
+            again once bitfinex acknowledges the unsubscription
+        """
+        LOGGER.info(f"_unsubscribe(): {channel} {symbol}")
+        key = (channel, symbol)
+        connection = self.channel_connections.get(key)
+        if connection is None:
+            return
+        for chan_id, subscribed in self.channel_ids.get(connection, {}).items():
+            if subscribed == key:
+                self._send_public(connection, {'event': 'unsubscribe', 'chanId': chan_id})
+                break
+        if key not in self.subscriptions:
+            del self.channel_connections[key]
+            channels = self.public_connections[connection]
+            channels.discard(key)
+            if not channels:
+                del self.public_connections[connection]
+                self.channel_ids.pop(connection, None)
+                self.confirmed.pop(connection, None)
+                self.stop_socket(connection)
+        self.market_data.clear(channel, symbol)
+
+    def _resubscribe(self):
+        # one connection per MAX_CHANNELS channels is opened again, not one per channel
+        with self.subscriptions_lock:
+            for connection in self.public_connections:
+                self.confirmed.pop(connection, None)
+                self._open_public(connection)
+
+    def _resync_book(self, symbol):
+        with self.subscriptions_lock:
+            if ('book', symbol) not in self.subscriptions:
+                return
+            self._unsubscribe('book', symbol)
+
+    def _public_frame(self, connection, data):
+        """
+            demultiplexes the frames of a public connection by channel id
+        """
+        if isinstance(data, list):
+            key = self.channel_ids.get(connection, {}).get(data[0])
+            # frames still in flight for an unsubscribed channel
+            if key is not None:
+                self._public_messages(key[0], key[1], data)
+            return
+        event = data.get('event')
+        with self.subscriptions_lock:
+            if event == 'conf':
+                LOGGER.info(f"_public_frame(): {connection} conf {data}")
+                factory = self.factories.get(connection)
+                self.confirmed[connection] = getattr(factory, 'protocol_instance', None)
+                # a new connection, the channel ids of the previous one are stale
+                self.channel_ids[connection] = {}
+                for channel, symbol in self.public_connections.get(connection, ()):
+                    self._send_public(connection, self._subscribe_data(channel, symbol))
+            elif event == 'subscribed':
+                channel = data['channel']
+                symbol = data['key'].split(':')[-1] if channel == 'candles' else data['symbol']
+                self.channel_ids.setdefault(connection, {})[data['chanId']] = (channel, symbol)
+                # released while its subscription was on the way
+                if (channel, symbol) not in self.subscriptions:
+                    unsubscribe = {'event': 'unsubscribe', 'chanId': data['chanId']}
+                    self._send_public(connection, unsubscribe)
+            elif event == 'unsubscribed':
+                key = self.channel_ids.get(connection, {}).pop(data['chanId'], None)
+                if key in self.subscriptions and self.channel_connections.get(key) == connection:
+                    self._send_public(connection, self._subscribe_data(*key))
+            elif event == 'info':
+                LOGGER.info(f"_public_frame(): {connection} info {data}")
+            else:
+                LOGGER.error(f"_public_frame(): {connection} event {data}")
+        if event == 'subscribed':
+            self._public_messages(channel, symbol, data)
+
+    def _public_messages(self, channel, symbol, data):
+        if self.recorder:
+            self.recorder.record(f"{channel}_{symbol}", data)
+        STATS.increment("ws_frames", channel)
+        if isinstance(data, dict):
+            LOGGER.info(f"_public_messages(): {channel} {symbol} event {data}")
+            return
+        if data[1] == 'hb':
+            return
+        if data[1] == 'cs':
+            if not self.market_data.verify_book(symbol, data[2]):
+                LOGGER.error(f"_public_messages(): {symbol} book checksum mismatch, resyncing")
+                self._resync_book(symbol)
+            return
+        self.market_data.update(channel, symbol, data[1:])
+
     def reconnect(self):
         LOGGER.info(f"reconnect(): started")
+        STATS.increment("ws_reconnects")
+        self.last_heartbeat = None
         self.close()
         LOGGER.info(f"reconnect(): closed finished")
+        self._auth_state(STARTING)
         self.authenticate(self._auth_messages)
         LOGGER.info(f"reconnect(): authenticate finished")
+        self._resubscribe()
         self._start_timers()
         LOGGER.info(f"reconnect(): timers started")
 
@@ -594,4 +850,5 @@ class Bfxwss(WssClient):
 
     def unpause(self):
         self.authenticate(self._auth_messages)
+        self._resubscribe()
         self._start_timers()
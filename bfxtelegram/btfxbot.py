@@ -3,19 +3,35 @@
 Module Docstring
 """
 
+import time
+import signal
+import functools
 import logging
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FetchTimeout
 # telegram libraries
 from telegram.ext import Updater, Filters
 from telegram.ext import CallbackQueryHandler, CommandHandler, MessageHandler, ConversationHandler
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.error import (TelegramError, TimedOut)
-# bitfinex libraries
-from bitfinex import ClientV1 as Client
-from bitfinex import ClientV2 as Client2
-
-from bfxtelegram.bfxwss import Bfxwss
 from bfxtelegram import utils
+from bfxtelegram.accounts import Account, DEFAULT_ACCOUNT
 from bfxtelegram.tgraph import Tgraph
+from bfxtelegram.livepanel import LivePanel
+from bfxtelegram.marketdata import MarketData, DEFAULT_PAIR_CHANNELS
+from bfxtelegram.recorder import FrameRecorder
+from bfxtelegram.stats import STATS
+from bfxtelegram.readiness import READINESS, READY
+from bfxtelegram.metrics import MetricsServer
+from bfxtelegram.delivery import Delivery
+from bfxtelegram.outbox import Outbox
+from bfxtelegram.userstore import UserStore
+from bfxtelegram.routing import SubscriptionIndex
+from bfxtelegram.digest import Digest
+from bfxtelegram.symbols import SymbolRegistry
+from bfxtelegram.aio import AsyncCore
+from bfxtelegram.webhook import WebhookServer
 
 # Enable logging
 logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -24,6 +40,14 @@ LOGGER = logging.getLogger(__name__)
 
 UPDPRICE = 0
 UPDVOLUME = 0
+# seconds /graph waits for the order book snapshot of a newly subscribed pair
+BOOK_WAIT = 5
+# seconds /graph waits for candles, active orders and book fetched at once
+GRAPH_DEADLINE = 6
+# threads fetching the data of charts
+FETCH_WORKERS = 8
+# seconds the queued notifications are sent for when the bot stops, the rest stay in the outbox
+SHUTDOWN_TIMEOUT = 10
 
 
 def ensure_authorized(passed_function):
@@ -44,19 +68,118 @@ def ensure_authorized(passed_function):
     return wrapper
 
 
+def ensure_admin(passed_function):
+    def wrapper(self, bot, update, *args, **kwargs):
+        chat_id = update.message.chat.id
+        if chat_id not in self.admin_chats:
+            LOGGER.info(f"{chat_id} is not an admin chat")
+            return
+        return passed_function(self, bot, update, *args, **kwargs)
+    return wrapper
+
+
+def ensure_connected(passed_function):
+    """
+        commands using the authenticated socket of the chat account, after ensure_authorized
+    """
+    def wrapper(self, bot, update, *args, **kwargs):
+        chat_id = update.message.chat.id
+        if not self.account(chat_id).connected:
+            LOGGER.info(f"{chat_id} : the socket of its account is not authenticated yet")
+            message = "<pre>connecting to bitfinex, try again in a few seconds</pre>"
+            bot.send_message(chat_id, text=message, parse_mode='HTML')
+            return
+        return passed_function(self, bot, update, *args, **kwargs)
+    return wrapper
+
+
 class Btfxbot:
-    def __init__(self, telegram_token, auth_pass, btfx_key, btfx_secret):
+    def __init__(self, telegram_token, auth_pass, btfx_key, btfx_secret, coalesce_window=1.0,
+                 live_interval=3.0, record_file=None, accounts=None, admin_chats=(),
+                 metrics_port=None, delivery_workers=8, outbox_file=utils.OUTBOX_FILE,
+                 mode="polling", webhook_url=None, webhook_port=8443, webhook_secret=None,
+                 users_file=utils.USERS_FILE):
+        """
+            accounts : extra bitfinex accounts as a dictionary name -> (key, secret),
+            btfx_key and btfx_secret are the credentials of the main account
+            admin_chats : chat ids allowed to use /stats
+            metrics_port : localhost port of the prometheus metrics and /health endpoints,
+            None disables them
+            delivery_workers : threads sending websocket notifications to the chats
+            outbox_file : sqlite file keeping undelivered notifications across restarts,
+            None keeps them in memory only
+            mode : polling, webhook, or asyncio to handle updates on the event loop of the
+            websocket, aio.install_reactor() must be called before importing this module
+            webhook_url, webhook_port, webhook_secret : public https url telegram posts the
+            updates to, local port of the receiver and the token telegram sends with them
+            users_file : sqlite file of the chats and their settings
+        """
         LOGGER.info("Here be dragons")
-        self.userdata = utils.read_userdata()
+        READINESS.add("userdata", "symbols", "telegram")
         self.auth_pass = auth_pass
-        self.btfx_client = Client(btfx_key, btfx_secret)
-        self.btfx_client2 = Client2(btfx_key, btfx_secret)
-        self.btfx_symbols = self.btfx_client.symbols()
-        self.currencies = utils.get_currencies(self.btfx_symbols)
+        self.admin_chats = set(admin_chats)
+        # AsyncCore in asyncio mode
+        self.core = None
+        if metrics_port:
+            MetricsServer(metrics_port).start()
+
+        # public market data is shared, every account has its own authenticated socket
+        market_data = MarketData()
+        credentials = {DEFAULT_ACCOUNT: (btfx_key, btfx_secret)}
+        credentials.update(accounts or {})
+        # only the main account is recorded, replays have a single auth connection
+        self.recorder = FrameRecorder(record_file) if record_file else None
+        self.accounts = {}
+        for name, (key, secret) in credentials.items():
+            self.accounts[name] = Account(
+                name,
+                key,
+                secret,
+                self.send_to_users,
+                market_data=market_data,
+                coalesce_window=coalesce_window,
+                recorder=self.recorder if name == DEFAULT_ACCOUNT else None,
+                order_reply=self.order_reply
+            )
+        main_account = self.accounts[DEFAULT_ACCOUNT]
+        self.btfx_client = main_account.btfx_client
+        self.btfx_client2 = main_account.btfx_client2
+        # public channels are only subscribed on the main account socket
+        self.btfxwss = main_account.btfxwss
+
+        # the user store and the symbols, fetched from bitfinex on the first start,
+        # load while the telegram side and the sockets are set up
+        bootstrap = ThreadPoolExecutor(2, thread_name_prefix="bootstrap")
+        users = bootstrap.submit(READINESS.run, "userdata", UserStore.open, users_file)
+        # started from the saved snapshot, bitfinex is only waited for on the first start
+        symbols = bootstrap.submit(
+            READINESS.run, "symbols", SymbolRegistry, self.btfx_client.symbols_details,
+            snapshot_file=utils.SYMBOLS_FILE
+        )
+        bootstrap.shutdown(wait=False)
 
         updater = Updater(telegram_token)
         self.tbot = updater.bot
-        self.btfxwss = Bfxwss(self.send_to_users, key=btfx_key, secret=btfx_secret)
+        self.fetch_pool = ThreadPoolExecutor(FETCH_WORKERS, thread_name_prefix="fetch")
+        outbox = Outbox(outbox_file) if outbox_file else None
+
+        self.user_store, self.userdata = users.result()
+        self.subscriptions = SubscriptionIndex(self.userdata)
+        self.delivery = Delivery(self.send_message, workers=delivery_workers, outbox=outbox)
+        self.digest = Digest(self.delivery.enqueue)
+        # panel edits share the telegram rate limits of the delivered messages
+        self.live_panel = LivePanel(self.tbot, interval=live_interval, submit=self.delivery.submit)
+        # messages handed to send_to_users that are not sent yet
+        STATS.gauge("delivery_queue_depth", lambda: self.delivery.depth)
+        # the sockets authenticate in the background, commands that need them
+        # answer they are connecting until then
+        for account in self.accounts.values():
+            account.start()
+        # keep public channels open for the default pairs of authenticated chats
+        for user_data in self.userdata.values():
+            if user_data['authenticated'] == "yes" and 'defaultpair' in user_data:
+                self.watch_pair(user_data['defaultpair'])
+        self.btfx_symbols = symbols.result()
         # Get the dispatcher to register handlers
         qdp = updater.dispatcher
         # on different commands - answer in Telegram
@@ -73,6 +196,8 @@ class Btfxbot:
         qdp.add_handler(CommandHandler("calc", self._cb_calc, pass_args=True))
         qdp.add_handler(CommandHandler("help", self._cb_help, pass_args=True))
         qdp.add_handler(CommandHandler("ticker", self.ticker, pass_args=True))
+        qdp.add_handler(CommandHandler("funding", self._cb_funding, pass_args=True))
+        qdp.add_handler(CommandHandler("stats", self._cb_stats, pass_args=True))
 
         update_volume_handler = CallbackQueryHandler(
             self.cb_btn_update_volume,
@@ -114,13 +239,55 @@ class Btfxbot:
         # log all errors
         qdp.add_error_handler(self.cb_error)
 
+        if mode == "asyncio":
+            self.core = AsyncCore(self, qdp)
+            READINESS.set("telegram", READY)
+            self.core.run()
+            self.shutdown()
+            return
+
+        if mode == "webhook":
+            webhook = WebhookServer(webhook_port, webhook_secret, qdp, webhook_url)
+            READINESS.run("telegram", webhook.start)
+            # updater.idle() hard exits when the updater itself is not running
+            stopped = threading.Event()
+            for signum in (signal.SIGINT, signal.SIGTERM, signal.SIGABRT):
+                signal.signal(signum, lambda _signum, _frame: stopped.set())
+            while not stopped.wait(1):
+                pass
+            self.shutdown(webhook)
+            return
+
         # Start the Bot
-        updater.start_polling(timeout=60, read_latency=0.2)
+        READINESS.run("telegram", updater.start_polling, timeout=60, read_latency=0.2)
 
         # Block until you press Ctrl-C or the process receives SIGINT, SIGTERM or
         # SIGABRT. This should be used most of the time, since start_polling() is
         # non-blocking and will stop the bot gracefully.
         updater.idle()
+        # the reactor runs in the non daemon thread of the sockets
+        self.shutdown()
+
+    def shutdown(self, webhook=None):
+        """
+            stops the webhook, the sockets, the recording, the delivery workers, the asyncio
+            core and the reactor, which runs the loop in asyncio mode
+        """
+        LOGGER.info("shutting down")
+        if webhook is not None:
+            webhook.stop()
+        for account in self.accounts.values():
+            account.stop()
+        if self.recorder is not None:
+            self.recorder.close()
+        if not self.delivery.stop(SHUTDOWN_TIMEOUT):
+            LOGGER.warning(f"{self.delivery.depth} notifications left in the outbox")
+        # after the delivery, its asyncio sends run on the loop
+        if self.core is not None:
+            self.core.stop()
+        from twisted.internet import reactor
+        if reactor.running:
+            reactor.callFromThread(reactor.stop)
 
     # CALLBACK FUNCTIONS
     def cb_start(self, bot, update):
@@ -130,6 +297,7 @@ class Btfxbot:
         """
         update.message.reply_text('Here be Dragons')
 
+    @STATS.timed("/auth")
     def cb_auth(self, bot, update, args):
         """
             Callback method used to authenticate to the bot
@@ -165,12 +333,16 @@ class Btfxbot:
             bot.send_message(chat_id, text="you are blocked")
             userinfo["failed_auth"] += 1
             self.userdata[chat_id] = userinfo
-            utils.save_userdata(self.userdata)
+            self.subscriptions.update_chat(chat_id)
+            self.user_store.save(chat_id, self.userdata[chat_id])
             return
 
+        was_authenticated = userinfo["authenticated"] == "yes"
         if botpass == self.auth_pass:
             message = "<pre>authentication successfull </pre>"
             bot.send_message(chat_id, text=message, parse_mode='HTML')
+            if not was_authenticated and 'defaultpair' in userinfo:
+                self.watch_pair(userinfo['defaultpair'])
             userinfo["authenticated"] = "yes"
             userinfo["failed_auth"] = 0
             userinfo["telegram_user"] = username
@@ -178,18 +350,23 @@ class Btfxbot:
         else:
             message = "<pre>bad password</pre>"
             bot.send_message(chat_id, text=message, parse_mode='HTML')
+            if was_authenticated and 'defaultpair' in userinfo:
+                self.unwatch_pair(userinfo['defaultpair'])
             userinfo["authenticated"] = "no"
             userinfo["failed_auth"] += 1
             userinfo["telegram_user"] = username
             userinfo["telegram_name"] = f"{first_name} {last_name}"
 
         self.userdata[chat_id] = userinfo
-        utils.save_userdata(self.userdata)
+        self.subscriptions.update_chat(chat_id)
+        self.user_store.save(chat_id, self.userdata[chat_id])
 
     def cb_error(self, bot, update, boterror):
         """Log Errors caused by Updates."""
+        STATS.increment("errors", type(boterror).__name__)
         LOGGER.warning(f'Update "{update}" caused error "{boterror}"')
 
+    @STATS.timed("/graph")
     @ensure_authorized
     def cb_graph(self, bot, update, args):
         """
@@ -209,32 +386,72 @@ class Btfxbot:
         symbol = args[0] if args else default_pair
 
         if symbol not in self.btfx_symbols:
-            symbols = " ".join(self.btfx_symbols)
-            msgtext = f"incorect symbol , available pairs are {symbols}"
+            msgtext = self.btfx_symbols.unknown_message(symbol)
             bot.send_message(chat_id, text=msgtext, parse_mode='HTML')
             return
 
         tradepair = f"t{symbol.upper()}"
 
-        chat_id = update.message.chat.id
-        candles_data = self.btfx_client2.candles("1h", tradepair, "hist", limit='120')
-        active_orders = self.btfx_client.active_orders()
-        order_book = self.btfx_client.order_book(
-            symbol,
-            parameters={"limit_bids": 800, "limit_asks": 800}
-        )
+        # the three sources are fetched at once, the chart is drawn without the
+        # optional ones that miss the deadline
+        deadline = time.monotonic() + GRAPH_DEADLINE
+        candles = self.fetch_pool.submit(self.graph_candles, tradepair)
+        orders = self.fetch_pool.submit(self.account(chat_id).btfx_client.active_orders)
+        book = self.fetch_pool.submit(self.graph_book, tradepair)
+        candles_data = self.fetch_result(candles, deadline, "candles")
+        if candles_data is None:
+            msgtext = f"could not get the candles of {symbol}, please try again"
+            bot.send_message(chat_id, text=msgtext, parse_mode='HTML')
+            return
+        active_orders = self.fetch_result(orders, deadline, "active orders") or []
+        orders_data = self.fetch_result(book, deadline, "book")
 
         if 'graphtheme' in self.userdata[chat_id]:
             graphtheme = self.userdata[chat_id]['graphtheme']
         else:
             graphtheme = "normal"
 
-        orders_data = order_book['asks'] + order_book['bids']
-        newgraph = Tgraph(candles_data, active_orders, orders_data, symbol, graphtheme=graphtheme)
-        newgraph.save_picture()
+        with STATS.timer("render graph"):
+            newgraph = Tgraph(
+                candles_data, active_orders, orders_data, symbol, graphtheme=graphtheme
+            )
+            newgraph.save_picture()
         bot.send_photo(chat_id=chat_id, photo=open('graph.png', 'rb'))
         del newgraph
 
+    def graph_candles(self, tradepair):
+        candles_data = self.btfxwss.market_data.candles_list(tradepair, 120)
+        STATS.increment("cache_hits" if candles_data is not None else "cache_misses", "candles")
+        if candles_data is None:
+            self.btfxwss.lease('candles', tradepair)
+            candles_data = self.btfx_client2.candles("1h", tradepair, "hist", limit='120')
+        return candles_data
+
+    def graph_book(self, tradepair):
+        market_data = self.btfxwss.market_data
+        orders_data = market_data.book_orders(tradepair)
+        STATS.increment("cache_hits" if orders_data is not None else "cache_misses", "book")
+        if orders_data is None:
+            self.btfxwss.lease('book', tradepair)
+            orders_data = market_data.book_orders(tradepair, timeout=BOOK_WAIT)
+        return orders_data
+
+    @staticmethod
+    def fetch_result(future, deadline, source):
+        """
+            result of a fetch_pool future, None when it fails or misses the deadline
+        """
+        try:
+            return future.result(timeout=max(0, deadline - time.monotonic()))
+        except FetchTimeout:
+            STATS.increment("errors", f"fetch {source} timeout")
+            LOGGER.warning(f"{source} missed the deadline")
+        except Exception:
+            STATS.increment("errors", f"fetch {source}")
+            LOGGER.exception(f"could not fetch {source}")
+        return None
+
+    @STATS.timed("/set")
     @ensure_authorized
     def _cb_set(self, bot, update, args):
         """
@@ -249,7 +466,9 @@ class Btfxbot:
 
         name = args[0]
         value = args[1]
-        valid_settings = ['defaultpair', 'graphtheme', 'calctype', "getbalance"]
+        valid_settings = [
+            'defaultpair', 'graphtheme', 'calctype', "getbalance", "delivery", "accounts"
+        ]
         if name not in valid_settings:
             str_settings = " ".join(valid_settings)
             formated_message = (
@@ -262,7 +481,7 @@ class Btfxbot:
             return
 
         if name == "defaultpair" and value not in self.btfx_symbols:
-            msgtext = f"incorect symbol , available pairs are {self.btfx_symbols}"
+            msgtext = self.btfx_symbols.unknown_message(value)
             bot.send_message(chat_id, text=msgtext, parse_mode='HTML')
             return
 
@@ -271,22 +490,57 @@ class Btfxbot:
             bot.send_message(chat_id, text=msgtext, parse_mode='HTML')
             return
 
+        if name == "delivery" and value not in utils.DELIVERY_MODES:
+            modes = ", ".join(utils.DELIVERY_MODES)
+            msgtext = f"incorect delivery mode , available modes are {modes}"
+            bot.send_message(chat_id, text=msgtext, parse_mode='HTML')
+            return
+
+        if name == "delivery" and value == "digest":
+            interval = args[2] if len(args) > 2 else ""
+            if not interval or not utils.isnumber(interval) or \
+                    float(interval) < utils.MIN_DIGEST_INTERVAL:
+                msgtext = (
+                    "digest needs an interval of at least "
+                    f"{utils.MIN_DIGEST_INTERVAL} seconds : /set delivery digest 300"
+                )
+                bot.send_message(chat_id, text=msgtext, parse_mode='HTML')
+                return
+            self.userdata[chat_id]['digest_interval'] = float(interval)
+
+        if name == "defaultpair":
+            if 'defaultpair' in self.userdata[chat_id]:
+                self.unwatch_pair(self.userdata[chat_id]['defaultpair'])
+            self.watch_pair(value)
+
         if name == "getbalance":
             curr_list = []
             for iterator in range(1, len(args)):
-                if args[iterator] in self.currencies:
+                if args[iterator] in self.btfx_symbols.currencies:
                     curr_list.append(args[iterator])
                 else:
                     msgtext = f"{args[iterator]} is not a valid currency"
                     bot.send_message(chat_id, text=msgtext, parse_mode='HTML')
             value = curr_list
 
+        if name == "accounts":
+            unknown = [account for account in args[1:] if account not in self.accounts]
+            if unknown:
+                names = ", ".join(self.accounts)
+                msgtext = f"incorect account {' '.join(unknown)} , available accounts are {names}"
+                bot.send_message(chat_id, text=msgtext, parse_mode='HTML')
+                return
+            value = list(args[1:])
+
         self.userdata[chat_id][name] = value
-        utils.save_userdata(self.userdata)
+        if name == "accounts":
+            self.subscriptions.update_chat(chat_id)
+        self.user_store.save(chat_id, self.userdata[chat_id])
 
         message = f'<pre>{name} was set to {value}</pre>'
         bot.send_message(chat_id, text=message, parse_mode='HTML')
 
+    @STATS.timed("/enable")
     @ensure_authorized
     def cb_enable(self, bot, update, args):
         LOGGER.info(f"{update.message.chat.username} : /enable {args}")
@@ -309,8 +563,10 @@ class Btfxbot:
         bot.send_message(chat_id, text=message, parse_mode='HTML')
 
         self.userdata[chat_id] = userinfo
-        utils.save_userdata(self.userdata)
+        self.subscriptions.update_chat(chat_id)
+        self.user_store.save(chat_id, self.userdata[chat_id])
 
+    @STATS.timed("/disable")
     @ensure_authorized
     def cb_disable(self, bot, update, args):
         LOGGER.info(f"{update.message.chat.username} : /disable {args}")
@@ -335,8 +591,10 @@ class Btfxbot:
         bot.send_message(chat_id, text=message, parse_mode='HTML')
 
         self.userdata[chat_id] = userinfo
-        utils.save_userdata(self.userdata)
+        self.subscriptions.update_chat(chat_id)
+        self.user_store.save(chat_id, self.userdata[chat_id])
 
+    @STATS.timed("/getbalance")
     @ensure_authorized
     def _cb_get_balance(self, bot, update, args):
         LOGGER.info(f"{update.message.chat.username} : /getbalance {args}")
@@ -345,12 +603,14 @@ class Btfxbot:
         if not self.userdata[chat_id]['getbalance']:
             self.send_help(chat_id, "getbalance")
 
-        balances = self.btfx_client.balances()
+        balances = self.account(chat_id).btfx_client.balances()
         formated_balances = utils.format_balance(self.userdata[chat_id]['getbalance'], balances)
         message = f"<pre>{formated_balances}</pre>"
         bot.send_message(chat_id, text=message, parse_mode='HTML')
 
+    @STATS.timed("/neworder")
     @ensure_authorized
+    @ensure_connected
     def cb_new_order(self, bot, update, args):
         LOGGER.info(f"{update.message.chat.username} : /neworder {args}")
         chat_id = update.message.chat.id
@@ -374,31 +634,45 @@ class Btfxbot:
             return
 
         if tradepair not in self.btfx_symbols:
-            msgtext = f"incorect tradepair , available pairs are {self.btfx_symbols}"
+            msgtext = self.btfx_symbols.unknown_message(tradepair)
             bot.send_message(chat_id, text=msgtext, parse_mode='HTML')
             return
 
-        if tradetype not in utils.REST_TYPES:
-            types = " ".join(utils.REST_TYPES)
+        minimum_size = self.btfx_symbols.minimum_order_size(tradepair)
+        if abs(float(volume)) < minimum_size:
+            msgtext = f"incorect volume , the minimum order size for {tradepair} is {minimum_size}"
+            bot.send_message(chat_id, text=msgtext, parse_mode='HTML')
+            return
+
+        if tradetype not in utils.WS_ORDER_TYPES:
+            types = " ".join(utils.WS_ORDER_TYPES)
             msgtext = f"incorect tradetype , available types are : {types}"
             bot.send_message(chat_id, text=msgtext, parse_mode='HTML')
             return
 
-        side = 'buy' if float(volume) > 0 else 'sell'
-        volume = abs(float(volume))
-        neworder = self.btfx_client.place_order(
-            str(volume),
-            price,
-            side,
-            utils.REST_TYPES[tradetype],
-            symbol=tradepair
+        # the order is confirmed to this chat by order_reply when on-req arrives
+        self.account(chat_id).btfxwss.order_ops.new_order(
+            chat_id,
+            utils.WS_ORDER_TYPES[tradetype],
+            f"t{tradepair.upper()}",
+            volume,
+            price
         )
 
-        if 'message' in neworder:
-            bot.send_message(chat_id, text=neworder['message'])
+    def order_reply(self, chat_id, msg_type, notification, latency, account=DEFAULT_ACCOUNT):
+        """
+            on-req, ou-req and oc-req notification of an operation sent from chat_id,
+            called on the reactor thread so the replies are sent by the delivery workers
+        """
+        status = notification[6]
+        text = notification[7]
+        prefix = f"<b>{account}</b>\n" if len(self.accounts) > 1 else ""
+        if msg_type != 'on-req' or status != "SUCCESS":
+            message = f"{prefix}<pre>{status} {text} ({latency * 1000:.0f} ms)</pre>"
+            self.delivery.enqueue(chat_id, message, mtype=msg_type)
             return
 
-        order_id = neworder['id']
+        order_id = notification[4][0]
         buttons = [
             InlineKeyboardButton('Update Price', callback_data=f"update_price:{order_id}"),
             InlineKeyboardButton('Update Volume', callback_data=f"update_volume:{order_id}"),
@@ -406,14 +680,19 @@ class Btfxbot:
         ]
         keyboard = InlineKeyboardMarkup([buttons])
 
-        formated_message = f"Order {order_id} placed succesfully\n"
+        formated_message = (
+            f"{prefix}Order {order_id} placed succesfully ({latency * 1000:.0f} ms)\n"
+        )
 
-        try:
-            update.message.reply_text(formated_message, reply_markup=keyboard)
-        except(TimedOut, TelegramError) as error:
-            LOGGER.info(f"coult not send message keyboard to {chat_id}")
-            LOGGER.info(error)
+        self.delivery.submit(chat_id, functools.partial(
+            self.tbot.send_message,
+            chat_id,
+            text=formated_message,
+            reply_markup=keyboard,
+            parse_mode='HTML'
+        ))
 
+    @STATS.timed("/newalert")
     @ensure_authorized
     def _cb_new_alert(self, bot, update, args):
         """
@@ -432,7 +711,7 @@ class Btfxbot:
         price = args[1]
 
         if tradepair not in self.btfx_symbols:
-            msgtext = f"incorect tradepair , available pairs are {self.btfx_symbols}"
+            msgtext = self.btfx_symbols.unknown_message(tradepair)
             bot.send_message(chat_id, text=msgtext, parse_mode='HTML')
             return
 
@@ -441,12 +720,14 @@ class Btfxbot:
             return
 
         tradepair = f"t{tradepair.upper()}"
-        response = self.btfx_client2.alert_set('price', tradepair, float(price))
+        response = self.account(chat_id).btfx_client2.alert_set('price', tradepair, float(price))
         if response[4] == 100:
             msgtext = "<pre> Alert Set Succesfully </pre>"
             bot.send_message(chat_id, text=msgtext, parse_mode='HTML')
 
+    @STATS.timed("/calc")
     @ensure_authorized
+    @ensure_connected
     def _cb_calc(self, bot, update, args):
         LOGGER.info(f"{update.message.chat.username} : /calc {args}")
         chat_id = update.message.chat.id
@@ -459,8 +740,9 @@ class Btfxbot:
             default_type = self.userdata[chat_id]['calctype']
 
         calctype = args[0] if args else default_type
-        self.btfxwss.calc([calctype])
+        self.account(chat_id).btfxwss.calc([calctype])
 
+    @STATS.timed("/orders")
     @ensure_authorized
     def _cb_orders(self, bot, update, args):
         """
@@ -481,6 +763,30 @@ class Btfxbot:
             print(f"coult not send message keyboard to {chat_id}")
             print(error)
 
+    @STATS.timed("/funding")
+    @ensure_authorized
+    @ensure_connected
+    def _cb_funding(self, bot, update, args):
+        """
+            Summary of funding offers, credits and loans
+            built from the websocket funding messages
+        """
+        LOGGER.info(f"{update.message.chat.username} : /funding {args}")
+        chat_id = update.message.chat.id
+        summary = self.account(chat_id).btfxwss.funding_book.summary()
+        message = f"<pre>{summary}</pre>"
+        bot.send_message(chat_id, text=message, parse_mode='HTML')
+
+    @ensure_admin
+    def _cb_stats(self, bot, update, args):
+        """
+            Latency percentiles per stage, websocket message rates and error counts
+        """
+        LOGGER.info(f"{update.message.chat.username} : /stats {args}")
+        chat_id = update.message.chat.id
+        message = f"<pre>{READINESS.report()}\n\n{STATS.report()}</pre>"
+        bot.send_message(chat_id, text=message, parse_mode='HTML')
+
     @ensure_authorized
     def _cb_help(self, bot, update, args):
         LOGGER.info(f"{update.message.chat.username} : /help {args}")
@@ -488,13 +794,14 @@ class Btfxbot:
         help_key = args[0] if args else "none"
         self.send_help(chat_id, help_key)
 
+    @STATS.timed("orders button")
     def cb_btn_orders(self, bot, update):
         query = update.callback_query
         update.callback_query.answer()  # forgot what this is for
         chat_id = update.callback_query.message.chat.id
         orders_type = query.data.split(':')[1]
 
-        active_orders = self.btfx_client.active_orders()
+        active_orders = self.account(chat_id).btfx_client.active_orders()
         if orders_type == "margin":
             orders_list = [order for order in active_orders if 'exchange' not in order['type']]
         else:
@@ -568,8 +875,9 @@ class Btfxbot:
             return None
 
         bot.sendChatAction(chat_id, "TYPING")
-        self.btfxwss.update_order(
-            id=user_data['update_price_order_id'],
+        self.account(chat_id).btfxwss.order_ops.update_order(
+            chat_id,
+            user_data['update_price_order_id'],
             price=price
         )
         return ConversationHandler.END
@@ -587,8 +895,9 @@ class Btfxbot:
             return None
 
         bot.sendChatAction(chat_id, "TYPING")
-        self.btfxwss.update_order(
-            id=user_data['update_volume_order_id'],
+        self.account(chat_id).btfxwss.order_ops.update_order(
+            chat_id,
+            user_data['update_volume_order_id'],
             amount=amount
         )
         return ConversationHandler.END
@@ -599,6 +908,7 @@ class Btfxbot:
         update.message.reply_text('Bye! I hope we can talk again some day.')
         return ConversationHandler.END
 
+    @STATS.timed("cancel button")
     def cb_btn_cancel_order(self, bot, update):
         query = update.callback_query
         update.callback_query.answer()
@@ -608,21 +918,45 @@ class Btfxbot:
         order_id = int(query.data.split(':')[1])
         LOGGER.info(f"orderid : {order_id}")
 
-        del_order = self.btfx_client.delete_order(order_id)
-        if 'message' in del_order:
-            bot.send_message(chat_id, text=del_order['message'])
-
-        LOGGER.info(f"del_order : {del_order}")
+        self.account(chat_id).btfxwss.order_ops.cancel_order(chat_id, order_id)
 
-    def send_to_users(self, mtype, message):
-        for user_id, user_data in self.userdata.items():
-            if mtype in user_data["disabled_ws_message"]:
+    def account(self, chat_id):
+        """
+            account used by the commands of chat_id, the first one set with /set accounts
+        """
+        for name in self.userdata[chat_id].get('accounts', [DEFAULT_ACCOUNT]):
+            if name in self.accounts:
+                return self.accounts[name]
+        return self.accounts[DEFAULT_ACCOUNT]
+
+    def send_to_users(self, mtype, message, key=None, account=DEFAULT_ACCOUNT):
+        # None when the message was not formatted while handling a frame (coalesced)
+        frame_age = STATS.frame_age()
+        if len(self.accounts) > 1:
+            message = f"<b>{account}</b>\n{message}"
+            key = (account,) + key if key else None
+        live = key is not None and mtype in utils.LIVE_PANEL_TYPES
+        if mtype == 'pc' and key is not None:
+            # the panels of the closed position, also in chats that do not receive pc
+            for user_id in self.subscriptions.recipients(account, 'pu'):
+                if self.userdata[user_id].get('delivery') == "live":
+                    self.live_panel.close(user_id, key)
+        for user_id in self.subscriptions.recipients(account, mtype):
+            user_data = self.userdata[user_id]
+            delivery = user_data.get('delivery')
+            if delivery == "digest":
+                self.digest.add(user_id, user_data['digest_interval'], message, key=key)
+                continue
+            if live and delivery == "live":
+                self.live_panel.publish(user_id, key, message)
                 continue
-            if user_data['authenticated'] == "yes":
-                try:
-                    self.tbot.send_message(user_id, text=message, parse_mode='HTML')
-                except (TimedOut, TelegramError):
-                    LOGGER.error(f"coult not send message to {user_id}")
+            self.delivery.enqueue(user_id, message, frame_age, mtype)
+
+    def send_message(self, chat_id, text):
+        if self.core is not None:
+            self.core.send_message(chat_id, text)
+            return
+        self.tbot.send_message(chat_id, text=text, parse_mode='HTML')
 
     def send_help(self, chat_id, help_key):
         helps = " ".join(utils.CMDHELP.keys())
@@ -637,6 +971,23 @@ class Btfxbot:
             return
         self.tbot.send_message(chat_id, text=utils.CMDHELP[help_key], parse_mode='HTML')
 
+    def watch_pair(self, symbol):
+        for channel in DEFAULT_PAIR_CHANNELS:
+            self.btfxwss.acquire(channel, f"t{symbol.upper()}")
+
+    def unwatch_pair(self, symbol):
+        for channel in DEFAULT_PAIR_CHANNELS:
+            self.btfxwss.release(channel, f"t{symbol.upper()}")
+
+    def format_last_trade(self, tradepair):
+        trade = self.btfxwss.market_data.last_trade(tradepair)
+        if trade is None:
+            return ""
+        _trade_id, mts, amount, price = trade
+        trade_time = datetime.utcfromtimestamp(mts / 1000).strftime('%H:%M:%S')
+        return f"\nLast trade: {amount} @ {price} at {trade_time} UTC"
+
+    @STATS.timed("/ticker")
     @ensure_authorized
     def ticker(self, bot, update, args):
         """
@@ -653,35 +1004,37 @@ class Btfxbot:
             default_pair = self.userdata[chat_id]['defaultpair']
         symbol = args[0] if args else default_pair
         if symbol not in self.btfx_symbols:
-            msgtext = f"incorect tradepair , available pairs are {self.btfx_symbols}"
+            msgtext = self.btfx_symbols.unknown_message(symbol)
             bot.send_message(chat_id, text=msgtext, parse_mode='HTML')
             return
         tradepair = f"t{symbol.upper()}"
-        ticker = self.btfx_client2.ticker(symbol=tradepair)
+        ticker = self.btfxwss.market_data.ticker(tradepair)
+        STATS.increment("cache_hits" if ticker is not None else "cache_misses", "ticker")
+        if ticker is None:
+            self.btfxwss.lease('ticker', tradepair)
+            ticker = self.btfx_client2.ticker(symbol=tradepair)
+        message = self.format_ticker(tradepair, ticker)
+        try:
+            bot.send_message(chat_id, text=message, parse_mode='HTML')
+        except(TimedOut, TelegramError) as error:
+            LOGGER.info(f"coult not send message to {chat_id}")
+            LOGGER.warning(error)
+
+    def format_ticker(self, tradepair, ticker):
         currency_1 = tradepair[1:4]
         currency_2 = tradepair[-3:]
-        if currency_2 in ("BTC", "ETH"):
-            last_price = format(ticker[6], '.9f')
-            bid = format(ticker[0], '.9f')
-            bid_size = round(ticker[1], 2)
-            ask = format(ticker[2], '.9f')
-            ask_size = round(ticker[3], 2)
-            daily_change = format(ticker[4], '.9f')
-            daily_change_perc = round(ticker[5] * 100, 2)
-            volume = round(ticker[7], 2)
-            high = format(ticker[8], '.9f')
-            low = format(ticker[9], '.9f')
-        else:
-            last_price = round(ticker[6], 4)
-            bid = round(ticker[0], 4)
-            bid_size = round(ticker[1], 2)
-            ask = round(ticker[2], 4)
-            ask_size = round(ticker[3], 2)
-            daily_change = round(ticker[4], 4)
-            daily_change_perc = round(ticker[5] * 100, 2)
-            volume = round(ticker[7], 2)
-            high = round(ticker[8], 4)
-            low = round(ticker[9], 4)
+        symbol = tradepair[1:]
+        # prices with the significant digits of the pair
+        last_price = self.btfx_symbols.format_price(symbol, ticker[6])
+        bid = self.btfx_symbols.format_price(symbol, ticker[0])
+        bid_size = round(ticker[1], 2)
+        ask = self.btfx_symbols.format_price(symbol, ticker[2])
+        ask_size = round(ticker[3], 2)
+        daily_change = self.btfx_symbols.format_price(symbol, ticker[4])
+        daily_change_perc = round(ticker[5] * 100, 2)
+        volume = round(ticker[7], 2)
+        high = self.btfx_symbols.format_price(symbol, ticker[8])
+        low = self.btfx_symbols.format_price(symbol, ticker[9])
         unicode_symbols = {"BTC": "Ƀ", "ETH": "Ξ", "LTC": "Ł", "IOT": "Mi", "USD": "$", "EUR": "€", "GBP": "£"}
         if currency_1 in unicode_symbols.keys():
             currency_1 = unicode_symbols[currency_1]
@@ -690,10 +1043,7 @@ class Btfxbot:
         message = (
             "<pre>" f"Last price: {last_price} {currency_2}, Volume: {volume} {currency_1}\nBid:{bid} {currency_2}, Bid size: {bid_size} {currency_1}\nAsk: {ask} {currency_2}, Ask size: {ask_size} {currency_1}\n"
             f"Daily change: {daily_change} {currency_2} {daily_change_perc}%\nHIGH: {high} {currency_2}, LOW: {low} {currency_2}"
+            f"{self.format_last_trade(tradepair)}"
             "</pre>")
-        try:
-            bot.send_message(chat_id, text=message, parse_mode='HTML')
-        except(TimedOut, TelegramError) as error:
-            LOGGER.info(f"coult not send message to {chat_id}")
-            LOGGER.warning(error)
+        return message
 
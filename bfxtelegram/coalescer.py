@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Coalescing of high frequency websocket updates
+"""
+
+import threading
+
+
+class Coalescer:
+    """
+        Keeps only the latest message for every key and hands it to flush_func
+        once the window that started with the first pending update has elapsed.
+        Keys are tuples starting with the message type or group, followed by the entity id
+    """
+    def __init__(self, flush_func, window=1.0):
+        self.flush_func = flush_func
+        self.window = window
+        self.lock = threading.Lock()
+        self.pending = {}
+
+    def push(self, msg_type, key, message):
+        if self.window <= 0:
+            self.flush_func(msg_type, key, message)
+            return
+        with self.lock:
+            first = key not in self.pending
+            self.pending[key] = (msg_type, message)
+        if first:
+            timer = threading.Timer(self.window, self.flush, [key])
+            timer.daemon = True
+            timer.start()
+
+    def discard(self, key):
+        with self.lock:
+            self.pending.pop(key, None)
+
+    def flush(self, key):
+        with self.lock:
+            entry = self.pending.pop(key, None)
+        if entry is not None:
+            msg_type, message = entry
+            self.flush_func(msg_type, key, message)
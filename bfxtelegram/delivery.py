@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Parallel delivery of telegram messages within the bot api rate limits
+"""
+
+import time
+import heapq
+import queue
+import logging
+import threading
+from collections import deque
+from telegram.error import TelegramError, RetryAfter, BadRequest, NetworkError
+from bfxtelegram import utils
+from bfxtelegram.ratelimit import TokenBucket
+from bfxtelegram.stats import STATS
+
+# Enable logging
+logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                    level=logging.ERROR)
+LOGGER = logging.getLogger(__name__)
+
+WORKERS = 8
+# telegram allows about 30 messages per second overall and 1 per second in a chat
+GLOBAL_RATE = 30
+CHAT_RATE = 1
+# queued messages beyond which low priority types are dropped first
+MAX_QUEUED = 10000
+# network errors are retried after 2, 4, 8 ... seconds, up to MAX_ATTEMPTS sends
+RETRY_BACKOFF = 2
+MAX_BACKOFF = 300
+MAX_ATTEMPTS = 8
+
+
+class Message:
+    """
+        text sent with send_func, or call() made instead when call is set.
+        queued turns False when the message is sent or dropped, dropped messages stay
+        in the queues until a worker or the eviction index reaches them
+    """
+    __slots__ = ('outbox_id', 'mtype', 'text', 'enqueued', 'frame_age', 'attempts', 'call',
+                 'queued')
+
+    def __init__(self, outbox_id, mtype, text, enqueued, frame_age=None, attempts=0, call=None):
+        self.outbox_id = outbox_id
+        self.mtype = mtype
+        self.text = text
+        self.enqueued = enqueued
+        self.frame_age = frame_age
+        self.attempts = attempts
+        self.call = call
+        self.queued = True
+
+
+class Delivery:
+    """
+        Every chat has its own queue so messages of a chat are sent in order, one at a time,
+        while different chats are served in parallel by the workers.
+        A chat is scheduled again 1 / chat_rate seconds after its last send, or after
+        the retry_after delay when telegram answers RetryAfter, other chats are not delayed.
+        Network errors keep the message first in its chat queue and retry it with backoff.
+        With an Outbox the queued messages are stored until handled and reloaded at start,
+        the writes are made in order by a writer thread so enqueue never waits for the disk
+    """
+    def __init__(self, send_func, workers=WORKERS, global_rate=GLOBAL_RATE, chat_rate=CHAT_RATE,
+                 outbox=None, max_queued=MAX_QUEUED):
+        self.send_func = send_func
+        self.chat_interval = 1 / chat_rate
+        self.bucket = TokenBucket(global_rate)
+        self.outbox = outbox
+        self.max_queued = max_queued
+        self.condition = threading.Condition()
+        # chat_id -> deque of Message
+        self.queues = {}
+        # chats with their first message being sent by a worker
+        self.sending = set()
+        # (ready monotonic time, sequence, chat_id) of the chats waiting for a worker
+        self.schedule = []
+        self.sequence = 0
+        # chat_id -> earliest monotonic time of its next send
+        self.next_send = {}
+        self.depth = 0
+        self.stopped = False
+        # messages in enqueue order, low priority ones and the others, the oldest
+        # droppable message is found without scanning every queue
+        self.evictable = {False: deque(), True: deque()}
+        # (operation, chat_id, message) handled in order by the outbox writer
+        self.outbox_writes = queue.Queue()
+        if outbox is not None:
+            now = time.monotonic()
+            for outbox_id, chat_id, mtype, text, attempts in outbox.pending():
+                self._append(chat_id, Message(outbox_id, mtype, text, now, attempts=attempts))
+            writer = threading.Thread(target=self._write_outbox, name="outbox", daemon=True)
+            writer.start()
+        self.workers = []
+        for index in range(workers):
+            worker = threading.Thread(target=self._work, name=f"delivery-{index}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def enqueue(self, chat_id, text, frame_age=None, mtype=None):
+        """
+            frame_age : seconds since the websocket frame was received, for the end to end latency
+            mtype : websocket message type, utils.LOW_PRIORITY_TYPES are dropped first when full
+        """
+        with self.condition:
+            if self.depth >= self.max_queued and not self._make_room(mtype):
+                STATS.increment("errors", "delivery dropped")
+                LOGGER.error(f"delivery queue full, dropping {mtype} message to {chat_id}")
+                return
+            message = Message(None, mtype, text, time.monotonic(), frame_age)
+            self._append(chat_id, message)
+            # queued before a worker can take the message, its remove is written after
+            self._store("add", chat_id, message)
+            self.condition.notify()
+
+    def submit(self, chat_id, call):
+        """
+            runs call(), a telegram api call for chat_id, within the same rate limits
+            and RetryAfter pauses as the messages of the chat. Calls are not kept in the outbox
+        """
+        with self.condition:
+            if self.depth >= self.max_queued and not self._make_room(None):
+                STATS.increment("errors", "delivery dropped")
+                LOGGER.error(f"delivery queue full, dropping call to {chat_id}")
+                return
+            self._append(chat_id, Message(None, None, None, time.monotonic(), call=call))
+            self.condition.notify()
+
+    def _append(self, chat_id, message):
+        chat_queue = self.queues.get(chat_id)
+        if chat_queue is None:
+            chat_queue = self.queues[chat_id] = deque()
+            self._schedule(chat_id, self.next_send.get(chat_id, 0))
+        chat_queue.append(message)
+        self.depth += 1
+        evictable = self.evictable[message.mtype not in utils.LOW_PRIORITY_TYPES]
+        evictable.append((chat_id, message))
+        # sent messages are skipped lazily, compacted before they outnumber the queued ones
+        if len(evictable) > 2 * self.depth + 64:
+            live = [(chat, queued) for chat, queued in evictable if queued.queued]
+            evictable.clear()
+            evictable.extend(live)
+
+    def _make_room(self, mtype):
+        """
+            drops the oldest low priority message, or the oldest message of any type when
+            mtype is not low priority itself. Messages being sent are kept,
+            returns False when nothing can be dropped
+        """
+        low_priority = mtype in utils.LOW_PRIORITY_TYPES
+        for important in ((False,) if low_priority else (False, True)):
+            oldest = self._oldest(self.evictable[important])
+            if oldest is not None:
+                break
+        else:
+            return False
+        chat_id, message = oldest
+        message.queued = False
+        self.depth -= 1
+        self._store("remove", chat_id, message)
+        STATS.increment("errors", "delivery dropped")
+        LOGGER.error(f"delivery queue full, dropped {message.mtype} message to {chat_id}")
+        return True
+
+    def _oldest(self, evictable):
+        """
+            removes and returns the oldest (chat_id, message) of evictable that is not being
+            sent, only the messages being sent by the workers are skipped
+        """
+        while evictable and not evictable[0][1].queued:
+            evictable.popleft()
+        for position, (chat_id, message) in enumerate(evictable):
+            if not message.queued:
+                continue
+            if chat_id in self.sending and self.queues[chat_id][0] is message:
+                continue
+            del evictable[position]
+            return chat_id, message
+        return None
+
+    def _store(self, operation, chat_id, message):
+        if self.outbox is not None and message.call is None:
+            self.outbox_writes.put((operation, chat_id, message))
+
+    def _write_outbox(self):
+        """
+            an add is always written before the failed and remove of the same message
+        """
+        while True:
+            operation, chat_id, message = self.outbox_writes.get()
+            try:
+                if operation == "add":
+                    message.outbox_id = self.outbox.add(chat_id, message.mtype, message.text)
+                elif message.outbox_id is None:
+                    pass
+                elif operation == "failed":
+                    self.outbox.failed(message.outbox_id)
+                else:
+                    self.outbox.remove(message.outbox_id)
+            except Exception:
+                STATS.increment("errors", "outbox write")
+                LOGGER.exception(f"outbox {operation} failed for a message to {chat_id}")
+            finally:
+                self.outbox_writes.task_done()
+
+    def _schedule(self, chat_id, ready):
+        self.sequence += 1
+        heapq.heappush(self.schedule, (ready, self.sequence, chat_id))
+
+    def _next_chat(self):
+        with self.condition:
+            while True:
+                if self.stopped:
+                    return None
+                now = time.monotonic()
+                if self.schedule and self.schedule[0][0] <= now:
+                    chat_id = heapq.heappop(self.schedule)[2]
+                    chat_queue = self.queues.get(chat_id)
+                    while chat_queue and not chat_queue[0].queued:
+                        chat_queue.popleft()
+                    if chat_queue:
+                        self.sending.add(chat_id)
+                        return chat_id
+                    # every message of the chat was dropped
+                    self.queues.pop(chat_id, None)
+                    continue
+                timeout = self.schedule[0][0] - now if self.schedule else None
+                self.condition.wait(timeout)
+
+    def _work(self):
+        while True:
+            chat_id = self._next_chat()
+            if chat_id is None:
+                return
+            self.bucket.acquire()
+            with self.condition:
+                message = self.queues[chat_id][0]
+            started = time.monotonic()
+            STATS.observe("delivery wait", started - message.enqueued)
+            delay = self.chat_interval
+            sent = True
+            try:
+                if message.call is not None:
+                    message.call()
+                else:
+                    self.send_func(chat_id, message.text)
+            except RetryAfter as error:
+                # the message stays first in the chat queue
+                STATS.increment("errors", "telegram retry after")
+                LOGGER.info(f"delivery to {chat_id} paused for {error.retry_after}s")
+                delay = max(delay, error.retry_after)
+                sent = False
+            except BadRequest as error:
+                # retrying would be rejected again
+                STATS.increment("errors", "telegram send")
+                LOGGER.error(f"telegram rejected message to {chat_id} : {error}")
+            except NetworkError as error:
+                STATS.increment("errors", "telegram send")
+                message.attempts += 1
+                if message.attempts < MAX_ATTEMPTS:
+                    backoff = min(MAX_BACKOFF, RETRY_BACKOFF * 2 ** (message.attempts - 1))
+                    delay = max(delay, backoff)
+                    LOGGER.info(f"message to {chat_id} failed : {error}, retry in {delay}s")
+                    self._store("failed", chat_id, message)
+                    sent = False
+                else:
+                    LOGGER.error(f"coult not send message to {chat_id} : {error}")
+            except TelegramError as error:
+                STATS.increment("errors", "telegram send")
+                LOGGER.error(f"coult not send message to {chat_id} : {error}")
+            except Exception:
+                # keep the worker alive, the message is dropped
+                STATS.increment("errors", "telegram send")
+                LOGGER.exception(f"unexpected error while sending to {chat_id}")
+            else:
+                finished = time.monotonic()
+                STATS.observe("telegram send", finished - started)
+                if message.frame_age is not None:
+                    STATS.observe("ws end to end", message.frame_age + finished - message.enqueued)
+            if sent:
+                self._store("remove", chat_id, message)
+            with self.condition:
+                self.sending.discard(chat_id)
+                chat_queue = self.queues[chat_id]
+                if sent:
+                    chat_queue.popleft()
+                    message.queued = False
+                    self.depth -= 1
+                while chat_queue and not chat_queue[0].queued:
+                    chat_queue.popleft()
+                ready = time.monotonic() + delay
+                self.next_send[chat_id] = ready
+                if chat_queue:
+                    self._schedule(chat_id, ready)
+                    self.condition.notify()
+                else:
+                    del self.queues[chat_id]
+
+    def join(self, timeout=None):
+        """
+            waits until every queued message is handled and written to the outbox,
+            returns False on timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self.condition:
+                if not self.depth and not self.outbox_writes.unfinished_tasks:
+                    return True
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+
+    def stop(self, timeout=None):
+        """
+            sends the queued messages for up to timeout seconds then ends the workers,
+            the messages left stay in the outbox. Returns False when some were left
+        """
+        drained = self.join(timeout)
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        return drained
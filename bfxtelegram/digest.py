@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Digest delivery : the messages of a chat are combined into one message per interval
+"""
+
+import time
+import threading
+from datetime import datetime
+
+# telegram rejects longer messages, bigger digests are split
+MAX_MESSAGE_LENGTH = 4096
+
+
+class Digest:
+    """
+        Messages added for a chat are kept until interval seconds after the first one,
+        then handed to flush_func(chat_id, text) as one or more combined messages.
+        Messages added with the same key (position, wallet, order) replace the previous one
+    """
+    def __init__(self, flush_func):
+        self.flush_func = flush_func
+        self.lock = threading.Lock()
+        # chat_id -> {"started": unix time, "entries": {key: text}, "count": messages added}
+        self.pending = {}
+        self.sequence = 0
+
+    def add(self, chat_id, interval, text, key=None):
+        with self.lock:
+            digest = self.pending.get(chat_id)
+            first = digest is None
+            if first:
+                digest = self.pending[chat_id] = {"started": time.time(), "entries": {}, "count": 0}
+            if key is None:
+                self.sequence += 1
+                key = ("message", self.sequence)
+            # a replaced entry moves to the end, its latest state is listed last
+            digest["entries"].pop(key, None)
+            digest["entries"][key] = text
+            digest["count"] += 1
+        if first:
+            timer = threading.Timer(interval, self.flush, [chat_id])
+            timer.daemon = True
+            timer.start()
+
+    def flush(self, chat_id):
+        with self.lock:
+            digest = self.pending.pop(chat_id, None)
+        if digest is None:
+            return
+        since = datetime.fromtimestamp(digest["started"]).strftime('%H:%M:%S')
+        header = f"<b>digest : {digest['count']} updates since {since}</b>"
+        for text in self.combine(header, list(digest["entries"].values())):
+            self.flush_func(chat_id, text)
+
+    @staticmethod
+    def combine(header, texts):
+        """
+            joins the texts under header in messages shorter than MAX_MESSAGE_LENGTH,
+            a text is never split so the html of every message stays valid
+        """
+        messages = []
+        current = header
+        for text in texts:
+            if current != header and len(current) + 1 + len(text) > MAX_MESSAGE_LENGTH:
+                messages.append(current)
+                current = header
+            current = f"{current}\n{text}"
+        messages.append(current)
+        return messages
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+In memory book of funding offers, credits and loans
+built from the fo*, fc* and fl* websocket messages
+"""
+
+import threading
+from datetime import datetime
+
+# message type prefix -> kind of funding entry
+FUNDING_KINDS = {"fo": "offers", "fc": "credits", "fl": "loans"}
+
+# position of the fields inside the websocket arrays
+FIELDS = {
+    "offers": {"symbol": 1, "amount": 4, "status": 10, "rate": 14, "period": 15},
+    "credits": {"symbol": 1, "amount": 5, "status": 7, "rate": 11, "period": 12, "opening": 13},
+    "loans": {"symbol": 1, "amount": 5, "status": 7, "rate": 11, "period": 12, "opening": 13},
+}
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+
+class FundingBook:
+    """
+        Funding entries are indexed by id and by funding symbol (fUSD, fBTC ...)
+        Snapshots replace the whole book of a kind, new/update messages upsert
+        an entry and close/cancel messages remove it
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {kind: {} for kind in FUNDING_KINDS.values()}
+        self.by_symbol = {kind: {} for kind in FUNDING_KINDS.values()}
+
+    def update(self, msg_type, data):
+        kind = FUNDING_KINDS.get(msg_type[:2])
+        if kind is None or data is None:
+            return
+        action = msg_type[2]
+        with self.lock:
+            if action == 's':
+                self.entries[kind] = {}
+                self.by_symbol[kind] = {}
+                for entry in data:
+                    self._add(kind, entry)
+            elif action in ('n', 'u'):
+                self._add(kind, data)
+            elif action == 'c':
+                self._remove(kind, data[0])
+
+    def _add(self, kind, entry):
+        # an entry can be repeated or move to another symbol, drop the previous index first
+        self._remove(kind, entry[0])
+        fields = FIELDS[kind]
+        parsed = {
+            "id": entry[0],
+            "symbol": entry[fields["symbol"]],
+            "amount": entry[fields["amount"]] or 0,
+            "status": entry[fields["status"]],
+            "rate": entry[fields["rate"]] or 0,
+            "period": entry[fields["period"]] or 0,
+            "expires": None
+        }
+        if "opening" in fields and entry[fields["opening"]]:
+            parsed["expires"] = entry[fields["opening"]] + parsed["period"] * DAY_MS
+        self.entries[kind][parsed["id"]] = parsed
+        self.by_symbol[kind].setdefault(parsed["symbol"], set()).add(parsed["id"])
+
+    def _remove(self, kind, entry_id):
+        entry = self.entries[kind].pop(entry_id, None)
+        if entry is None:
+            return
+        ids = self.by_symbol[kind][entry["symbol"]]
+        ids.discard(entry_id)
+        if not ids:
+            del self.by_symbol[kind][entry["symbol"]]
+
+    def totals(self, kind):
+        """
+            returns a dictionary symbol -> (count, total amount, weighted average rate, next expiry)
+        """
+        totals = {}
+        with self.lock:
+            for symbol, ids in self.by_symbol[kind].items():
+                entries = [self.entries[kind][entry_id] for entry_id in ids]
+                amount = sum(abs(entry["amount"]) for entry in entries)
+                weighted = sum(abs(entry["amount"]) * entry["rate"] for entry in entries)
+                expiries = [entry["expires"] for entry in entries if entry["expires"]]
+                totals[symbol] = (
+                    len(entries),
+                    amount,
+                    weighted / amount if amount else 0,
+                    min(expiries) if expiries else None
+                )
+        return totals
+
+    def format_entry(self, msg_type, data):
+        kind = FUNDING_KINDS[msg_type[:2]]
+        fields = FIELDS[kind]
+        rate = (data[fields["rate"]] or 0) * 100
+        return (
+            f"{kind[:-1]} {data[0]} {data[fields['symbol']]} "
+            f"{data[fields['amount']]} @ {rate:.4f}%/day "
+            f"{data[fields['period']]}d {data[fields['status']]}"
+        )
+
+    def summary(self):
+        lines = []
+        for kind in FUNDING_KINDS.values():
+            totals = self.totals(kind)
+            if not totals:
+                continue
+            lines.append(f"{kind}")
+            for symbol, (count, amount, rate, expires) in sorted(totals.items()):
+                line = f"  {symbol[1:]:<5} {amount:.2f} in {count} @ {rate * 100:.4f}%/day"
+                if expires:
+                    expiry = datetime.utcfromtimestamp(expires / 1000).strftime('%Y-%m-%d %H:%M')
+                    line += f" next expiry {expiry}"
+                lines.append(line)
+        if not lines:
+            return "no funding offers, credits or loans"
+        return "\n".join(lines)
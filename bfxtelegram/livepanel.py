@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Live panels : one telegram message per chat and position/wallet
+that is edited in place instead of sending a new message for every update
+"""
+
+import time
+import logging
+import functools
+import threading
+from telegram.error import TelegramError, BadRequest, RetryAfter
+
+# Enable logging
+logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                    level=logging.ERROR)
+LOGGER = logging.getLogger(__name__)
+
+
+class LivePanel:
+    """
+        submit(chat_id, call) runs the telegram calls of the panels, Delivery.submit
+        keeps them within the rate limits of the messages, they are made at once without it.
+        RetryAfter is raised to submit, the call is made again after the pause
+    """
+    def __init__(self, tbot, interval=3.0, submit=None):
+        self.tbot = tbot
+        self.interval = interval
+        self.submit = submit or (lambda chat_id, call: call())
+        self.lock = threading.Lock()
+        # (chat_id, key) -> {"message_id", "text", "edited", "pending", "timer"}
+        self.panels = {}
+
+    def publish(self, chat_id, key, text):
+        """
+            Show text in the panel of chat_id identified by key.
+            Edits are throttled to one every interval seconds per panel,
+            the last text received while throttled is applied when the interval expires
+        """
+        panel_key = (chat_id, key)
+        with self.lock:
+            panel = self.panels.get(panel_key)
+            if panel is None:
+                # reserved before sending, a concurrent publish does not create a second panel
+                panel = self.panels[panel_key] = {
+                    "message_id": None,
+                    "text": text,
+                    "edited": time.monotonic(),
+                    "pending": None,
+                    "timer": None
+                }
+                create = True
+            else:
+                create = False
+                if text in (panel["text"], panel["pending"]):
+                    return
+                wait = panel["edited"] + self.interval - time.monotonic()
+                # the text of a panel being created is applied once it exists
+                if wait > 0 or panel["message_id"] is None:
+                    panel["pending"] = text
+                    if panel["timer"] is None and panel["message_id"] is not None:
+                        self._start_timer(panel_key, panel, wait)
+                    return
+                panel["text"] = text
+                panel["pending"] = None
+                panel["edited"] = time.monotonic()
+        if create:
+            self.submit(chat_id, functools.partial(self._create, panel_key, panel))
+        else:
+            self.submit(chat_id, functools.partial(self._edit, panel_key))
+
+    def _start_timer(self, panel_key, panel, wait):
+        panel["timer"] = threading.Timer(wait, self._flush, [panel_key])
+        panel["timer"].daemon = True
+        panel["timer"].start()
+
+    def _flush(self, panel_key):
+        with self.lock:
+            panel = self.panels.get(panel_key)
+            if panel is None:
+                return
+            text = panel["pending"]
+            panel["pending"] = None
+            panel["timer"] = None
+            if text is None or text == panel["text"]:
+                return
+            panel["text"] = text
+            panel["edited"] = time.monotonic()
+        self.submit(panel_key[0], functools.partial(self._edit, panel_key))
+
+    def _create(self, panel_key, panel):
+        chat_id, key = panel_key
+        try:
+            message = self.tbot.send_message(chat_id, text=panel["text"], parse_mode='HTML')
+        except RetryAfter:
+            # still reserved, created when the call is made again
+            raise
+        except TelegramError as error:
+            LOGGER.error(f"could not create live panel {key} for {chat_id} : {error}")
+            with self.lock:
+                if self.panels.get(panel_key) is panel:
+                    del self.panels[panel_key]
+            return
+        with self.lock:
+            # closed while it was being sent
+            closed = self.panels.get(panel_key) is not panel
+            panel["message_id"] = message.message_id
+            panel["edited"] = time.monotonic()
+            if not closed and panel["pending"] is not None:
+                self._start_timer(panel_key, panel, self.interval)
+        if closed:
+            self.submit(chat_id, functools.partial(self._delete, chat_id, key, message.message_id))
+            return
+        try:
+            self.tbot.pin_chat_message(chat_id, message.message_id, disable_notification=True)
+        except TelegramError:
+            # pinning is not allowed in every chat, the panel still works unpinned
+            pass
+
+    def _edit(self, panel_key):
+        """
+            shows the latest text of the panel, edits made late skip the texts in between
+        """
+        chat_id, key = panel_key
+        with self.lock:
+            panel = self.panels.get(panel_key)
+            if panel is None or panel["message_id"] is None:
+                return
+            text = panel["text"]
+            message_id = panel["message_id"]
+        try:
+            self.tbot.edit_message_text(
+                text,
+                chat_id=chat_id,
+                message_id=message_id,
+                parse_mode='HTML'
+            )
+        except RetryAfter:
+            raise
+        except BadRequest as error:
+            if 'not modified' in str(error):
+                return
+            # the panel message was deleted by the user, start a new one
+            LOGGER.info(f"live panel {key} for {chat_id} lost : {error}")
+            self.remove(chat_id, key)
+            self.publish(chat_id, key, text)
+        except TelegramError as error:
+            LOGGER.error(f"could not update live panel {key} for {chat_id} : {error}")
+
+    def _delete(self, chat_id, key, message_id):
+        try:
+            self.tbot.delete_message(chat_id, message_id)
+        except RetryAfter:
+            raise
+        except TelegramError as error:
+            LOGGER.info(f"could not delete live panel {key} for {chat_id} : {error}")
+
+    def remove(self, chat_id, key):
+        """
+            forgets the panel, its message stays in the chat
+        """
+        with self.lock:
+            panel = self.panels.pop((chat_id, key), None)
+        if panel and panel["timer"]:
+            panel["timer"].cancel()
+        return panel
+
+    def close(self, chat_id, key):
+        """
+            deletes the panel of a closed position
+        """
+        panel = self.remove(chat_id, key)
+        if panel and panel["message_id"] is not None:
+            self.submit(chat_id, functools.partial(self._delete, chat_id, key, panel["message_id"]))
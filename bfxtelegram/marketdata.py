@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Latest public market data received on the websocket public channels
+"""
+
+import threading
+from collections import deque
+from bfxtelegram.orderbook import OrderBook
+
+# channels a chat keeps open for its default pair
+DEFAULT_PAIR_CHANNELS = ('ticker', 'trades', 'candles', 'book')
+
+
+class MarketData:
+    """
+        Ticker, recent trades, hourly candles and order book per trading symbol (tIOTUSD).
+        Data for a symbol is dropped when its channel is unsubscribed
+    """
+    def __init__(self, max_trades=100, max_candles=240):
+        self.lock = threading.Lock()
+        self.max_trades = max_trades
+        self.max_candles = max_candles
+        self.tickers = {}
+        self.trades = {}
+        self.candles = {}
+        self.books = {}
+
+    def update(self, channel, symbol, data):
+        """
+            data is the websocket message without the channel id
+        """
+        with self.lock:
+            if channel == 'ticker':
+                self.tickers[symbol] = data[0]
+            elif channel == 'trades':
+                self._update_trades(symbol, data)
+            elif channel == 'candles':
+                self._update_candles(symbol, data[0])
+            elif channel == 'book':
+                self._update_book(symbol, data[0])
+
+    def verify_book(self, symbol, checksum):
+        return self.book(symbol).verify(checksum)
+
+    def _update_trades(self, symbol, data):
+        # bitfinex sends every trade twice, te as it executes then tu, only te is kept
+        if data[0] == 'tu':
+            return
+        if data[0] == 'te':
+            if symbol in self.trades:
+                self.trades[symbol].appendleft(data[1])
+            return
+        # snapshot, newest trade first
+        self.trades[symbol] = deque(data[0], maxlen=self.max_trades)
+
+    def _update_candles(self, symbol, data):
+        if data and isinstance(data[0], list):
+            self.candles[symbol] = {candle[0]: candle for candle in data}
+        elif data and symbol in self.candles:
+            self.candles[symbol][data[0]] = data
+        else:
+            return
+        candles = self.candles[symbol]
+        while len(candles) > self.max_candles:
+            del candles[min(candles)]
+
+    def _update_book(self, symbol, data):
+        book = self.books.setdefault(symbol, OrderBook())
+        if not data or isinstance(data[0], list):
+            book.snapshot(data)
+        elif book.synced.is_set():
+            book.update(*data)
+
+    def book(self, symbol):
+        with self.lock:
+            return self.books.setdefault(symbol, OrderBook())
+
+    def clear(self, channel, symbol):
+        if channel == 'book':
+            # the book object is kept so that waiting readers see the next snapshot
+            self.book(symbol).clear()
+            return
+        stores = {
+            'ticker': self.tickers,
+            'trades': self.trades,
+            'candles': self.candles
+        }
+        with self.lock:
+            stores[channel].pop(symbol, None)
+
+    def ticker(self, symbol):
+        with self.lock:
+            return self.tickers.get(symbol)
+
+    def last_trade(self, symbol):
+        with self.lock:
+            trades = self.trades.get(symbol)
+            return trades[0] if trades else None
+
+    def candles_list(self, symbol, limit):
+        """
+            returns the last limit candles, newest first, like the rest candles "hist" call
+            or None if there are not enough candles in memory
+        """
+        with self.lock:
+            candles = self.candles.get(symbol, {})
+            if len(candles) < limit:
+                return None
+            return [candles[mts] for mts in sorted(candles, reverse=True)[:limit]]
+
+    def book_orders(self, symbol, timeout=0):
+        """
+            returns the order book as a list of {'price', 'amount'} like the rest order_book call
+            waits up to timeout seconds for the snapshot, None if the book is not synced
+        """
+        book = self.book(symbol)
+        if not book.synced.wait(timeout):
+            return None
+        return book.orders()
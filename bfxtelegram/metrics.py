@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Prometheus text format endpoint on localhost for the process STATS,
+and the startup READINESS as json, 200 once every stage is ready, 503 before
+
+    curl http://127.0.0.1:9108/metrics
+    curl http://127.0.0.1:9108/health
+"""
+
+import re
+import json
+import logging
+import threading
+import socketserver
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from bfxtelegram.stats import STATS, PERCENTILES
+from bfxtelegram.readiness import READINESS
+
+# Enable logging
+logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                    level=logging.ERROR)
+LOGGER = logging.getLogger(__name__)
+
+PREFIX = "bfxtelegram"
+# label name of every counter, counters without label are plain totals
+COUNTER_LABELS = {
+    "ws_frames": "type",
+    "errors": "stage",
+    "cache_hits": "cache",
+    "cache_misses": "cache",
+    "rest_calls_coalesced": "endpoint"
+}
+
+
+def metric_name(name):
+    return re.sub(r'[^a-zA-Z0-9_]', '_', f"{PREFIX}_{name}")
+
+
+def label_value(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def render(stats=STATS):
+    """
+        histograms are exported as one summary per stage group :
+        "rest ticker" -> bfxtelegram_rest_seconds{endpoint="ticker"}, commands and other
+        stages -> bfxtelegram_latency_seconds{stage="..."}
+    """
+    histograms, counters = stats.snapshot()
+    lines = []
+
+    summaries = {}
+    for stage, values in histograms.items():
+        if stage.startswith("rest "):
+            summaries.setdefault(("rest_seconds", "endpoint"), []).append((stage[5:], values))
+        else:
+            summaries.setdefault(("latency_seconds", "stage"), []).append((stage, values))
+    for (name, label), entries in sorted(summaries.items()):
+        full_name = metric_name(name)
+        lines.append(f"# TYPE {full_name} summary")
+        for value, (count, total, percentiles) in sorted(entries):
+            label_text = f'{label}="{label_value(value)}"'
+            for fraction, percentile in zip(PERCENTILES, percentiles):
+                lines.append(f'{full_name}{{{label_text},quantile="{fraction}"}} {percentile}')
+            lines.append(f"{full_name}_sum{{{label_text}}} {total}")
+            lines.append(f"{full_name}_count{{{label_text}}} {count}")
+
+    grouped = {}
+    for (name, label), (count, _rate) in counters.items():
+        grouped.setdefault(name, []).append((label, count))
+    for name, entries in sorted(grouped.items()):
+        full_name = metric_name(f"{name}_total")
+        lines.append(f"# TYPE {full_name} counter")
+        for label, count in sorted(entries):
+            if label:
+                label_name = COUNTER_LABELS.get(name, "label")
+                lines.append(f'{full_name}{{{label_name}="{label_value(label)}"}} {count}')
+            else:
+                lines.append(f"{full_name} {count}")
+
+    for name, value in sorted(stats.gauge_values().items()):
+        full_name = metric_name(name)
+        lines.append(f"# TYPE {full_name} gauge")
+        lines.append(f"{full_name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        if path == "/metrics":
+            self.reply(200, "text/plain; version=0.0.4; charset=utf-8", render())
+        elif path == "/health":
+            ready = READINESS.is_ready()
+            health = {"ready": ready, "stages": READINESS.snapshot()}
+            self.reply(200 if ready else 503, "application/json", json.dumps(health))
+        else:
+            self.send_error(404)
+
+    def reply(self, status, content_type, text):
+        body = text.encode('utf8')
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        LOGGER.debug(format % args)
+
+
+class MetricsServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port, host="127.0.0.1"):
+        super().__init__((host, port), MetricsHandler)
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, name="metrics", daemon=True)
+        thread.start()
+        host, port = self.server_address[:2]
+        LOGGER.info(f"metrics available on http://{host}:{port}/metrics")
+        return thread
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Local L2 order book maintained from the websocket book channel (P0 precision)
+"""
+
+import zlib
+import bisect
+import threading
+from decimal import Decimal
+
+CHECKSUM_DEPTH = 25
+
+
+def checksum_number(value):
+    """
+        Bitfinex computes checksums on the javascript string of the numbers,
+        python uses the exponent notation for a different range of values
+    """
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e21:
+        return str(int(value))
+    text = repr(value)
+    if 'e' not in text:
+        return text
+    mantissa, exponent = text.split('e')
+    exponent = int(exponent)
+    if -7 < exponent < 21:
+        return format(Decimal(text), 'f')
+    sign = '+' if exponent > 0 else '-'
+    return f"{mantissa}e{sign}{abs(exponent)}"
+
+
+class OrderBook:
+    """
+        Price levels are kept in sorted arrays, best price first on both sides
+        (bid prices are stored negated), amounts are kept in a dictionary per side
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.synced = threading.Event()
+        self.bid_prices = []
+        self.ask_prices = []
+        self.bids = {}
+        self.asks = {}
+
+    def clear(self):
+        with self.lock:
+            self.synced.clear()
+            self.bid_prices = []
+            self.ask_prices = []
+            self.bids = {}
+            self.asks = {}
+
+    def snapshot(self, levels):
+        with self.lock:
+            self.bid_prices = []
+            self.ask_prices = []
+            self.bids = {}
+            self.asks = {}
+            for price, count, amount in levels:
+                self._update(price, count, amount)
+        self.synced.set()
+
+    def update(self, price, count, amount):
+        with self.lock:
+            self._update(price, count, amount)
+
+    def _update(self, price, count, amount):
+        if amount > 0:
+            side, prices, key = self.bids, self.bid_prices, -price
+        else:
+            side, prices, key = self.asks, self.ask_prices, price
+        if count == 0:
+            if side.pop(price, None) is not None:
+                del prices[bisect.bisect_left(prices, key)]
+            return
+        if price not in side:
+            bisect.insort(prices, key)
+        side[price] = amount
+
+    def checksum(self):
+        """
+            CRC32 of the top 25 bids and asks interleaved as
+            bid_price:bid_amount:ask_price:ask_amount, as a signed 32 bit integer
+        """
+        values = []
+        with self.lock:
+            for index in range(CHECKSUM_DEPTH):
+                if index < len(self.bid_prices):
+                    price = -self.bid_prices[index]
+                    values.extend((price, self.bids[price]))
+                if index < len(self.ask_prices):
+                    price = self.ask_prices[index]
+                    values.extend((price, self.asks[price]))
+        text = ":".join(checksum_number(value) for value in values)
+        checksum = zlib.crc32(text.encode('utf8'))
+        return checksum - (1 << 32) if checksum >= (1 << 31) else checksum
+
+    def verify(self, checksum):
+        return self.checksum() == checksum
+
+    def orders(self):
+        """
+            returns the book as a list of {'price', 'amount'} with string values like the
+            rest order_book call, asks first from the best price, then bids from the best price
+        """
+        with self.lock:
+            asks = [(price, -self.asks[price]) for price in self.ask_prices]
+            bids = [(-key, self.bids[-key]) for key in self.bid_prices]
+        return [
+            {'price': checksum_number(price), 'amount': checksum_number(amount)}
+            for price, amount in asks + bids
+        ]
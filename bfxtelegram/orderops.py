@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+New, update and cancel order operations sent over the authenticated websocket
+"""
+
+import time
+import threading
+from bfxtelegram.stats import STATS
+
+# seconds operations wait for other operations to share the same frame
+BATCH_WINDOW = 0.05
+# bitfinex accepts at most 75 operations in one ox_multi frame
+MAX_MULTI_OPS = 75
+# seconds after which an operation without reply is forgotten
+REPLY_TIMEOUT = 60
+# request notification sent back by bitfinex for every operation
+REPLY_TYPES = {'on-req': 'on', 'ou-req': 'ou', 'oc-req': 'oc'}
+
+
+class OrderOps:
+    """
+        Operations submitted within window seconds are sent together, in a single
+        ox_multi frame when there is more than one.
+        Every operation remembers the chat that asked for it until the matching
+        on-req, ou-req or oc-req notification arrives.
+        send_frame returns False when the socket is not connected, the operations of
+        the frame are forgotten and failed(chat_id, op, latency) is called for each
+    """
+    def __init__(self, send_frame, window=BATCH_WINDOW, failed=None):
+        self.send_frame = send_frame
+        self.window = window
+        self.failed = failed
+        self.lock = threading.Lock()
+        self.queue = []
+        self.timer = None
+        self.last_cid = 0
+        # (op, cid or order id) -> (chat_id, submitted monotonic time)
+        self.pending = {}
+
+    def new_order(self, chat_id, order_type, symbol, amount, price):
+        """
+            returns the client order id used to match the on-req notification
+        """
+        with self.lock:
+            # cids must be unique for the day, they are millisecond timestamps
+            cid = max(int(time.time() * 1000), self.last_cid + 1)
+            self.last_cid = cid
+        params = {
+            'cid': cid,
+            'type': order_type,
+            'symbol': symbol,
+            'amount': str(amount),
+            'price': str(price)
+        }
+        self._submit(chat_id, 'on', cid, params)
+        return cid
+
+    def update_order(self, chat_id, order_id, **settings):
+        params = {'id': order_id}
+        params.update({name: str(value) for name, value in settings.items()})
+        self._submit(chat_id, 'ou', order_id, params)
+
+    def cancel_order(self, chat_id, order_id):
+        self._submit(chat_id, 'oc', order_id, {'id': order_id})
+
+    def _submit(self, chat_id, op, op_key, params):
+        now = time.monotonic()
+        with self.lock:
+            self._expire(now)
+            self.pending[(op, op_key)] = (chat_id, now)
+            self.queue.append([op, params])
+            if self.window <= 0:
+                operations, self.queue = self.queue, []
+            elif self.timer is None:
+                operations = None
+                self.timer = threading.Timer(self.window, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+            else:
+                operations = None
+        if operations:
+            self._send(operations)
+
+    def _expire(self, now):
+        expired = [key for key, (_chat, sent) in self.pending.items() if now - sent > REPLY_TIMEOUT]
+        for key in expired:
+            del self.pending[key]
+
+    def flush(self):
+        with self.lock:
+            operations, self.queue = self.queue, []
+            self.timer = None
+        if operations:
+            self._send(operations)
+
+    def _send(self, operations):
+        if len(operations) == 1:
+            op, params = operations[0]
+            if self.send_frame([0, op, None, params]) is False:
+                self._fail(operations)
+            return
+        for start in range(0, len(operations), MAX_MULTI_OPS):
+            batch = operations[start:start + MAX_MULTI_OPS]
+            if self.send_frame([0, 'ox_multi', None, batch]) is False:
+                self._fail(batch)
+
+    def _fail(self, operations):
+        now = time.monotonic()
+        failed = []
+        with self.lock:
+            for op, params in operations:
+                op_key = params['cid'] if op == 'on' else params['id']
+                entry = self.pending.pop((op, op_key), None)
+                if entry is not None:
+                    failed.append((entry[0], op, now - entry[1]))
+        STATS.increment("errors", "order not sent")
+        if self.failed is not None:
+            for chat_id, op, latency in failed:
+                self.failed(chat_id, op, latency)
+
+    def reply(self, msg_type, order):
+        """
+            order is the order array of an on-req, ou-req or oc-req notification
+            returns (chat_id, latency in seconds) of the operation or None
+            when the operation was not sent by the bot
+        """
+        op = REPLY_TYPES.get(msg_type)
+        if op is None or not order:
+            return None
+        # new orders only have an id once accepted, they are matched on the client id
+        op_key = order[2] if op == 'on' else order[0]
+        with self.lock:
+            entry = self.pending.pop((op, op_key), None)
+            if entry is None:
+                return None
+        chat_id, submitted = entry
+        latency = time.monotonic() - submitted
+        STATS.observe(f"order {op}", latency)
+        return chat_id, latency
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+SQLite outbox keeping the notifications that are not delivered yet across restarts
+"""
+
+import time
+import sqlite3
+import threading
+from bfxtelegram import utils
+
+
+class Outbox:
+    """
+        Every queued message is a row until it is delivered or dropped,
+        pending() returns them in the order they were added
+    """
+    def __init__(self, path):
+        utils.ensure_dir(path)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " chat_id INTEGER NOT NULL,"
+            " mtype TEXT,"
+            " text TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " created REAL NOT NULL)"
+        )
+
+    def add(self, chat_id, mtype, text):
+        with self.lock:
+            cursor = self.connection.execute(
+                "INSERT INTO outbox (chat_id, mtype, text, created) VALUES (?, ?, ?, ?)",
+                (chat_id, mtype, text, time.time())
+            )
+            return cursor.lastrowid
+
+    def failed(self, outbox_id):
+        with self.lock:
+            self.connection.execute(
+                "UPDATE outbox SET attempts = attempts + 1 WHERE id = ?", (outbox_id,)
+            )
+
+    def remove(self, outbox_id):
+        with self.lock:
+            self.connection.execute("DELETE FROM outbox WHERE id = ?", (outbox_id,))
+
+    def pending(self):
+        """
+            returns a list of (id, chat_id, mtype, text, attempts)
+        """
+        with self.lock:
+            return self.connection.execute(
+                "SELECT id, chat_id, mtype, text, attempts FROM outbox ORDER BY id"
+            ).fetchall()
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Token bucket rate limiter and the scheduler of the bitfinex rest calls
+"""
+
+import time
+import heapq
+import threading
+from bfxtelegram.stats import STATS
+
+# lanes of RestScheduler, lower goes first
+HIGH = 0
+LOW = 1
+LANE_NAMES = {HIGH: "high", LOW: "low"}
+
+
+class TokenBucket:
+    """
+        rate tokens are added every second up to capacity,
+        acquire blocks until a token is available
+    """
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def peek(self, keep=0):
+        """
+            returns the seconds until a token can be taken leaving keep tokens, 0 if it can now
+        """
+        with self.lock:
+            self._refill(time.monotonic())
+            if self.tokens >= 1 + keep:
+                return 0
+            return (1 + keep - self.tokens) / self.rate
+
+    def try_acquire(self, keep=0):
+        """
+            takes a token when one is available besides keep,
+            returns 0 on success or the seconds to wait for the next token
+        """
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self.tokens >= 1 + keep:
+                self.tokens -= 1
+                return 0
+            return (1 + keep - self.tokens) / self.rate
+
+    def acquire(self):
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            time.sleep(wait)
+
+
+class RestScheduler:
+    """
+        Every call waits for a token of its endpoint bucket and of the global bucket.
+        Calls of an endpoint are served by lane then in order. The low lane leaves
+        reserved global tokens to the high lane and waits while high lane calls wait,
+        so a burst of charts can delay trading calls by one request at most.
+        Callers block instead of getting rate limit errors from bitfinex
+    """
+    def __init__(self, rate_limits, default_rate, global_rate, reserved):
+        """
+            rates are requests per minute, rate_limits maps an endpoint to its rate
+        """
+        self.rate_limits = rate_limits
+        self.default_rate = default_rate
+        self.global_bucket = TokenBucket(global_rate / 60, capacity=global_rate)
+        self.reserved = reserved
+        self.condition = threading.Condition()
+        # endpoint -> TokenBucket
+        self.buckets = {}
+        # endpoint -> heap of (lane, sequence) of the waiting calls
+        self.waiting = {}
+        self.sequence = 0
+        self.high_waiting = 0
+        self.depth = 0
+
+    def _bucket(self, endpoint, name):
+        bucket = self.buckets.get(endpoint)
+        if bucket is None:
+            rate = self.rate_limits.get(name, self.default_rate)
+            bucket = self.buckets[endpoint] = TokenBucket(rate / 60, capacity=rate)
+        return bucket
+
+    def _wait_time(self, bucket, waiters, waiter):
+        """
+            seconds until waiter may go, None until another call goes first
+        """
+        lane = waiter[0]
+        if waiters[0] != waiter or (lane == LOW and self.high_waiting):
+            return None
+        keep = self.reserved if lane == LOW else 0
+        return max(bucket.peek(), self.global_bucket.peek(keep))
+
+    def acquire(self, endpoint, lane, name=None):
+        """
+            blocks until the call may be sent,
+            name is the rest method when endpoint also holds the account
+        """
+        queued = time.monotonic()
+        with self.condition:
+            bucket = self._bucket(endpoint, name or endpoint)
+            self.sequence += 1
+            waiter = (lane, self.sequence)
+            waiters = self.waiting.setdefault(endpoint, [])
+            heapq.heappush(waiters, waiter)
+            self.depth += 1
+            if lane == HIGH:
+                self.high_waiting += 1
+            try:
+                while True:
+                    wait = self._wait_time(bucket, waiters, waiter)
+                    if wait == 0:
+                        break
+                    self.condition.wait(wait)
+                bucket.try_acquire()
+                self.global_bucket.try_acquire(self.reserved if lane == LOW else 0)
+            finally:
+                waiters.remove(waiter)
+                heapq.heapify(waiters)
+                self.depth -= 1
+                if lane == HIGH:
+                    self.high_waiting -= 1
+                self.condition.notify_all()
+        STATS.observe(f"rest queue {LANE_NAMES[lane]}", time.monotonic() - queued)
+
+    def call(self, endpoint, lane, name, func, *args, **kwargs):
+        self.acquire(endpoint, lane, name)
+        return func(*args, **kwargs)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Startup stages of the process and their state, served on /health and listed in /stats
+"""
+
+import time
+import threading
+
+PENDING = "pending"
+STARTING = "starting"
+READY = "ready"
+FAILED = "failed"
+
+
+class Readiness:
+    """
+        Named stages ("userdata", "symbols", "telegram", "websocket main") going from
+        pending to starting to ready or failed. A websocket goes back to starting
+        when it reconnects
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        # name -> {"state": ..., "since": monotonic time of the last change, "detail": ...}
+        self.stages = {}
+
+    def add(self, *names):
+        for name in names:
+            self.set(name, PENDING)
+
+    def set(self, name, state, detail=None):
+        with self.lock:
+            self.stages[name] = {"state": state, "since": time.monotonic(), "detail": detail}
+
+    def run(self, name, func, *args, **kwargs):
+        """
+            returns func(*args, **kwargs) with name starting while it runs,
+            ready when it returns and failed when it raises
+        """
+        self.set(name, STARTING)
+        try:
+            result = func(*args, **kwargs)
+        except Exception as error:
+            self.set(name, FAILED, str(error))
+            raise
+        self.set(name, READY)
+        return result
+
+    def state(self, name):
+        with self.lock:
+            stage = self.stages.get(name)
+            return stage["state"] if stage else None
+
+    def is_ready(self, *names):
+        """
+            every stage is ready when no name is given
+        """
+        with self.lock:
+            states = [self.stages.get(name, {}).get("state") for name in names] if names else \
+                [stage["state"] for stage in self.stages.values()]
+        return all(state == READY for state in states)
+
+    def snapshot(self):
+        """
+            returns {name: {"state": ..., "seconds": in this state, "detail": ...}}
+        """
+        now = time.monotonic()
+        with self.lock:
+            return {
+                name: {
+                    "state": stage["state"],
+                    "seconds": round(now - stage["since"], 3),
+                    "detail": stage["detail"]
+                }
+                for name, stage in self.stages.items()
+            }
+
+    def report(self):
+        lines = ["readiness (state, seconds)"]
+        for name, stage in sorted(self.snapshot().items()):
+            line = f"{name} {stage['state']} {stage['seconds']:.1f}"
+            if stage["detail"]:
+                line = f"{line}\n  {stage['detail']}"
+            lines.append(line)
+        return "\n".join(lines)
+
+
+# startup stages of the process
+READINESS = Readiness()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Record and replay of the raw websocket frames received by Bfxwss
+
+replay a recording without network :
+    python -m bfxtelegram.recorder frames.jsonl.gz --speed 0
+"""
+
+import sys
+import gzip
+import json
+import time
+import argparse
+import threading
+
+# seconds and frames between two writes of the recording file
+FLUSH_INTERVAL = 1.0
+FLUSH_FRAMES = 1000
+
+
+class FrameRecorder:
+    """
+        Appends every frame to a gzip file, one json line per frame :
+        [unix timestamp, connection, frame]
+        connection is "auth" for the authenticated channel or channel_symbol for public ones
+        The frames are buffered and every flush writes them as a complete gzip member,
+        a crash or a restart appending to the file loses only the frames not flushed
+    """
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, 'ab')
+        self.lines = []
+        self.flushed = time.monotonic()
+
+    def record(self, connection, frame):
+        line = json.dumps([time.time(), connection, frame])
+        with self.lock:
+            self.lines.append(line + "\n")
+            if (len(self.lines) >= FLUSH_FRAMES
+                    or time.monotonic() - self.flushed > FLUSH_INTERVAL):
+                self._flush()
+
+    def _flush(self):
+        if self.lines:
+            self.file.write(gzip.compress("".join(self.lines).encode('utf8')))
+            self.file.flush()
+            self.lines = []
+        self.flushed = time.monotonic()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def close(self):
+        with self.lock:
+            if self.file.closed:
+                return
+            self._flush()
+            self.file.close()
+
+
+def read_frames(path):
+    with gzip.open(path, 'rt', encoding='utf8') as frames_file:
+        try:
+            for line in frames_file:
+                yield json.loads(line)
+        except EOFError:
+            # the last member was cut by a crash while it was written
+            return
+
+
+def replay(path, wss, speed=1.0):
+    """
+        Feeds a recording to a Bfxwss created with autostart=False.
+        speed 1.0 keeps the recorded timing, 2.0 is twice as fast, 0 is as fast as possible
+        returns the number of frames and the elapsed seconds
+    """
+    started = time.monotonic()
+    first_timestamp = None
+    frames = 0
+    for timestamp, connection, frame in read_frames(path):
+        if first_timestamp is None:
+            first_timestamp = timestamp
+        if speed:
+            delay = (timestamp - first_timestamp) / speed - (time.monotonic() - started)
+            if delay > 0:
+                time.sleep(delay)
+        if connection == "auth":
+            wss._auth_messages(frame)
+        else:
+            channel, symbol = connection.split('_', 1)
+            wss._public_messages(channel, symbol, frame)
+        frames += 1
+    return frames, time.monotonic() - started
+
+
+def main(argv=None):
+    # imported here so that recording does not depend on the websocket client
+    from bfxtelegram.bfxwss import Bfxwss
+
+    parser = argparse.ArgumentParser(description="replay recorded websocket frames")
+    parser.add_argument("path", help="recording written by FrameRecorder")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="replay speed, 0 replays as fast as possible")
+    parser.add_argument("--output", help="write the formatted telegram messages to this file")
+    args = parser.parse_args(argv)
+
+    messages = []
+
+    def send_to_users(mtype, message, key=None):
+        messages.append(f"{mtype} {message}")
+
+    # no coalescing window so every formatted message is counted synchronously
+    wss = Bfxwss(send_to_users, coalesce_window=0, autostart=False)
+    frames, elapsed = replay(args.path, wss, speed=args.speed)
+    rate = frames / elapsed if elapsed else 0
+    print(f"{frames} frames, {len(messages)} messages in {elapsed:.3f}s ({rate:.0f} frames/s)")
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write("\n".join(messages) + "\n")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
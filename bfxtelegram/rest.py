@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Instrumented access to the bitfinex rest clients
+"""
+
+import time
+import functools
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from bitfinex import ClientV1 as Client
+from bitfinex import ClientV2 as Client2
+from bitfinex.rest import restv1, restv2
+from bfxtelegram.stats import STATS
+from bfxtelegram.ratelimit import RestScheduler, HIGH, LOW
+
+# keep alive connections per host, about the threads calling the rest api at once
+POOL_SIZE = 16
+# seconds to connect and to wait for the response
+TIMEOUT = (3.05, 10)
+# GET requests are retried on connection errors and gateway errors, POST only when
+# the connection could not be opened so an order is never sent twice
+RETRIES = Retry(
+    total=3,
+    connect=2,
+    read=2,
+    status=2,
+    backoff_factor=0.2,
+    status_forcelist=(502, 503, 504),
+    allowed_methods=frozenset(["GET"]),
+    raise_on_status=False
+)
+
+
+class Transport:
+    """
+        requests session shared by the rest clients, connections are pooled per host
+        and kept alive between calls
+    """
+    def __init__(self, pool_size=POOL_SIZE, timeout=TIMEOUT, retries=RETRIES):
+        self.timeout = timeout
+        self.adapter = HTTPAdapter(pool_maxsize=pool_size, max_retries=retries)
+        self.session = requests.Session()
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+
+    def get(self, url, params=None):
+        return self.session.get(url, params=params, timeout=self.timeout)
+
+    def post(self, url, headers=None, data=None):
+        return self.session.post(url, headers=headers, data=data, timeout=self.timeout)
+
+    def connection_stats(self):
+        """
+            returns (connections opened, requests sent) over every host pool
+        """
+        pools = self.adapter.poolmanager.pools
+        opened = sent = 0
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                opened += pool.num_connections
+                sent += pool.num_requests
+        return opened, sent
+
+
+TRANSPORT = Transport()
+STATS.gauge("rest_connections_opened", lambda: TRANSPORT.connection_stats()[0])
+STATS.gauge("rest_requests_sent", lambda: TRANSPORT.connection_stats()[1])
+
+
+def _json_response(response, exception, accepted=(200,)):
+    if response.status_code in accepted:
+        return response.json()
+    try:
+        content = response.json()
+    except ValueError:
+        content = response.text
+    raise exception(response.status_code, response.reason, content)
+
+
+class PooledClient(Client):
+    """
+        ClientV1 sending its requests through a Transport
+    """
+    def __init__(self, key=None, secret=None, transport=TRANSPORT):
+        super().__init__(key, secret)
+        self.transport = transport
+
+    def _get(self, url):
+        return _json_response(self.transport.get(url), restv1.BitfinexException)
+
+    def _post(self, endoint, payload, verify=True):
+        url = self.url_for(path=endoint)
+        response = self.transport.post(url, headers=self._sign_payload(payload))
+        # order errors come back as 400 with a message
+        return _json_response(response, restv1.BitfinexException, accepted=(200, 400))
+
+
+class PooledClient2(Client2):
+    """
+        ClientV2 sending its requests through a Transport
+    """
+    def __init__(self, key=None, secret=None, transport=TRANSPORT):
+        super().__init__(key, secret)
+        self.transport = transport
+
+    def _get(self, path, **params):
+        response = self.transport.get(self.base_url + path, params=params)
+        return _json_response(response, restv2.BitfinexException)
+
+    def _post(self, path, payload, verify=False):
+        headers = self._headers(path, self._nonce(), payload)
+        response = self.transport.post(self.base_url + path, headers=headers, data=payload)
+        return _json_response(response, restv2.BitfinexException)
+
+
+# seconds a rest result is reused, other endpoints are always called
+CACHE_TTLS = {
+    "ticker": 1,
+    "tickers": 1,
+    "order_book": 5,
+    "candles": 10,
+    "symbols": 3600,
+    "active_orders": 2,
+    "active_positions": 2,
+    "balances": 2,
+}
+# endpoints holding the state of an account, cached per account
+ACCOUNT_ENDPOINTS = {"active_orders", "active_positions", "balances"}
+# websocket messages and rest calls after which cached account endpoints are stale
+INVALIDATES = {
+    "os": ("active_orders",),
+    "on": ("active_orders",),
+    "ou": ("active_orders",),
+    "oc": ("active_orders",),
+    "te": ("active_orders", "active_positions", "balances"),
+    "tu": ("active_orders", "active_positions", "balances"),
+    "ps": ("active_positions",),
+    "pn": ("active_positions",),
+    "pu": ("active_positions",),
+    "pc": ("active_positions",),
+    "ws": ("balances",),
+    "wu": ("balances",),
+    "place_order": ("active_orders", "balances"),
+    "place_multiple_orders": ("active_orders", "balances"),
+    "replace_order": ("active_orders", "balances"),
+    "delete_order": ("active_orders", "balances"),
+    "delete_multiple_orders": ("active_orders", "balances"),
+    "delete_all_orders": ("active_orders", "balances"),
+    "submit_order": ("active_orders", "balances"),
+    "cancel_order": ("active_orders", "balances"),
+    "close_position": ("active_positions", "balances"),
+    "transfer_between_wallets": ("balances",),
+}
+# expired entries are purged when the cache grows beyond
+MAX_CACHE_ENTRIES = 1000
+
+
+class RestCache:
+    """
+        Read through cache of rest results keyed by (version, account, endpoint, arguments).
+        Concurrent misses of a key wait for the first call instead of calling again.
+        Results are shared, callers must not modify them
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        # key -> (expires monotonic time, result)
+        self.entries = {}
+        # key -> Event set when the call of the first miss returns
+        self.loading = {}
+        # account -> invalidations, results loaded across an invalidation are not stored
+        self.generations = {}
+
+    def get(self, key, ttl, load):
+        endpoint = f"rest {key[2]}"
+        while True:
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry is not None and entry[0] > time.monotonic():
+                    STATS.increment("cache_hits", endpoint)
+                    return entry[1]
+                loading = self.loading.get(key)
+                if loading is None:
+                    loading = self.loading[key] = threading.Event()
+                    generation = self.generations.get(key[1], 0)
+                    break
+            # another thread is calling the endpoint, use its result
+            loading.wait()
+            STATS.increment("rest_calls_coalesced", key[2])
+        STATS.increment("cache_misses", endpoint)
+        try:
+            result = load()
+            with self.lock:
+                if self.generations.get(key[1], 0) == generation:
+                    self._purge()
+                    self.entries[key] = (time.monotonic() + ttl, result)
+            return result
+        finally:
+            with self.lock:
+                del self.loading[key]
+            loading.set()
+
+    def _purge(self):
+        if len(self.entries) < MAX_CACHE_ENTRIES:
+            return
+        now = time.monotonic()
+        for key in [key for key, (expires, _result) in self.entries.items() if expires <= now]:
+            del self.entries[key]
+
+    def invalidate(self, account, endpoints):
+        with self.lock:
+            self.generations[account] = self.generations.get(account, 0) + 1
+            for key in [key for key in self.entries if key[1] == account and key[2] in endpoints]:
+                del self.entries[key]
+
+
+REST_CACHE = RestCache()
+
+
+class CachedClient:
+    """
+        Wraps a rest client, CACHE_TTLS endpoints are read through cache,
+        INVALIDATES calls drop the cached state of the account
+    """
+    def __init__(self, client, version, account, cache=REST_CACHE):
+        self.client = client
+        self.version = version
+        self.account = account
+        self.cache = cache
+
+    def __getattr__(self, name):
+        attribute = getattr(self.client, name)
+        if not callable(attribute):
+            return attribute
+        if name in INVALIDATES:
+            return self._invalidating(name, attribute)
+        if name not in CACHE_TTLS:
+            return attribute
+        return self._cached(name, attribute)
+
+    def _cached(self, name, method):
+        account = self.account if name in ACCOUNT_ENDPOINTS else None
+
+        def wrapper(*args, **kwargs):
+            key = (self.version, account, name, args, tuple(sorted(kwargs.items())))
+            try:
+                hash(key)
+            except TypeError:
+                return method(*args, **kwargs)
+            return self.cache.get(key, CACHE_TTLS[name], lambda: method(*args, **kwargs))
+        return wrapper
+
+    def _invalidating(self, name, method):
+        def wrapper(*args, **kwargs):
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.cache.invalidate(self.account, INVALIDATES[name])
+        return wrapper
+
+
+# rest calls of the trading commands, they use the high lane of the scheduler. Orders
+# are sent on the websocket, these are the account reads the order buttons and
+# /getbalance answer from and the price alerts
+TRADING_CALLS = {
+    "active_orders", "active_positions", "balances", "alert_set", "alert_delete"
+}
+# public calls are limited per ip, the others per api key so per account
+PUBLIC_CALLS = {
+    "platform_status", "ticker", "tickers", "order_book", "candles", "trades", "stats",
+    "symbols", "symbols_details", "lendbook", "lends", "today", "books"
+}
+# requests per minute allowed by bitfinex for an endpoint, DEFAULT_RATE for the others
+RATE_LIMITS = {
+    "ticker": 30,
+    "tickers": 30,
+    "order_book": 30,
+    "books": 30,
+    "candles": 30,
+    "trades": 30,
+    "symbols": 5,
+    "symbols_details": 5,
+}
+DEFAULT_RATE = 90
+# requests per minute of the whole process, the low lane leaves RESERVED of them to the
+# trading calls
+GLOBAL_RATE = 90
+RESERVED = 10
+
+SCHEDULER = RestScheduler(RATE_LIMITS, DEFAULT_RATE, GLOBAL_RATE, RESERVED)
+STATS.gauge("rest_waiting", lambda: SCHEDULER.depth)
+
+
+class ScheduledClient:
+    """
+        Wraps a rest client, every call waits for its turn in the scheduler,
+        TRADING_CALLS in the high lane and the others in the low lane
+    """
+    def __init__(self, client, account, scheduler=SCHEDULER):
+        self.client = client
+        self.account = account
+        self.scheduler = scheduler
+
+    def __getattr__(self, name):
+        attribute = getattr(self.client, name)
+        if not callable(attribute):
+            return attribute
+        lane = HIGH if name in TRADING_CALLS else LOW
+        endpoint = name if name in PUBLIC_CALLS else f"{self.account} {name}"
+        return functools.partial(self.scheduler.call, endpoint, lane, name, attribute)
+
+
+class TimedClient:
+    """
+        Wraps a ClientV1 or ClientV2, every method call is timed in the
+        "rest <method>" stage and counted as an error when it raises
+    """
+    def __init__(self, client):
+        self.client = client
+
+    def __getattr__(self, name):
+        attribute = getattr(self.client, name)
+        if not callable(attribute):
+            return attribute
+        return STATS.timed(f"rest {name}")(attribute)
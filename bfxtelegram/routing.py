@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Index of the chats that receive every websocket message type
+"""
+
+import threading
+from bfxtelegram import utils
+from bfxtelegram.accounts import DEFAULT_ACCOUNT
+
+
+class SubscriptionIndex:
+    """
+        (account, message type) -> chat ids of the authenticated chats mapped to the
+        account that did not disable the type. update_chat must be called after every
+        change of authentication, disabled types or accounts of a chat
+    """
+    def __init__(self, userdata):
+        self.userdata = userdata
+        self.lock = threading.Lock()
+        self.index = {}
+        for chat_id in list(userdata):
+            self.update_chat(chat_id)
+
+    @staticmethod
+    def _subscriptions(user_data):
+        if user_data.get('authenticated') != "yes":
+            return set()
+        disabled = set(user_data.get("disabled_ws_message", []))
+        return {
+            (account, mtype)
+            for account in user_data.get('accounts', [DEFAULT_ACCOUNT])
+            for mtype in utils.WS_MSG_TYPES if mtype not in disabled
+        }
+
+    def update_chat(self, chat_id):
+        user_data = self.userdata.get(chat_id)
+        subscriptions = self._subscriptions(user_data) if user_data else set()
+        with self.lock:
+            for key, chats in list(self.index.items()):
+                if key not in subscriptions:
+                    chats.discard(chat_id)
+                    if not chats:
+                        del self.index[key]
+            for key in subscriptions:
+                self.index.setdefault(key, set()).add(chat_id)
+
+    def recipients(self, account, mtype):
+        """
+            returns a tuple of chat ids, message types outside utils.WS_MSG_TYPES
+            are not indexed and go to every authenticated chat of the account
+        """
+        if mtype not in utils.WS_MSG_TYPES:
+            return tuple(
+                chat_id for chat_id, user_data in list(self.userdata.items())
+                if user_data.get('authenticated') == "yes"
+                and mtype not in user_data.get("disabled_ws_message", [])
+                and account in user_data.get('accounts', [DEFAULT_ACCOUNT])
+            )
+        with self.lock:
+            return tuple(self.index.get((account, mtype), ()))
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Process wide latency histograms, counters and message rates shown by /stats
+"""
+
+import time
+import functools
+import threading
+from collections import deque
+
+# samples kept per latency histogram
+HISTOGRAM_SAMPLES = 1000
+# seconds over which message rates are computed
+RATE_WINDOW = 60
+PERCENTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """
+        Rolling window of the last samples, with the totals since start
+    """
+    def __init__(self, samples=HISTOGRAM_SAMPLES):
+        self.values = deque(maxlen=samples)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.values.append(value)
+        self.count += 1
+        self.total += value
+
+    def percentiles(self, fractions=PERCENTILES):
+        values = sorted(self.values)
+        if not values:
+            return [0.0 for _fraction in fractions]
+        return [values[min(len(values) - 1, int(len(values) * fraction))] for fraction in fractions]
+
+
+class Counter:
+    """
+        Total count with per second buckets for the rate over the last RATE_WINDOW seconds
+    """
+    def __init__(self):
+        self.count = 0
+        self.buckets = deque()
+
+    def increment(self, now, amount=1):
+        self.count += amount
+        second = int(now)
+        if self.buckets and self.buckets[-1][0] == second:
+            self.buckets[-1][1] += amount
+        else:
+            self.buckets.append([second, amount])
+        while self.buckets[0][0] <= second - RATE_WINDOW:
+            self.buckets.popleft()
+
+    def rate(self, now):
+        """ events per second over the last RATE_WINDOW seconds """
+        first = now - RATE_WINDOW
+        return sum(amount for second, amount in self.buckets if second > first) / RATE_WINDOW
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        # stage -> Histogram of seconds
+        self.histograms = {}
+        # (name, label) -> Counter
+        self.counters = {}
+        # name -> function returning the current value
+        self.gauges = {}
+        self.frames = threading.local()
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def increment(self, name, label="", amount=1):
+        with self.lock:
+            counter = self.counters.get((name, label))
+            if counter is None:
+                counter = self.counters[(name, label)] = Counter()
+            counter.increment(time.time(), amount)
+
+    def count(self, name, label=""):
+        with self.lock:
+            counter = self.counters.get((name, label))
+            return counter.count if counter else 0
+
+    def gauge(self, name, value_func):
+        with self.lock:
+            self.gauges[name] = value_func
+
+    def gauge_values(self):
+        with self.lock:
+            gauges = dict(self.gauges)
+        return {name: value_func() for name, value_func in gauges.items()}
+
+    def timer(self, stage):
+        return Timer(self, stage)
+
+    def timed(self, stage):
+        """
+            decorator timing every call of the function, exceptions are counted as errors
+        """
+        def decorator(passed_function):
+            @functools.wraps(passed_function)
+            def wrapper(*args, **kwargs):
+                with self.timer(stage):
+                    return passed_function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def frame_received(self):
+        """ marks the reception of a websocket frame by the current thread """
+        self.frames.received = time.monotonic()
+
+    def frame_done(self):
+        self.frames.received = None
+
+    def frame_age(self):
+        """ seconds since the frame handled by the current thread was received, or None """
+        received = getattr(self.frames, 'received', None)
+        return None if received is None else time.monotonic() - received
+
+    def snapshot(self):
+        """
+            returns (histograms, counters) where histograms is
+            stage -> (count, total, [p50, p95, p99]) and counters is (name, label) -> (count, rate)
+        """
+        now = time.time()
+        with self.lock:
+            histograms = {
+                stage: (histogram.count, histogram.total, histogram.percentiles())
+                for stage, histogram in self.histograms.items()
+            }
+            counters = {
+                key: (counter.count, counter.rate(now)) for key, counter in self.counters.items()
+            }
+        return histograms, counters
+
+    def report(self):
+        histograms, counters = self.snapshot()
+        uptime = int(time.monotonic() - self.started)
+        lines = [
+            f"uptime {uptime // 3600}h{uptime % 3600 // 60:02d}m",
+            "",
+            "latency ms  p50 p95 p99"
+        ]
+        for stage in sorted(histograms):
+            count, _total, values = histograms[stage]
+            p50, p95, p99 = (value * 1000 for value in values)
+            lines.append(f"{stage} ({count})\n  {p50:.1f} {p95:.1f} {p99:.1f}")
+        rates = sorted((label, count, rate) for (name, label), (count, rate) in counters.items()
+                       if name == "ws_frames")
+        if rates:
+            lines.extend(["", "ws frames (total, per min)"])
+            lines.extend(f"{label} {count} {rate * 60:.1f}" for label, count, rate in rates)
+        caches = sorted({label for name, label in counters
+                         if name in ("cache_hits", "cache_misses")})
+        if caches:
+            lines.extend(["", "cache (hits, misses, coalesced)"])
+        for label in caches:
+            hits, misses = (counters.get((name, label), (0, 0))[0]
+                            for name in ("cache_hits", "cache_misses"))
+            # concurrent misses of rest endpoints served by a single call
+            endpoint = label.split(" ", 1)[-1] if label.startswith("rest ") else None
+            coalesced = counters.get(("rest_calls_coalesced", endpoint), (0, 0))[0]
+            lines.append(f"{label} {hits} {misses} {coalesced}")
+        errors = sorted((label, count) for (name, label), (count, _rate) in counters.items()
+                        if name == "errors")
+        lines.extend(["", "errors"])
+        lines.extend(f"{label} {count}" for label, count in errors)
+        if not errors:
+            lines.append("none")
+        return "\n".join(lines)
+
+
+class Timer:
+    """
+        context manager observing the duration of the block in stage
+    """
+    def __init__(self, stats, stage):
+        self.stats = stats
+        self.stage = stage
+        self.started = None
+
+    def __enter__(self):
+        self.started = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stats.observe(self.stage, time.monotonic() - self.started)
+        if exc_type is not None:
+            self.stats.increment("errors", self.stage)
+        return False
+
+
+STATS = Stats()
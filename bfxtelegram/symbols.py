@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Registry of the pairs traded on bitfinex with their precision and order sizes
+"""
+
+import os
+import json
+import math
+import difflib
+import logging
+import threading
+from bfxtelegram import utils
+
+# Enable logging
+logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                    level=logging.ERROR)
+LOGGER = logging.getLogger(__name__)
+
+# seconds between two loads of the symbol details
+REFRESH_INTERVAL = 3600
+# significant digits of prices when bitfinex does not give them
+DEFAULT_PRICE_PRECISION = 5
+
+
+class SymbolRegistry:
+    """
+        Pairs keyed by their lower case name ("btcusd") loaded with load(),
+        the symbols_details of ClientV1. The details are loaded again every
+        refresh_interval seconds in a thread, a failed refresh keeps the previous ones.
+        With a snapshot_file the registry starts from the last saved details and
+        reconciles with bitfinex in the background, load() blocks only the first start
+    """
+    def __init__(self, load, refresh_interval=REFRESH_INTERVAL, snapshot_file=None):
+        self.load = load
+        self.snapshot_file = snapshot_file
+        # pair -> symbol details
+        self.details = {}
+        self.currencies = set()
+        loaded = self.read_snapshot()
+        if not loaded:
+            self.refresh()
+        if refresh_interval or loaded:
+            thread = threading.Thread(
+                target=self._refresh_forever,
+                args=(refresh_interval, loaded),
+                name="symbols",
+                daemon=True
+            )
+            thread.start()
+
+    def refresh(self):
+        details = {entry['pair'].lower(): entry for entry in self.load()}
+        # replaced at once, readers never see a partial registry
+        self.details = details
+        self.currencies = set(utils.get_currencies(details))
+        if self.snapshot_file:
+            self.save_snapshot()
+
+    def read_snapshot(self):
+        """
+            returns True when the details were read from snapshot_file
+        """
+        if not self.snapshot_file or not os.path.exists(self.snapshot_file):
+            return False
+        try:
+            with open(self.snapshot_file, encoding='utf8') as snapshot:
+                data = json.load(snapshot)
+            self.details = {entry['pair'].lower(): entry for entry in data['details']}
+            self.currencies = set(data['currencies'])
+        except (OSError, ValueError, KeyError, TypeError) as error:
+            LOGGER.warning(f"ignoring unreadable symbols snapshot {self.snapshot_file} : {error}")
+            self.details = {}
+            self.currencies = set()
+            return False
+        return bool(self.details)
+
+    def save_snapshot(self):
+        utils.ensure_dir(self.snapshot_file)
+        temporary_file = f"{self.snapshot_file}.tmp"
+        data = {"details": list(self.details.values()), "currencies": sorted(self.currencies)}
+        with open(temporary_file, "w", encoding='utf8') as snapshot:
+            json.dump(data, snapshot)
+        # a crash while writing leaves the previous snapshot
+        os.replace(temporary_file, self.snapshot_file)
+
+    def _refresh_forever(self, interval, now):
+        """
+            now : reconcile at once, the details come from the snapshot
+        """
+        stopped = threading.Event()
+        wait = 0 if now else interval
+        while not stopped.wait(wait):
+            try:
+                self.refresh()
+            except Exception:
+                LOGGER.exception("could not refresh the symbol details")
+            if not interval:
+                return
+            wait = interval
+
+    def __contains__(self, symbol):
+        return isinstance(symbol, str) and symbol.lower() in self.details
+
+    def __iter__(self):
+        return iter(sorted(self.details))
+
+    def __len__(self):
+        return len(self.details)
+
+    def price_precision(self, symbol):
+        entry = self.details.get(symbol.lower(), {})
+        return int(entry.get('price_precision', DEFAULT_PRICE_PRECISION))
+
+    def minimum_order_size(self, symbol):
+        """
+            returns None for unknown symbols
+        """
+        entry = self.details.get(symbol.lower())
+        return float(entry['minimum_order_size']) if entry else None
+
+    def format_price(self, symbol, price):
+        """
+            price with the significant digits bitfinex uses for the pair, never in
+            scientific notation
+        """
+        if not price:
+            return "0"
+        digits = self.price_precision(symbol)
+        decimals = max(0, digits - 1 - math.floor(math.log10(abs(price))))
+        return f"{price:.{decimals}f}"
+
+    def suggest(self, symbol, count=3):
+        return difflib.get_close_matches(str(symbol).lower(), self.details, n=count, cutoff=0.6)
+
+    def unknown_message(self, symbol):
+        suggestions = self.suggest(symbol)
+        if suggestions:
+            return f"incorect symbol {symbol} , did you mean {' or '.join(suggestions)} ?"
+        return f"incorect symbol {symbol} , pairs are written like btcusd"
@@ -45,7 +45,7 @@ class Tgraph:
 
         self.graphs_layout = layout(
             children=[
-                [cdl_graph, ao_graph],
+                [cdl_graph, ao_graph] if ao_graph else [cdl_graph],
                 [vol_graph],
                 [rsi_graph]
             ]
@@ -280,6 +280,8 @@ class Tgraph:
 
     def build_active_orders_graph(self):
         # Volume in active orders GRAPH
+        if not self.orders_data:
+            return None
         orderbook_df = pd.DataFrame.from_dict(self.orders_data, orient='columns')
 
         orders_vol_graph = figure(
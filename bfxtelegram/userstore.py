@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+SQLite store of the chats and their settings, every change writes only the changed chat
+"""
+
+import json
+import time
+import sqlite3
+import logging
+import threading
+from bfxtelegram import utils
+
+# Enable logging
+logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                    level=logging.ERROR)
+LOGGER = logging.getLogger(__name__)
+
+
+class UserStore:
+    """
+        One row per chat id with its settings as json, save() is a single row
+        transaction whatever the number of chats. An empty store imports the
+        usersdata.pickle of older versions unless import_legacy is False
+    """
+    def __init__(self, path, import_legacy=True):
+        utils.ensure_dir(path)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS users ("
+            " chat_id INTEGER PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " updated REAL NOT NULL)"
+        )
+        if import_legacy and not self.count():
+            self.import_users(utils.read_userdata())
+
+    @classmethod
+    def open(cls, path):
+        """
+            returns the store and the users it holds
+        """
+        store = cls(path)
+        return store, store.load()
+
+    def import_users(self, userdata):
+        if not userdata:
+            return
+        now = time.time()
+        rows = [(chat_id, json.dumps(user_data), now) for chat_id, user_data in userdata.items()]
+        with self.lock:
+            # all or nothing, an interrupted import is done again on the next start
+            with self.connection:
+                self.connection.execute("BEGIN")
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO users (chat_id, data, updated) VALUES (?, ?, ?)", rows
+                )
+        LOGGER.info(f"imported {len(rows)} users")
+
+    def save(self, chat_id, user_data):
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO users (chat_id, data, updated) VALUES (?, ?, ?)",
+                (chat_id, json.dumps(user_data), time.time())
+            )
+
+    def load(self):
+        """
+            returns a dictionary chat_id -> settings
+        """
+        with self.lock:
+            rows = self.connection.execute("SELECT chat_id, data FROM users").fetchall()
+        return {chat_id: json.loads(data) for chat_id, data in rows}
+
+    def count(self):
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
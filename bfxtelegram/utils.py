@@ -27,7 +27,6 @@ SOFTWARE.
 import os
 import re
 import glob
-import json
 import pickle
 import logging
 from decimal import Decimal
@@ -36,17 +35,18 @@ logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s
                     level=logging.DEBUG)
 LOGGER = logging.getLogger(__name__)
 
-REST_TYPES = {
-    "mmarket": "market",
-    "mlimit": "limit",
-    "mstop": "stop",
-    "mtrail": "trailing-stop",
-    "mfok": "fill-or-kill",
-    "emarket": "exchange market",
-    "elimit": "exchange limit",
-    "estop": "exchange stop",
-    "etrail": "exchange trailing-stop",
-    "efok": "exchange fill-or-kill"
+# /neworder trade types and the matching websocket order types
+WS_ORDER_TYPES = {
+    "mmarket": "MARKET",
+    "mlimit": "LIMIT",
+    "mstop": "STOP",
+    "mtrail": "TRAILING STOP",
+    "mfok": "FOK",
+    "emarket": "EXCHANGE MARKET",
+    "elimit": "EXCHANGE LIMIT",
+    "estop": "EXCHANGE STOP",
+    "etrail": "EXCHANGE TRAILING STOP",
+    "efok": "EXCHANGE FOK"
 }
 
 CMDHELP = {
@@ -60,6 +60,13 @@ CMDHELP = {
         "  ex : /set calctype position_tIOTUSD\n"
         "/set getbalance currencie\n"
         "  ex : /set getbalance iot usd btc eth\n"
+        "/set delivery mode\n"
+        "  modes : messages, live, digest\n"
+        "  live keeps one edited message per position and wallet\n"
+        "  digest sends one message per interval : /set delivery digest 300\n"
+        "/set accounts account ...\n"
+        "  ex : /set accounts main sub1\n"
+        "  notifications come from every account, commands use the first one\n"
         "</pre>"
     ),
     "auth": (
@@ -109,6 +116,20 @@ CMDHELP = {
         "example :\n/ticker \n/ticker iotusd"
         "</pre>"
     ),
+    "stats": (
+        "<pre>"
+        "stats shows the latency percentiles of every stage, the websocket message rates\n"
+        "and the error counts, it is only available to the chats in ADMIN_CHAT_IDS\n"
+        "example : /stats\n"
+        "</pre>"
+    ),
+    "funding": (
+        "<pre>"
+        "funding returns the totals, weighted average daily rates and next expiry\n"
+        "of your funding offers, credits and loans\n"
+        "example : /funding\n"
+        "</pre>"
+    ),
     "getbalance": (
         "<pre>"
         "getbalance will return a list of balances for the currencies you set using /set\n"
@@ -126,7 +147,20 @@ WS_MSG_TYPES = [
     'uca', 'ou-req', 'wallet_transfer'
 ]
 
+# message types that can be shown in live panels instead of new messages
+LIVE_PANEL_TYPES = ['pu', 'wu']
+
+# snapshots and updates superseded by the next one, dropped first when the delivery queue is full
+LOW_PRIORITY_TYPES = ['bu', 'ps', 'pu', 'ws', 'wu', 'os', 'hos', 'mis', 'miu', 'fos', 'fcs', 'fls', 'hb']
+
+DELIVERY_MODES = ['messages', 'live', 'digest']
+# shortest interval of /set delivery digest seconds
+MIN_DIGEST_INTERVAL = 10
+
 ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+OUTBOX_FILE = os.path.join(ROOT_DIR, 'data/outbox.sqlite')
+USERS_FILE = os.path.join(ROOT_DIR, 'data/users.sqlite')
+SYMBOLS_FILE = os.path.join(ROOT_DIR, 'data/symbols.json')
 
 
 def isnumber(pnumber):
@@ -144,6 +178,9 @@ def ensure_dir(file_path):
 
 
 def read_userdata():
+    """
+        users of the versions before UserStore, imported by it on the first start
+    """
     userdata_file = os.path.join(ROOT_DIR, 'data/usersdata.pickle')
     files = glob.glob(userdata_file)
     if not files:
@@ -157,16 +194,6 @@ def read_userdata():
         return pickle_object
 
 
-def save_userdata(userdata):
-    userdata_file = os.path.join(ROOT_DIR, 'data/usersdata.pickle')
-    human_readable_file = os.path.join(ROOT_DIR, 'data/usersdata.json')
-    ensure_dir(userdata_file)
-    with open(userdata_file, 'wb') as outfile:
-        pickle.dump(userdata, outfile)
-    with open(human_readable_file, 'w') as outfile:
-        json.dump(userdata, outfile)
-
-
 def get_currencies(btfx_symbols):
     """
         Extract all currencies from the list of tradepairs available on bitfinex
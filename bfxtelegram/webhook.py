@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Webhook receiver : telegram posts every update to this server instead of being long polled
+"""
+
+import hmac
+import json
+import logging
+import threading
+import socketserver
+from urllib.parse import urlparse
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from telegram import Update
+from telegram.error import TelegramError
+from bfxtelegram.stats import STATS
+
+# Enable logging
+logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                    level=logging.ERROR)
+LOGGER = logging.getLogger(__name__)
+
+# header carrying the secret_token given to setWebhook
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        if self.path.split('?')[0] != self.server.path:
+            self.send_error(404)
+            return
+        secret_token = self.headers.get(SECRET_HEADER, "")
+        if not hmac.compare_digest(secret_token.encode(), self.server.secret_token.encode()):
+            STATS.increment("errors", "webhook secret")
+            LOGGER.warning(f"webhook request from {self.client_address[0]} with a wrong secret")
+            self.send_error(403)
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            data = json.loads(self.rfile.read(length).decode('utf8'))
+        except ValueError:
+            self.send_error(400)
+            return
+        # answered before handling so telegram does not send the update again meanwhile
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+        self.server.process(data)
+
+    def log_message(self, format, *args):
+        LOGGER.debug(format % args)
+
+
+class WebhookServer(socketserver.ThreadingMixIn, HTTPServer):
+    """
+        Feeds the updates posted on the path of webhook_url to the dispatcher,
+        requests without the secret token are rejected with 403
+    """
+    daemon_threads = True
+
+    def __init__(self, port, secret_token, dispatcher, webhook_url, host="0.0.0.0"):
+        if not secret_token:
+            raise ValueError("webhook mode needs a secret token")
+        super().__init__((host, port), WebhookHandler)
+        self.secret_token = secret_token
+        self.dispatcher = dispatcher
+        self.webhook_url = webhook_url
+        self.path = urlparse(webhook_url).path or "/"
+
+    def process(self, data):
+        with STATS.timer("webhook update"):
+            self.dispatcher.process_update(Update.de_json(data, self.dispatcher.bot))
+
+    def start(self):
+        """
+            serves in a thread then asks telegram to post the updates to webhook_url
+        """
+        thread = threading.Thread(target=self.serve_forever, name="webhook", daemon=True)
+        thread.start()
+        self.dispatcher.bot.set_webhook(url=self.webhook_url, secret_token=self.secret_token)
+        host, port = self.server_address[:2]
+        LOGGER.info(f"webhook listening on {host}:{port}{self.path} for {self.webhook_url}")
+        return thread
+
+    def stop(self):
+        """
+            asks telegram to stop posting, then waits for the running requests and closes
+        """
+        try:
+            self.dispatcher.bot.delete_webhook()
+        except TelegramError as error:
+            LOGGER.error(f"could not delete the webhook : {error}")
+        self.shutdown()
+        self.server_close()
+        LOGGER.info("webhook stopped")
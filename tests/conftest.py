@@ -759,3 +759,36 @@ BALANCES = [
     {'type': 'trading', 'currency': 'omg', 'amount': '0.0', 'available': '0.0'},
     {'type': 'trading', 'currency': 'usd', 'amount': '0.0', 'available': '0.0'}
 ]
+
+FUNDING_OFFERS = [
+    [
+        41237920, 'fUSD', 1537259985000, 1537259985000, 1000, 1000, 'lend', None, None, 0,
+        'ACTIVE', None, None, None, 0.0003, 2, 0, 0, None, 0, None
+    ],
+    [
+        41237921, 'fUSD', 1537259985000, 1537259985000, 3000, 3000, 'lend', None, None, 0,
+        'ACTIVE', None, None, None, 0.0005, 30, 0, 0, None, 0, None
+    ]
+]
+
+FUNDING_CREDITS = [
+    [
+        26222883, 'fUSD', 1, 1537259985000, 1537259985000, 500, 0, 'ACTIVE', None, None, None,
+        0.0002, 2, 1537259985000, 1537259985000, 0, 0, None, 0, None, 0, 'tIOTUSD'
+    ]
+]
+
+FUNDING_LOANS = [
+    [
+        26222884, 'fBTC', -1, 1537259985000, 1537259985000, 0.5, 0, 'ACTIVE', None, None, None,
+        0.0001, 7, 1537259985000, 1537259985000, 0, 0, None, 0, None, 0
+    ]
+]
+
+BOOK_SNAPSHOT = [
+    [0.5385, 2, 1500.5],
+    [0.5384, 1, 700],
+    [0.5383, 3, 0.00001],
+    [0.5387, 1, -250],
+    [0.5388, 2, -3000.25]
+]
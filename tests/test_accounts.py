@@ -0,0 +1,61 @@
+# pylint: disable-msg=C0103
+import unittest
+from unittest import mock
+from bfxtelegram.accounts import read_accounts
+from bfxtelegram.bfxwss import Bfxwss
+
+
+class AccountsTests(unittest.TestCase):
+
+    def test_no_extra_accounts(self):
+        self.assertEqual(read_accounts({'BFX_API_KEY': "key"}), {})
+
+    def test_read_accounts(self):
+        environ = {
+            'BFX_ACCOUNTS': "sub1, Sub2 main",
+            'BFX_API_KEY_SUB1': "key1",
+            'BFX_API_SECRET_SUB1': "secret1",
+            'BFX_API_KEY_SUB2': "key2",
+            'BFX_API_SECRET_SUB2': "secret2"
+        }
+        accounts = read_accounts(environ)
+        self.assertEqual(accounts, {'sub1': ("key1", "secret1"), 'sub2': ("key2", "secret2")})
+
+    def test_missing_credentials(self):
+        with self.assertRaises(ValueError):
+            read_accounts({'BFX_ACCOUNTS': "sub1", 'BFX_API_KEY_SUB1': "key1"})
+
+
+class SocketWatchdogTests(unittest.TestCase):
+
+    def test_every_account_arms_its_timer(self):
+        sockets = [Bfxwss(mock.Mock(), coalesce_window=0, autostart=False) for _ in range(2)]
+        for wss in sockets:
+            with mock.patch.object(wss, "authenticate"), mock.patch.object(wss, "start"):
+                wss.connect()
+        try:
+            for wss in sockets:
+                # the second thread ends at once, the reactor already runs
+                self.assertFalse(wss.is_alive())
+                wss._heartbeat_handler()
+                self.assertTrue(wss.connection_timer.is_alive())
+        finally:
+            for wss in sockets:
+                wss._stop_timers()
+
+    def test_replay_does_not_arm_timer(self):
+        wss = Bfxwss(mock.Mock(), coalesce_window=0, autostart=False)
+        wss._heartbeat_handler()
+        self.assertIsNone(wss.connection_timer)
+
+    def test_stopped_socket_does_not_reconnect(self):
+        wss = Bfxwss(mock.Mock(), coalesce_window=0, autostart=False)
+        with mock.patch.object(wss, "authenticate"), mock.patch.object(wss, "start"):
+            wss.connect()
+        wss._heartbeat_handler()
+        timer = wss.connection_timer
+        wss.stop()
+        timer.join(1)
+        self.assertFalse(timer.is_alive())
+        wss._heartbeat_handler()
+        self.assertIs(wss.connection_timer, timer)
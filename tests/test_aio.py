@@ -0,0 +1,96 @@
+# pylint: disable-msg=C0103
+import json
+import asyncio
+import unittest
+from unittest import mock
+from concurrent.futures import Future
+from telegram.error import RetryAfter, BadRequest, Unauthorized, NetworkError
+from bfxtelegram.aio import AsyncCore, AsyncTelegram, parse_command
+from tests.conftest import BALANCES, CURRENCIES
+
+
+class FakeHttp:
+
+    def __init__(self):
+        self.requests = []
+
+    async def request(self, method, url, headers=None, body=None, timeout=None):
+        self.requests.append((method, url, json.loads(body) if body else None))
+        return 200, json.dumps({"ok": True, "result": {"message_id": 1}}).encode()
+
+
+class AsyncTelegramTests(unittest.TestCase):
+
+    def test_errors(self):
+        def parse(status, data):
+            AsyncTelegram.parse(status, json.dumps(data).encode())
+        with self.assertRaises(RetryAfter):
+            parse(429, {"ok": False, "parameters": {"retry_after": 3}})
+        with self.assertRaises(BadRequest):
+            parse(400, {"ok": False, "description": "chat not found"})
+        with self.assertRaises(Unauthorized):
+            parse(403, {"ok": False, "description": "bot was blocked by the user"})
+        with self.assertRaises(NetworkError):
+            AsyncTelegram.parse(502, b"<html>bad gateway</html>")
+        self.assertEqual(AsyncTelegram.parse(200, b'{"ok": true, "result": []}'), [])
+
+    def test_parse_command(self):
+        self.assertEqual(parse_command({"message": {"text": "/ticker@bot btcusd"}}),
+                         ("ticker", ["btcusd"]))
+        self.assertEqual(parse_command({"message": {"text": "hello"}}), (None, None))
+        self.assertEqual(parse_command({"callback_query": {}}), (None, None))
+
+
+class AsyncCoreTests(unittest.TestCase):
+
+    def setUp(self):
+        self.http = FakeHttp()
+        self.bot = mock.Mock()
+        self.bot.userdata = {1: {'authenticated': "yes"}, 2: {'authenticated': "no"}}
+        self.bot.btfx_symbols = ["btcusd"]
+        self.bot.btfxwss.market_data.ticker.return_value = None
+        self.bot.format_ticker.return_value = "<pre>ticker</pre>"
+        self.account = self.bot.account.return_value
+        self.account.btfx_client2.ticker.return_value = [1, 2, 3, 4, 5, 0.1, 7, 8, 9, 10]
+        self.account.btfx_client.balances.return_value = BALANCES
+        self.dispatcher = mock.Mock()
+        self.loop = asyncio.new_event_loop()
+        self.core = AsyncCore(self.bot, self.dispatcher, loop=self.loop, http=self.http)
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_stop(self):
+        self.core.polling = Future()
+        self.core.stop()
+        self.assertTrue(self.core.stopped.is_set())
+        self.assertTrue(self.core.polling.cancelled())
+        with self.assertRaises(RuntimeError):
+            self.core.executor.submit(print)
+
+    def handle(self, chat_id, text):
+        update = {"update_id": 1, "message": {"chat": {"id": chat_id}, "text": text}}
+        with mock.patch.object(AsyncCore, "process_update") as process_update:
+            self.loop.run_until_complete(self.core.handle(update))
+        return process_update.called
+
+    def test_ticker_on_the_loop(self):
+        self.assertFalse(self.handle(1, "/ticker btcusd"))
+        # through the cached and scheduled rest client of the account
+        self.account.btfx_client2.ticker.assert_called_once_with(symbol="tBTCUSD")
+        self.bot.format_ticker.assert_called_once_with("tBTCUSD", [1, 2, 3, 4, 5, 0.1, 7, 8, 9, 10])
+        self.assertEqual(self.http.requests[0][2], {
+            "chat_id": 1, "text": "<pre>ticker</pre>", "parse_mode": "HTML"
+        })
+
+    def test_balance_on_the_loop(self):
+        self.bot.userdata[1]['getbalance'] = CURRENCIES
+        self.assertFalse(self.handle(1, "/getbalance"))
+        self.account.btfx_client.balances.assert_called_once_with()
+        self.assertEqual(len(self.http.requests), 1)
+
+    def test_other_updates_go_to_the_dispatcher(self):
+        self.assertTrue(self.handle(1, "/ticker dogeusd"))
+        self.assertTrue(self.handle(2, "/ticker btcusd"))
+        self.assertTrue(self.handle(1, "/orders"))
+        self.assertEqual(self.http.requests, [])
@@ -0,0 +1,96 @@
+# pylint: disable-msg=C0103
+import json
+import unittest
+from unittest import mock
+from bfxtelegram import bfxwss
+from bfxtelegram.bfxwss import Bfxwss
+
+TRADEPAIR = 'tIOTUSD'
+
+
+class PublicChannelsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.wss = Bfxwss(mock.Mock(), coalesce_window=0, autostart=False)
+        self.start_socket = mock.patch.object(self.wss, "_start_socket").start()
+        self.addCleanup(mock.patch.stopall)
+        self.protocols = {}
+
+    def connect(self, connection):
+        """
+            the connection opens and bitfinex acknowledges its conf
+        """
+        protocol = self.protocols[connection] = mock.Mock()
+        self.wss.factories[connection] = mock.Mock(protocol_instance=protocol)
+        self.wss._public_frame(connection, {'event': "conf", 'status': "OK"})
+        return protocol
+
+    def sent(self, connection):
+        protocol = self.protocols[connection]
+        return [json.loads(call[0][0]) for call in protocol.sendMessage.call_args_list]
+
+    def test_channels_share_a_connection(self):
+        for channel in ('ticker', 'trades', 'candles', 'book'):
+            self.wss.acquire(channel, TRADEPAIR)
+        self.assertEqual([call[0][0] for call in self.start_socket.call_args_list], ["public_0"])
+        self.connect("public_0")
+        subscribed = sorted(data['channel'] for data in self.sent("public_0"))
+        self.assertEqual(subscribed, ['book', 'candles', 'ticker', 'trades'])
+        # once confirmed a new channel is subscribed at once
+        self.wss.acquire('ticker', 'tBTCUSD')
+        self.assertEqual(self.sent("public_0")[-1]['symbol'], 'tBTCUSD')
+
+    def test_frames_by_channel_id(self):
+        self.wss.acquire('trades', TRADEPAIR)
+        self.wss.acquire('candles', TRADEPAIR)
+        self.connect("public_0")
+        self.wss._public_frame("public_0", {
+            'event': "subscribed", 'channel': "trades", 'chanId': 10, 'symbol': TRADEPAIR
+        })
+        self.wss._public_frame("public_0", {
+            'event': "subscribed", 'channel': "candles", 'chanId': 11,
+            'key': f"trade:1h:{TRADEPAIR}"
+        })
+        self.wss._public_frame("public_0", [10, [[1, 1537259985000, 100, 0.5378]]])
+        self.wss._public_frame("public_0", [11, [[1537258800000, 0.53, 0.54, 0.541, 0.529, 10]]])
+        self.wss._public_frame("public_0", [12, 'hb'])
+        self.assertEqual(self.wss.market_data.last_trade(TRADEPAIR)[0], 1)
+        self.assertIn(TRADEPAIR, self.wss.market_data.candles)
+
+    def test_release_unsubscribes(self):
+        self.wss.acquire('ticker', TRADEPAIR)
+        self.wss.acquire('trades', TRADEPAIR)
+        self.connect("public_0")
+        self.wss._public_frame("public_0", {
+            'event': "subscribed", 'channel': "ticker", 'chanId': 10, 'symbol': TRADEPAIR
+        })
+        self.wss.release('ticker', TRADEPAIR)
+        self.assertEqual(self.sent("public_0")[-1], {'event': "unsubscribe", 'chanId': 10})
+        with mock.patch.object(self.wss, "stop_socket") as stop_socket:
+            self.wss.release('trades', TRADEPAIR)
+        stop_socket.assert_called_once_with("public_0")
+        self.assertEqual(self.wss.public_connections, {})
+
+    def test_book_resync(self):
+        self.wss.acquire('book', TRADEPAIR)
+        self.connect("public_0")
+        self.wss._public_frame("public_0", {
+            'event': "subscribed", 'channel': "book", 'chanId': 10, 'symbol': TRADEPAIR
+        })
+        self.wss._resync_book(TRADEPAIR)
+        self.assertEqual(self.sent("public_0")[-1], {'event': "unsubscribe", 'chanId': 10})
+        self.wss._public_frame("public_0", {'event': "unsubscribed", 'chanId': 10})
+        self.assertEqual(self.sent("public_0")[-1]['event'], "subscribe")
+        self.assertEqual(self.sent("public_0")[-1]['channel'], "book")
+
+    def test_connections_and_resubscribe(self):
+        with mock.patch.object(bfxwss, "MAX_CHANNELS", 3):
+            for symbol in ('tBTCUSD', 'tETHUSD'):
+                for channel in ('ticker', 'trades'):
+                    self.wss.acquire(channel, symbol)
+            self.assertEqual(sorted(self.wss.public_connections), ["public_0", "public_1"])
+            self.start_socket.reset_mock()
+            self.wss._resubscribe()
+        # one socket per connection, not per channel
+        self.assertEqual(sorted(call[0][0] for call in self.start_socket.call_args_list),
+                         ["public_0", "public_1"])
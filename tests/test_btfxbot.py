@@ -0,0 +1,149 @@
+# pylint: disable-msg=C0103
+import time
+import threading
+import unittest
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+from bfxtelegram import btfxbot
+from bfxtelegram.btfxbot import Btfxbot
+
+
+class GraphFetchTests(unittest.TestCase):
+
+    def setUp(self):
+        self.bot = Btfxbot.__new__(Btfxbot)
+        self.bot.fetch_pool = ThreadPoolExecutor(4)
+        self.bot.userdata = {1: {'authenticated': "yes"}}
+        self.bot.btfx_symbols = ["btcusd"]
+        self.bot.btfxwss = mock.Mock()
+        self.bot.btfxwss.market_data.candles_list.return_value = [[0, 1, 1, 1, 1, 1]]
+        self.released = threading.Event()
+        # the book snapshot never arrives before the deadline
+        self.bot.btfxwss.market_data.book_orders.side_effect = (
+            lambda tradepair, timeout=None: self.released.wait(timeout)
+        )
+        self.account = mock.Mock()
+        self.account.btfx_client.active_orders.side_effect = lambda: time.sleep(0.1) or ["order"]
+        self.bot.account = lambda chat_id: self.account
+        self.telegram = mock.Mock()
+        self.update = mock.Mock()
+        self.update.message.chat.id = 1
+
+    def tearDown(self):
+        self.released.set()
+        self.bot.fetch_pool.shutdown()
+
+    @mock.patch.object(btfxbot, "GRAPH_DEADLINE", 0.3)
+    @mock.patch("builtins.open", mock.mock_open())
+    @mock.patch.object(btfxbot, "Tgraph")
+    def test_partial_chart_within_deadline(self, tgraph):
+        started = time.monotonic()
+        self.bot.cb_graph(self.telegram, self.update, ["btcusd"])
+        self.assertLess(time.monotonic() - started, 0.5)
+        candles, active_orders, orders_data, symbol = tgraph.call_args[0]
+        self.assertEqual(candles, [[0, 1, 1, 1, 1, 1]])
+        self.assertEqual(active_orders, ["order"])
+        # drawn without the orderbook panel
+        self.assertIsNone(orders_data)
+        self.assertEqual(symbol, "btcusd")
+        self.telegram.send_photo.assert_called_once()
+
+    @mock.patch.object(btfxbot, "GRAPH_DEADLINE", 0.2)
+    @mock.patch.object(btfxbot, "Tgraph")
+    def test_no_chart_without_candles(self, tgraph):
+        self.bot.btfxwss.market_data.candles_list.return_value = None
+        self.bot.btfx_client2 = mock.Mock()
+        self.bot.btfx_client2.candles.side_effect = ValueError("bitfinex down")
+        self.bot.cb_graph(self.telegram, self.update, ["btcusd"])
+        tgraph.assert_not_called()
+        self.assertIn("could not get the candles", self.telegram.send_message.call_args[1]["text"])
+
+
+class ConnectingTests(unittest.TestCase):
+
+    def setUp(self):
+        self.bot = Btfxbot.__new__(Btfxbot)
+        self.bot.userdata = {1: {'authenticated': "yes"}}
+        self.account = mock.Mock()
+        self.account.btfxwss.funding_book.summary.return_value = "no offers"
+        self.bot.account = lambda chat_id: self.account
+        self.telegram = mock.Mock()
+        self.update = mock.Mock()
+        self.update.message.chat.id = 1
+
+    def test_socket_authenticating(self):
+        self.account.connected = False
+        self.bot._cb_funding(self.telegram, self.update, [])
+        self.account.btfxwss.funding_book.summary.assert_not_called()
+        self.assertIn("connecting to bitfinex", self.telegram.send_message.call_args[1]["text"])
+
+    def test_socket_authenticated(self):
+        self.account.connected = True
+        self.bot._cb_funding(self.telegram, self.update, [])
+        self.assertEqual(self.telegram.send_message.call_args[1]["text"], "<pre>no offers</pre>")
+
+
+class ClosedPositionTests(unittest.TestCase):
+
+    def setUp(self):
+        self.bot = Btfxbot.__new__(Btfxbot)
+        self.bot.accounts = {"main": mock.Mock()}
+        self.bot.userdata = {1: {'delivery': "live"}, 2: {}}
+        self.bot.subscriptions = mock.Mock()
+        self.bot.subscriptions.recipients.side_effect = (
+            lambda account, mtype: (1, 2) if mtype == 'pu' else (2,)
+        )
+        self.bot.live_panel = mock.Mock()
+        self.bot.delivery = mock.Mock()
+        self.bot.digest = mock.Mock()
+
+    def test_pc_closes_live_panels(self):
+        self.bot.send_to_users('pc', "<pre>closed</pre>", key=('pu', 'tBTCUSD'))
+        self.bot.live_panel.close.assert_called_once_with(1, ('pu', 'tBTCUSD'))
+        self.bot.delivery.enqueue.assert_called_once_with(2, "<pre>closed</pre>", None, 'pc')
+
+
+class OrderReplyTests(unittest.TestCase):
+
+    def setUp(self):
+        self.bot = Btfxbot.__new__(Btfxbot)
+        self.bot.accounts = {"main": mock.Mock()}
+        self.bot.tbot = mock.Mock()
+        self.bot.delivery = mock.Mock()
+
+    def test_error_is_queued(self):
+        notification = [0, 'on-req', None, None, [None], None, "ERROR", "not enough balance"]
+        self.bot.order_reply(1, 'on-req', notification, 0.012)
+        self.bot.delivery.enqueue.assert_called_once_with(
+            1, "<pre>ERROR not enough balance (12 ms)</pre>", mtype='on-req'
+        )
+        self.bot.tbot.send_message.assert_not_called()
+
+    def test_placed_order_is_sent_by_delivery(self):
+        notification = [0, 'on-req', None, None, [42], None, "SUCCESS", "submitted"]
+        self.bot.order_reply(1, 'on-req', notification, 0.012)
+        self.bot.tbot.send_message.assert_not_called()
+        chat_id, call = self.bot.delivery.submit.call_args[0]
+        self.assertEqual(chat_id, 1)
+        call()
+        _args, kwargs = self.bot.tbot.send_message.call_args
+        self.assertIn("Order 42 placed", kwargs['text'])
+        self.assertIsNotNone(kwargs['reply_markup'])
+
+
+class ShutdownTests(unittest.TestCase):
+
+    def test_shutdown(self):
+        bot = Btfxbot.__new__(Btfxbot)
+        bot.accounts = {"main": mock.Mock(), "sub1": mock.Mock()}
+        bot.delivery = mock.Mock()
+        bot.recorder = mock.Mock()
+        bot.core = mock.Mock()
+        webhook = mock.Mock()
+        bot.shutdown(webhook)
+        bot.recorder.close.assert_called_once_with()
+        webhook.stop.assert_called_once_with()
+        for account in bot.accounts.values():
+            account.stop.assert_called_once_with()
+        bot.delivery.stop.assert_called_once_with(btfxbot.SHUTDOWN_TIMEOUT)
+        bot.core.stop.assert_called_once_with()
@@ -0,0 +1,32 @@
+# pylint: disable-msg=C0103
+import unittest
+from bfxtelegram.coalescer import Coalescer
+
+
+class CoalescerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.sent = []
+        self.coalescer = Coalescer(self.flush, window=60)
+
+    def flush(self, msg_type, key, message):
+        self.sent.append((msg_type, key, message))
+
+    def test_latest_message_wins(self):
+        self.coalescer.push('on-req', ('order', 1), "submitting")
+        self.coalescer.push('on', ('order', 1), "placed")
+        self.coalescer.push('ou', ('order', 2), "updated")
+        self.coalescer.flush(('order', 1))
+        self.coalescer.flush(('order', 1))
+        self.assertEqual(self.sent, [('on', ('order', 1), "placed")])
+
+    def test_discard(self):
+        self.coalescer.push('pu', ('pu', 'tIOTUSD'), "position")
+        self.coalescer.discard(('pu', 'tIOTUSD'))
+        self.coalescer.flush(('pu', 'tIOTUSD'))
+        self.assertEqual(self.sent, [])
+
+    def test_no_window(self):
+        coalescer = Coalescer(self.flush, window=0)
+        coalescer.push('wu', ('wu', 'exchange', 'USD'), "wallet")
+        self.assertEqual(len(self.sent), 1)
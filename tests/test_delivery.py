@@ -0,0 +1,165 @@
+# pylint: disable-msg=C0103
+import os
+import time
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from telegram.error import RetryAfter, TimedOut, BadRequest
+from bfxtelegram.delivery import Delivery
+from bfxtelegram.outbox import Outbox
+from bfxtelegram.ratelimit import TokenBucket
+
+
+class TokenBucketTests(unittest.TestCase):
+
+    def test_burst_then_wait(self):
+        bucket = TokenBucket(10, capacity=2)
+        self.assertEqual(bucket.try_acquire(), 0)
+        self.assertEqual(bucket.try_acquire(), 0)
+        self.assertAlmostEqual(bucket.try_acquire(), 0.1, places=2)
+
+
+class DeliveryTests(unittest.TestCase):
+
+    def setUp(self):
+        self.lock = threading.Lock()
+        self.sent = []
+        self.failures = {}
+
+    def send(self, chat_id, text):
+        with self.lock:
+            failure = self.failures.pop((chat_id, text), None)
+        if failure:
+            raise failure
+        with self.lock:
+            self.sent.append((chat_id, text, time.monotonic()))
+
+    def test_chat_order_and_parallel_chats(self):
+        delivery = Delivery(self.send, workers=4, global_rate=1000, chat_rate=1000)
+        for index in range(5):
+            for chat_id in (1, 2, 3):
+                delivery.enqueue(chat_id, f"m{index}")
+        self.assertTrue(delivery.join(timeout=5))
+        for chat_id in (1, 2, 3):
+            texts = [text for chat, text, _sent in self.sent if chat == chat_id]
+            self.assertEqual(texts, [f"m{index}" for index in range(5)])
+
+    def test_chat_rate(self):
+        delivery = Delivery(self.send, workers=4, global_rate=1000, chat_rate=20)
+        for index in range(3):
+            delivery.enqueue(1, f"m{index}")
+        self.assertTrue(delivery.join(timeout=5))
+        times = [sent for _chat, _text, sent in self.sent]
+        self.assertGreaterEqual(times[2] - times[0], 0.09)
+
+    def test_retry_after_pauses_only_that_chat(self):
+        self.failures[(1, "a")] = RetryAfter(0.3)
+        self.failures[(2, "lost")] = BadRequest("chat not found")
+        delivery = Delivery(self.send, workers=2, global_rate=1000, chat_rate=1000)
+        started = time.monotonic()
+        delivery.enqueue(1, "a")
+        delivery.enqueue(2, "lost")
+        delivery.enqueue(2, "b")
+        self.assertTrue(delivery.join(timeout=5))
+        sent = {(chat, text): at - started for chat, text, at in self.sent}
+        # the message is retried after the pause, the other chat is not delayed
+        self.assertGreaterEqual(sent[(1, "a")], 0.3)
+        self.assertLess(sent[(2, "b")], 0.2)
+        self.assertNotIn((2, "lost"), sent)
+
+    def test_submitted_calls_share_the_chat_rate(self):
+        delivery = Delivery(self.send, workers=4, global_rate=1000, chat_rate=10)
+        attempts = []
+
+        def edit():
+            attempts.append(time.monotonic())
+            if len(attempts) == 1:
+                raise RetryAfter(0.2)
+        delivery.enqueue(1, "a")
+        delivery.submit(1, edit)
+        self.assertTrue(delivery.join(timeout=5))
+        # after the message of the chat, then again after the pause
+        self.assertEqual(len(attempts), 2)
+        self.assertGreaterEqual(attempts[0] - self.sent[0][2], 0.09)
+        self.assertGreaterEqual(attempts[1] - attempts[0], 0.2)
+
+    @mock.patch("bfxtelegram.delivery.RETRY_BACKOFF", 0.2)
+    def test_network_error_retried_in_order(self):
+        self.failures[(1, "fill")] = TimedOut()
+        delivery = Delivery(self.send, workers=2, global_rate=1000, chat_rate=1000)
+        started = time.monotonic()
+        delivery.enqueue(1, "fill", mtype="te")
+        delivery.enqueue(1, "after", mtype="te")
+        self.assertTrue(delivery.join(timeout=5))
+        self.assertEqual([text for _chat, text, _at in self.sent], ["fill", "after"])
+        self.assertGreaterEqual(self.sent[0][2] - started, 0.2)
+
+    def test_full_queue_drops_low_priority_first(self):
+        gate = threading.Event()
+        delivery = Delivery(lambda chat_id, text: gate.wait(), workers=1, max_queued=3)
+        # the first message is being sent and can not be dropped
+        delivery.enqueue(1, "sending", mtype="te")
+        time.sleep(0.1)
+        delivery.enqueue(2, "wallet", mtype="wu")
+        delivery.enqueue(2, "fill", mtype="te")
+        delivery.enqueue(2, "position", mtype="pu")
+        delivery.enqueue(2, "snapshot", mtype="ps")
+        self.assertEqual(
+            [message.text for message in delivery.queues[2] if message.queued],
+            ["fill", "snapshot"]
+        )
+        gate.set()
+
+    def test_full_queue_eviction_is_not_a_scan(self):
+        gate = threading.Event()
+        delivery = Delivery(lambda chat_id, text: gate.wait(), workers=1, max_queued=2000)
+        for index in range(2000):
+            delivery.enqueue(index % 50, f"pu {index}", mtype="pu")
+        started = time.monotonic()
+        for index in range(2000):
+            delivery.enqueue(index % 50, f"te {index}", mtype="te")
+        elapsed = time.monotonic() - started
+        gate.set()
+        queued = [message for chat_queue in delivery.queues.values() for message in chat_queue
+                  if message.queued]
+        self.assertEqual(delivery.depth, 2000)
+        # only the position being sent is left of the low priority messages
+        self.assertLessEqual(sum(message.mtype == "pu" for message in queued), 1)
+        self.assertLess(elapsed, 1)
+
+    def test_outbox_write_does_not_block_enqueue(self):
+        outbox = mock.Mock()
+        outbox.pending.return_value = []
+        outbox.add.side_effect = lambda chat_id, mtype, text: time.sleep(0.3) or 7
+        delivery = Delivery(self.send, workers=1, global_rate=1000, chat_rate=1000,
+                            outbox=outbox)
+        started = time.monotonic()
+        delivery.enqueue(1, "fill", mtype="te")
+        self.assertLess(time.monotonic() - started, 0.1)
+        self.assertTrue(delivery.join(timeout=5))
+        outbox.remove.assert_called_once_with(7)
+
+    def test_stop_ends_the_workers(self):
+        delivery = Delivery(self.send, workers=2, global_rate=1000, chat_rate=1000)
+        delivery.enqueue(1, "fill", mtype="te")
+        self.assertTrue(delivery.stop(timeout=5))
+        for worker in delivery.workers:
+            worker.join(1)
+            self.assertFalse(worker.is_alive())
+        self.assertEqual([text for _chat, text, _at in self.sent], ["fill"])
+
+    def test_outbox_survives_restart(self):
+        path = os.path.join(tempfile.mkdtemp(), "outbox.sqlite")
+        gate = threading.Event()
+        stopped = Delivery(lambda chat_id, text: gate.wait(), workers=1, outbox=Outbox(path))
+        stopped.enqueue(1, "sending", mtype="te")
+        stopped.enqueue(1, "queued", mtype="te")
+        # the outbox writes are done by a thread
+        stopped.outbox_writes.join()
+        delivery = Delivery(self.send, workers=2, global_rate=1000, chat_rate=1000,
+                            outbox=Outbox(path))
+        self.assertTrue(delivery.join(timeout=5))
+        self.assertEqual([text for _chat, text, _at in self.sent], ["sending", "queued"])
+        self.assertEqual(Outbox(path).pending(), [])
+        gate.set()
@@ -0,0 +1,35 @@
+# pylint: disable-msg=C0103
+import time
+import unittest
+from bfxtelegram.digest import Digest, MAX_MESSAGE_LENGTH
+
+
+class DigestTests(unittest.TestCase):
+
+    def setUp(self):
+        self.sent = []
+        self.digest = Digest(lambda chat_id, text: self.sent.append((chat_id, text)))
+
+    def test_one_message_per_interval(self):
+        self.digest.add(1, 0.1, "<pre>te msg</pre>")
+        self.digest.add(1, 0.1, "<pre>wu USD 10</pre>", key=('wu', 'exchange', 'USD'))
+        self.digest.add(1, 0.1, "<pre>wu USD 20</pre>", key=('wu', 'exchange', 'USD'))
+        self.digest.add(2, 0.1, "<pre>on msg</pre>")
+        time.sleep(0.3)
+        self.assertEqual(len(self.sent), 2)
+        text = dict(self.sent)[1]
+        self.assertIn("3 updates", text)
+        self.assertIn("te msg", text)
+        self.assertIn("USD 20", text)
+        self.assertNotIn("USD 10", text)
+
+    def test_flush_without_pending(self):
+        self.digest.flush(1)
+        self.assertEqual(self.sent, [])
+
+    def test_combine_splits_long_digests(self):
+        texts = ["<pre>" + "x" * 1000 + "</pre>" for _ in range(10)]
+        messages = Digest.combine("<b>digest</b>", texts)
+        self.assertGreater(len(messages), 1)
+        self.assertTrue(all(len(message) <= MAX_MESSAGE_LENGTH for message in messages))
+        self.assertEqual(sum(message.count("<pre>") for message in messages), 10)
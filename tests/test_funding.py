@@ -0,0 +1,58 @@
+# pylint: disable-msg=C0103
+import unittest
+from bfxtelegram.funding import FundingBook, DAY_MS
+from tests.conftest import FUNDING_OFFERS, FUNDING_CREDITS, FUNDING_LOANS
+
+
+class FundingBookTests(unittest.TestCase):
+
+    def setUp(self):
+        self.book = FundingBook()
+        self.book.update('fos', FUNDING_OFFERS)
+        self.book.update('fcs', FUNDING_CREDITS)
+        self.book.update('fls', FUNDING_LOANS)
+
+    def test_snapshot_totals(self):
+        count, amount, rate, expires = self.book.totals('offers')['fUSD']
+        self.assertEqual(count, 2)
+        self.assertEqual(amount, 4000)
+        self.assertAlmostEqual(rate, 0.00045)
+        self.assertIsNone(expires)
+
+    def test_expiry(self):
+        expires = self.book.totals('loans')['fBTC'][3]
+        self.assertEqual(expires, 1537259985000 + 7 * DAY_MS)
+
+    def test_update_and_close(self):
+        updated = list(FUNDING_OFFERS[0])
+        updated[4] = 2000
+        self.book.update('fou', updated)
+        self.assertEqual(self.book.totals('offers')['fUSD'][1], 5000)
+
+        self.book.update('foc', FUNDING_OFFERS[0])
+        self.book.update('foc', FUNDING_OFFERS[1])
+        self.assertNotIn('fUSD', self.book.totals('offers'))
+
+    def test_snapshot_replaces_book(self):
+        self.book.update('fcc', FUNDING_CREDITS[0])
+        self.assertEqual(self.book.totals('credits'), {})
+        self.book.update('fcs', FUNDING_CREDITS)
+        self.assertIn('fUSD', self.book.totals('credits'))
+        self.book.update('fcs', [])
+        self.assertEqual(self.book.totals('credits'), {})
+
+    def test_summary(self):
+        summary = self.book.summary()
+        self.assertIn("offers", summary)
+        self.assertIn("USD", summary)
+        self.assertIn("next expiry", summary)
+        self.assertEqual(FundingBook().summary(), "no funding offers, credits or loans")
+
+    def test_entry_moves_symbol(self):
+        moved = list(FUNDING_OFFERS[0])
+        moved[1] = 'fBTC'
+        self.book.update('fou', moved)
+        self.book.update('fos', FUNDING_OFFERS + [moved])
+        totals = self.book.totals('offers')
+        self.assertEqual(totals['fBTC'][0], 1)
+        self.assertEqual(totals['fUSD'][0], 1)
@@ -0,0 +1,100 @@
+# pylint: disable-msg=C0103
+import time
+import threading
+import unittest
+from unittest import mock
+from telegram.error import BadRequest, RetryAfter
+from bfxtelegram.delivery import Delivery
+from bfxtelegram.livepanel import LivePanel
+
+KEY = ('pu', 'tBTCUSD')
+
+
+class LivePanelTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tbot = mock.Mock()
+        self.message_ids = iter(range(100, 200))
+        self.tbot.send_message.side_effect = (
+            lambda chat_id, text, parse_mode: mock.Mock(message_id=next(self.message_ids))
+        )
+        self.panel = LivePanel(self.tbot, interval=0.2)
+
+    def edited_texts(self):
+        return [edit[0][0] for edit in self.tbot.edit_message_text.call_args_list]
+
+    def test_throttled_edit_flushes_last_text(self):
+        self.panel.publish(1, KEY, "pl 1")
+        self.panel.publish(1, KEY, "pl 2")
+        self.panel.publish(1, KEY, "pl 3")
+        self.tbot.send_message.assert_called_once()
+        self.tbot.edit_message_text.assert_not_called()
+        time.sleep(0.4)
+        self.assertEqual(self.edited_texts(), ["pl 3"])
+        self.tbot.pin_chat_message.assert_called_once_with(1, 100, disable_notification=True)
+
+    def test_edit_after_interval(self):
+        self.panel.publish(1, KEY, "pl 1")
+        time.sleep(0.25)
+        self.panel.publish(1, KEY, "pl 2")
+        self.assertEqual(self.edited_texts(), ["pl 2"])
+
+    def test_unchanged_text_is_not_edited(self):
+        self.panel.publish(1, KEY, "pl 1")
+        time.sleep(0.25)
+        self.panel.publish(1, KEY, "pl 1")
+        time.sleep(0.25)
+        self.tbot.edit_message_text.assert_not_called()
+
+    def test_deleted_panel_is_recreated(self):
+        self.panel.publish(1, KEY, "pl 1")
+        self.tbot.edit_message_text.side_effect = BadRequest("Message to edit not found")
+        time.sleep(0.25)
+        self.panel.publish(1, KEY, "pl 2")
+        self.assertEqual(self.tbot.send_message.call_count, 2)
+        self.assertEqual(self.tbot.send_message.call_args[1]["text"], "pl 2")
+        self.assertEqual(self.panel.panels[(1, KEY)]["message_id"], 101)
+
+    def test_concurrent_publish_creates_one_panel(self):
+        sending = threading.Event()
+        release = threading.Event()
+
+        def slow_send(chat_id, text, parse_mode):
+            sending.set()
+            release.wait(1)
+            return mock.Mock(message_id=100)
+        self.tbot.send_message.side_effect = slow_send
+        first = threading.Thread(target=self.panel.publish, args=(1, KEY, "pl 1"))
+        first.start()
+        sending.wait(1)
+        self.panel.publish(1, KEY, "pl 2")
+        release.set()
+        first.join()
+        self.tbot.send_message.assert_called_once()
+        # the text published during the creation is applied after the interval
+        time.sleep(0.4)
+        self.assertEqual(self.edited_texts(), ["pl 2"])
+
+    def test_close_deletes_the_panel(self):
+        self.panel.publish(1, KEY, "pl 1")
+        self.panel.publish(1, KEY, "pl 2")
+        self.panel.close(1, KEY)
+        self.tbot.delete_message.assert_called_once_with(1, 100)
+        self.assertNotIn((1, KEY), self.panel.panels)
+        time.sleep(0.3)
+        self.tbot.edit_message_text.assert_not_called()
+        self.panel.close(1, KEY)
+        self.tbot.delete_message.assert_called_once()
+
+    def test_calls_go_through_delivery(self):
+        delivery = Delivery(mock.Mock(), workers=2, global_rate=1000, chat_rate=1000)
+        panel = LivePanel(self.tbot, interval=0.2, submit=delivery.submit)
+        self.tbot.send_message.side_effect = iter([RetryAfter(0.1), mock.Mock(message_id=100)])
+        panel.publish(1, KEY, "pl 1")
+        # the reservation is kept during the pause, no second panel is created
+        panel.publish(1, KEY, "pl 2")
+        self.assertTrue(delivery.join(timeout=2))
+        self.assertEqual(self.tbot.send_message.call_count, 2)
+        time.sleep(0.4)
+        self.assertTrue(delivery.join(timeout=2))
+        self.assertEqual(self.edited_texts(), ["pl 2"])
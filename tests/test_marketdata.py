@@ -0,0 +1,42 @@
+# pylint: disable-msg=C0103
+import unittest
+from bfxtelegram.marketdata import MarketData
+from tests.conftest import CANDLES_DATA
+
+TRADEPAIR = "tIOTUSD"
+
+
+class MarketDataTests(unittest.TestCase):
+
+    def setUp(self):
+        self.market_data = MarketData()
+        self.market_data.update('candles', TRADEPAIR, [CANDLES_DATA])
+
+    def test_candles_snapshot(self):
+        self.assertEqual(
+            self.market_data.candles_list(TRADEPAIR, 120),
+            CANDLES_DATA[:120]
+        )
+        self.assertIsNone(self.market_data.candles_list(TRADEPAIR, 1000))
+
+    def test_candle_update(self):
+        newest = [CANDLES_DATA[0][0] + 3600000, 0.5378, 0.54, 0.541, 0.537, 1000.0]
+        self.market_data.update('candles', TRADEPAIR, [newest])
+        self.assertEqual(self.market_data.candles_list(TRADEPAIR, 2), [newest, CANDLES_DATA[0]])
+
+    def test_trades(self):
+        self.assertIsNone(self.market_data.last_trade(TRADEPAIR))
+        self.market_data.update('trades', TRADEPAIR, [[[1, 1537259985000, 100, 0.5378]]])
+        self.market_data.update('trades', TRADEPAIR, ['te', [2, 1537259986000, -50, 0.5377]])
+        self.assertEqual(self.market_data.last_trade(TRADEPAIR)[0], 2)
+
+    def test_trade_kept_once(self):
+        self.market_data.update('trades', TRADEPAIR, [[[1, 1537259985000, 100, 0.5378]]])
+        self.market_data.update('trades', TRADEPAIR, ['te', [2, 1537259986000, -50, 0.5377]])
+        self.market_data.update('trades', TRADEPAIR, ['tu', [2, 1537259986000, -50, 0.5377]])
+        self.assertEqual([trade[0] for trade in self.market_data.trades[TRADEPAIR]], [2, 1])
+
+    def test_clear(self):
+        self.market_data.update('ticker', TRADEPAIR, [[0.53, 1, 0.54, 1, 0, 0, 0.5378, 1, 1, 1]])
+        self.market_data.clear('ticker', TRADEPAIR)
+        self.assertIsNone(self.market_data.ticker(TRADEPAIR))
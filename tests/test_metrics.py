@@ -0,0 +1,67 @@
+# pylint: disable-msg=C0103
+import json
+import unittest
+import urllib.request
+from urllib.error import HTTPError
+from bfxtelegram.stats import Stats
+from bfxtelegram.metrics import render, MetricsServer
+from bfxtelegram.readiness import READINESS, READY
+
+
+class MetricsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.stats = Stats()
+        self.stats.observe("rest ticker", 0.25)
+        self.stats.observe("render graph", 1.5)
+        self.stats.increment("ws_frames", "pu")
+        self.stats.increment("ws_reconnects")
+        self.stats.increment("errors", "telegram send")
+        self.stats.gauge("delivery_queue_depth", lambda: 3)
+
+    def test_render(self):
+        text = render(self.stats)
+        self.assertIn('bfxtelegram_rest_seconds_count{endpoint="ticker"} 1', text)
+        self.assertIn('bfxtelegram_rest_seconds{endpoint="ticker",quantile="0.99"} 0.25', text)
+        self.assertIn('bfxtelegram_latency_seconds_sum{stage="render graph"} 1.5', text)
+        self.assertIn('bfxtelegram_ws_frames_total{type="pu"} 1', text)
+        self.assertIn('bfxtelegram_ws_reconnects_total 1', text)
+        self.assertIn('bfxtelegram_errors_total{stage="telegram send"} 1', text)
+        self.assertIn('bfxtelegram_delivery_queue_depth 3', text)
+
+    def test_server(self):
+        server = MetricsServer(0)
+        server.start()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        try:
+            with urllib.request.urlopen(f"{url}/metrics") as response:
+                self.assertEqual(response.status, 200)
+                self.assertIn("text/plain", response.headers["Content-Type"])
+            with self.assertRaises(HTTPError):
+                urllib.request.urlopen(f"{url}/other")
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_health(self):
+        server = MetricsServer(0)
+        server.start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/health"
+        try:
+            READINESS.add("test stage")
+            with self.assertRaises(HTTPError) as raised:
+                urllib.request.urlopen(url)
+            self.assertEqual(raised.exception.code, 503)
+            health = json.loads(raised.exception.read().decode())
+            self.assertFalse(health["ready"])
+            self.assertEqual(health["stages"]["test stage"]["state"], "pending")
+            for name in READINESS.snapshot():
+                READINESS.set(name, READY)
+            with urllib.request.urlopen(url) as response:
+                self.assertEqual(response.status, 200)
+                self.assertTrue(json.loads(response.read().decode())["ready"])
+        finally:
+            with READINESS.lock:
+                READINESS.stages.pop("test stage", None)
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,56 @@
+# pylint: disable-msg=C0103
+import zlib
+import unittest
+from bfxtelegram.orderbook import OrderBook, checksum_number
+from tests.conftest import BOOK_SNAPSHOT
+
+
+def signed_crc32(text):
+    checksum = zlib.crc32(text.encode('utf8'))
+    return checksum - (1 << 32) if checksum >= (1 << 31) else checksum
+
+
+class OrderBookTests(unittest.TestCase):
+
+    def setUp(self):
+        self.book = OrderBook()
+        self.book.snapshot(BOOK_SNAPSHOT)
+
+    def test_sorted_levels(self):
+        self.assertEqual(self.book.bid_prices, [-0.5385, -0.5384, -0.5383])
+        self.assertEqual(self.book.ask_prices, [0.5387, 0.5388])
+        self.assertTrue(self.book.synced.is_set())
+
+    def test_updates(self):
+        self.book.update(0.5386, 1, -10)
+        self.book.update(0.5384, 0, 1)
+        self.book.update(0.5388, 0, -1)
+        self.assertEqual(self.book.bid_prices, [-0.5385, -0.5383])
+        self.assertEqual(self.book.ask_prices, [0.5386, 0.5387])
+        self.assertEqual(self.book.asks[0.5386], -10)
+
+    def test_checksum(self):
+        expected = signed_crc32(
+            "0.5385:1500.5:0.5387:-250:0.5384:700:0.5388:-3000.25:0.5383:0.00001"
+        )
+        self.assertEqual(self.book.checksum(), expected)
+        self.assertTrue(self.book.verify(expected))
+        self.book.update(0.5384, 1, 701)
+        self.assertFalse(self.book.verify(expected))
+
+    def test_checksum_number(self):
+        self.assertEqual(checksum_number(0.00001), "0.00001")
+        self.assertEqual(checksum_number(1e-7), "1e-7")
+        self.assertEqual(checksum_number(6500.0), "6500")
+        self.assertEqual(checksum_number(-250), "-250")
+
+    def test_orders(self):
+        orders = self.book.orders()
+        self.assertEqual(orders[0], {'price': '0.5387', 'amount': '250'})
+        self.assertEqual(orders[2], {'price': '0.5385', 'amount': '1500.5'})
+        self.assertEqual(len(orders), len(BOOK_SNAPSHOT))
+
+    def test_clear(self):
+        self.book.clear()
+        self.assertFalse(self.book.synced.is_set())
+        self.assertEqual(self.book.orders(), [])
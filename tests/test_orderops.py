@@ -0,0 +1,81 @@
+# pylint: disable-msg=C0103
+import unittest
+from unittest import mock
+from bfxtelegram.bfxwss import Bfxwss
+from bfxtelegram.orderops import OrderOps, MAX_MULTI_OPS
+from bfxtelegram.stats import STATS
+
+
+class OrderOpsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.frames = []
+        self.ops = OrderOps(self.frames.append, window=60)
+
+    def test_single_operation_frame(self):
+        self.ops.cancel_order(1, 55)
+        self.ops.flush()
+        self.assertEqual(self.frames, [[0, 'oc', None, {'id': 55}]])
+
+    def test_operations_share_multi_frame(self):
+        cid = self.ops.new_order(1, "EXCHANGE LIMIT", "tIOTUSD", -100, 0.5)
+        self.ops.update_order(2, 55, price=0.6)
+        self.ops.cancel_order(1, 56)
+        self.ops.flush()
+        self.assertEqual(len(self.frames), 1)
+        _chan, op, _none, operations = self.frames[0]
+        self.assertEqual(op, 'ox_multi')
+        self.assertEqual([operation[0] for operation in operations], ['on', 'ou', 'oc'])
+        self.assertEqual(operations[0][1]['cid'], cid)
+        self.assertEqual(operations[0][1]['amount'], "-100")
+        self.assertEqual(operations[1][1], {'id': 55, 'price': "0.6"})
+
+    def test_multi_frame_limit(self):
+        for order_id in range(MAX_MULTI_OPS + 1):
+            self.ops.cancel_order(1, order_id)
+        self.ops.flush()
+        self.assertEqual([len(frame[3]) for frame in self.frames], [MAX_MULTI_OPS, 1])
+
+    def test_reply_correlation(self):
+        replies = STATS.snapshot()[0].get("order on", (0,))[0]
+        cid = self.ops.new_order(7, "EXCHANGE LIMIT", "tIOTUSD", 100, 0.5)
+        self.ops.cancel_order(8, 55)
+        self.ops.flush()
+        order = [1234, None, cid, 'tIOTUSD']
+        chat_id, latency = self.ops.reply('on-req', order)
+        self.assertEqual(chat_id, 7)
+        self.assertGreaterEqual(latency, 0)
+        self.assertEqual(self.ops.reply('oc-req', [55, None, 999])[0], 8)
+        # replies are matched once, orders placed elsewhere are not matched
+        self.assertIsNone(self.ops.reply('on-req', order))
+        self.assertIsNone(self.ops.reply('ou-req', [77]))
+        self.assertEqual(STATS.snapshot()[0]["order on"][0], replies + 1)
+
+    def test_unique_client_ids(self):
+        cids = [self.ops.new_order(1, "LIMIT", "tIOTUSD", 1, 1) for _ in range(5)]
+        self.assertEqual(len(set(cids)), 5)
+
+    def test_no_window_sends_immediately(self):
+        ops = OrderOps(self.frames.append, window=0)
+        ops.cancel_order(1, 55)
+        self.assertEqual(len(self.frames), 1)
+
+    def test_disconnected_socket_fails_fast(self):
+        failed = []
+        ops = OrderOps(lambda frame: False, window=60,
+                       failed=lambda chat_id, op, latency: failed.append((chat_id, op)))
+        cid = ops.new_order(7, "EXCHANGE LIMIT", "tIOTUSD", 100, 0.5)
+        ops.cancel_order(8, 55)
+        ops.flush()
+        self.assertEqual(failed, [(7, 'on'), (8, 'oc')])
+        self.assertEqual(ops.pending, {})
+        self.assertIsNone(ops.reply('on-req', [None, None, cid]))
+
+    def test_disconnected_socket_replies_to_chat(self):
+        order_reply = mock.Mock()
+        wss = Bfxwss(mock.Mock(), coalesce_window=0, order_reply=order_reply, autostart=False)
+        wss.order_ops.new_order(7, "EXCHANGE LIMIT", "tIOTUSD", 100, 0.5)
+        wss.order_ops.flush()
+        chat_id, msg_type, notification, _latency = order_reply.call_args[0]
+        self.assertEqual((chat_id, msg_type, notification[6]), (7, 'on-req', "ERROR"))
+        self.assertIn("not connected", notification[7])
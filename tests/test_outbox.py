@@ -0,0 +1,31 @@
+# pylint: disable-msg=C0103
+import os
+import tempfile
+import unittest
+from bfxtelegram.outbox import Outbox
+
+
+class OutboxTests(unittest.TestCase):
+
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), "data", "outbox.sqlite")
+
+    def test_pending_in_order_after_reopen(self):
+        outbox = Outbox(self.path)
+        first = outbox.add(1, "te", "fill")
+        outbox.add(2, "pu", "position")
+        outbox.add(1, None, "digest")
+        outbox.failed(first)
+        outbox.close()
+        pending = Outbox(self.path).pending()
+        self.assertEqual(pending, [
+            (first, 1, "te", "fill", 1),
+            (first + 1, 2, "pu", "position", 0),
+            (first + 2, 1, None, "digest", 0),
+        ])
+
+    def test_remove(self):
+        outbox = Outbox(self.path)
+        outbox_id = outbox.add(1, "te", "fill")
+        outbox.remove(outbox_id)
+        self.assertEqual(outbox.pending(), [])
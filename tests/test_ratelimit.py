@@ -0,0 +1,50 @@
+# pylint: disable-msg=C0103
+import time
+import threading
+import unittest
+from bfxtelegram.ratelimit import RestScheduler, HIGH, LOW
+
+
+class RestSchedulerTests(unittest.TestCase):
+
+    def start(self, scheduler, endpoint, lane, done):
+        def run():
+            scheduler.acquire(endpoint, lane)
+            done.append(lane)
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def test_high_lane_first(self):
+        # 2 calls per second once the burst of 120 is spent
+        scheduler = RestScheduler({}, 6000, 120, 0)
+        for _index in range(120):
+            scheduler.acquire("ticker", LOW)
+        done = []
+        low = self.start(scheduler, "ticker", LOW, done)
+        time.sleep(0.05)
+        high = self.start(scheduler, "place_order", HIGH, done)
+        low.join(5)
+        high.join(5)
+        self.assertEqual(done, [HIGH, LOW])
+
+    def test_reserved_for_high_lane(self):
+        scheduler = RestScheduler({}, 6000, 60, 59)
+        scheduler.acquire("candles", LOW)
+        done = []
+        low = self.start(scheduler, "candles", LOW, done)
+        started = time.monotonic()
+        scheduler.acquire("delete_order", HIGH)
+        self.assertLess(time.monotonic() - started, 0.1)
+        self.assertEqual(done, [])
+        low.join(5)
+        self.assertEqual(done, [LOW])
+
+    def test_endpoint_rate(self):
+        scheduler = RestScheduler({"ticker": 600}, 6000, 6000, 0)
+        for _index in range(600):
+            scheduler.acquire("ticker", LOW)
+        started = time.monotonic()
+        scheduler.acquire("ticker", LOW)
+        scheduler.acquire("candles", LOW)
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
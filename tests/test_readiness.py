@@ -0,0 +1,71 @@
+# pylint: disable-msg=C0103
+import unittest
+from unittest import mock
+from bfxtelegram.readiness import Readiness, PENDING, STARTING, READY, FAILED
+from bfxtelegram.bfxwss import Bfxwss
+
+
+class ReadinessTests(unittest.TestCase):
+
+    def setUp(self):
+        self.readiness = Readiness()
+        self.readiness.add("userdata", "websocket main")
+
+    def test_pending_stages(self):
+        self.assertEqual(self.readiness.state("userdata"), PENDING)
+        self.assertFalse(self.readiness.is_ready())
+
+    def test_run(self):
+        self.assertEqual(self.readiness.run("userdata", dict, a=1), {'a': 1})
+        self.assertEqual(self.readiness.state("userdata"), READY)
+        self.assertTrue(self.readiness.is_ready("userdata"))
+        # the socket is still pending
+        self.assertFalse(self.readiness.is_ready())
+        self.readiness.set("websocket main", READY)
+        self.assertTrue(self.readiness.is_ready())
+
+    def test_run_failed(self):
+        with self.assertRaises(OSError):
+            self.readiness.run("userdata", mock.Mock(side_effect=OSError("disk full")))
+        stage = self.readiness.snapshot()["userdata"]
+        self.assertEqual(stage["state"], FAILED)
+        self.assertEqual(stage["detail"], "disk full")
+        self.assertIn("disk full", self.readiness.report())
+
+    def test_unknown_stage(self):
+        self.assertIsNone(self.readiness.state("symbols"))
+        self.assertFalse(self.readiness.is_ready("symbols"))
+
+    def test_report(self):
+        self.readiness.set("websocket main", STARTING)
+        report = self.readiness.report().splitlines()
+        self.assertEqual(report[0], "readiness (state, seconds)")
+        self.assertTrue(report[1].startswith("userdata pending"))
+        self.assertTrue(report[2].startswith("websocket main starting"))
+
+
+class SocketAuthTests(unittest.TestCase):
+
+    def setUp(self):
+        self.states = []
+        self.wss = Bfxwss(
+            mock.Mock(),
+            coalesce_window=0,
+            auth_changed=lambda state, detail: self.states.append((state, detail)),
+            autostart=False
+        )
+
+    def test_auth_ok(self):
+        self.wss._auth_messages({'event': "auth", 'status': "OK", 'chanId': 0})
+        self.assertEqual(self.states, [(READY, None)])
+
+    def test_auth_failed(self):
+        self.wss._auth_messages({'event': "auth", 'status': "FAILED", 'msg': "apikey: invalid"})
+        self.assertEqual(self.states, [(FAILED, "apikey: invalid")])
+
+    def test_reconnect_starts_again(self):
+        with mock.patch.object(self.wss, "close"), \
+                mock.patch.object(self.wss, "authenticate"), \
+                mock.patch.object(self.wss, "_start_timers"):
+            self.wss.reconnect()
+        self.assertEqual(self.states, [(STARTING, None)])
@@ -0,0 +1,79 @@
+# pylint: disable-msg=C0103
+import os
+import gzip
+import tempfile
+import unittest
+from unittest import mock
+from bfxtelegram.bfxwss import Bfxwss
+from bfxtelegram.recorder import FrameRecorder, read_frames, replay
+
+
+class FakeWss:
+    def __init__(self):
+        self.frames = []
+
+    def _auth_messages(self, data):
+        self.frames.append(("auth", data))
+
+    def _public_messages(self, channel, symbol, data):
+        self.frames.append((channel, symbol, data))
+
+
+class RecorderTests(unittest.TestCase):
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".jsonl.gz")
+        os.close(handle)
+        os.remove(self.path)
+        recorder = FrameRecorder(self.path)
+        recorder.record("auth", [0, 'hb'])
+        recorder.record("book_tIOTUSD", [5, [0.5385, 2, 1500.5]])
+        recorder.close()
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_read_frames(self):
+        frames = list(read_frames(self.path))
+        self.assertEqual(len(frames), 2)
+        self.assertEqual(frames[0][1:], ["auth", [0, 'hb']])
+
+    def test_replay(self):
+        wss = FakeWss()
+        frames, _elapsed = replay(self.path, wss, speed=0)
+        self.assertEqual(frames, 2)
+        self.assertEqual(wss.frames[1], ("book", "tIOTUSD", [5, [0.5385, 2, 1500.5]]))
+
+    def test_replay_book_conf(self):
+        recorder = FrameRecorder(self.path)
+        # the checksum conf ack arrives before the book subscription
+        recorder.record("book_tIOTUSD", {'event': "conf", 'status': "OK", 'flags': 131072})
+        recorder.record("book_tIOTUSD", {'event': "subscribed", 'channel': "book", 'chanId': 5})
+        recorder.record("book_tIOTUSD", [5, [[0.5385, 2, 1500.5], [0.5390, 1, -300]]])
+        recorder.record("book_tIOTUSD", [5, [0.5385, 1, 1000]])
+        recorder.close()
+        wss = Bfxwss(mock.Mock(), coalesce_window=0, autostart=False)
+        frames, _elapsed = replay(self.path, wss, speed=0)
+        self.assertEqual(frames, 6)
+        orders = wss.market_data.book_orders('tIOTUSD')
+        self.assertIn({'price': '0.5385', 'amount': '1000'}, orders)
+
+    def test_read_truncated_recording(self):
+        recorder = FrameRecorder(self.path)
+        recorder.record("auth", [0, 'hb'])
+        recorder.flush()
+        # a crash while the next member is written
+        recorder.file.write(gzip.compress(b'[1, "auth", [0, "hb"]]\n')[:-10])
+        recorder.file.close()
+        frames = list(read_frames(self.path))
+        self.assertEqual(len(frames), 3)
+
+    def test_unclosed_recorder_is_readable(self):
+        recorder = FrameRecorder(self.path)
+        with mock.patch('bfxtelegram.recorder.FLUSH_FRAMES', 2):
+            for _ in range(5):
+                recorder.record("auth", [0, 'hb'])
+        # the fifth frame is still buffered
+        self.assertEqual(len(list(read_frames(self.path))), 6)
+        recorder.close()
+        self.assertEqual(len(list(read_frames(self.path))), 7)
@@ -0,0 +1,156 @@
+# pylint: disable-msg=C0103
+import json
+import time
+import threading
+import unittest
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib3.util.retry import Retry
+from bitfinex.rest.restv2 import BitfinexException
+from bfxtelegram.rest import Transport, PooledClient2, RestCache, CachedClient, INVALIDATES
+from bfxtelegram.ratelimit import RestScheduler, LOW
+from bfxtelegram.accounts import Account
+
+
+class FakeBitfinex(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # path -> status codes answered before 200
+    failures = {}
+    hits = {}
+
+    def answer(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        path = self.path.split('?')[0]
+        FakeBitfinex.hits[path] = FakeBitfinex.hits.get(path, 0) + 1
+        failures = FakeBitfinex.failures.get(path, [])
+        status = failures.pop(0) if failures else 200
+        body = json.dumps([path]).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = answer
+    do_POST = answer
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TransportTests(unittest.TestCase):
+
+    def setUp(self):
+        FakeBitfinex.failures = {}
+        FakeBitfinex.hits = {}
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeBitfinex)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        retries = Retry(total=2, status=2, backoff_factor=0, status_forcelist=(503,),
+                        allowed_methods=frozenset(["GET"]), raise_on_status=False)
+        self.transport = Transport(retries=retries)
+        self.client = PooledClient2(transport=self.transport)
+        self.client.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connection_reused(self):
+        for _index in range(3):
+            self.assertEqual(self.client._get("v2/ticker/tBTCUSD"), ["/v2/ticker/tBTCUSD"])
+        self.assertEqual(self.transport.connection_stats(), (1, 3))
+
+    def test_only_get_is_retried(self):
+        FakeBitfinex.failures = {"/v2/ticker/tBTCUSD": [503], "/v2/auth/w/order/submit": [503]}
+        self.assertEqual(self.client._get("v2/ticker/tBTCUSD"), ["/v2/ticker/tBTCUSD"])
+        self.client.key = self.client.secret = "secret"
+        with self.assertRaises(BitfinexException):
+            self.client._post("v2/auth/w/order/submit", "{}")
+        self.assertEqual(FakeBitfinex.hits, {"/v2/ticker/tBTCUSD": 2, "/v2/auth/w/order/submit": 1})
+
+
+class RestCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = []
+        self.cache = RestCache()
+        self.client = CachedClient(self, "v2", "main", cache=self.cache)
+
+    def ticker(self, symbol):
+        self.calls.append(("ticker", symbol))
+        time.sleep(0.05)
+        return [symbol, len(self.calls)]
+
+    def active_orders(self):
+        self.calls.append(("active_orders",))
+        return [len(self.calls)]
+
+    def place_order(self, *args):
+        self.calls.append(("place_order",) + args)
+        return {"id": 1}
+
+    def test_read_through_and_coalesced(self):
+        threads = [threading.Thread(target=self.client.ticker, args=("tBTCUSD",))
+                   for _index in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.client.ticker("tBTCUSD"), ["tBTCUSD", 1])
+        self.assertEqual(self.client.ticker("tETHUSD"), ["tETHUSD", 2])
+        self.assertEqual(len(self.calls), 2)
+
+    def test_expired(self):
+        self.cache.get(("v2", None, "ticker", (), ()), 0, lambda: self.ticker("old"))
+        self.assertEqual(self.client.ticker("old"), ["old", 2])
+
+    def test_trading_invalidates_account_state(self):
+        self.assertEqual(self.client.active_orders(), [1])
+        self.assertEqual(self.client.active_orders(), [1])
+        self.client.place_order(1, 100)
+        self.assertEqual(self.client.active_orders(), [3])
+        self.cache.invalidate("main", INVALIDATES["oc"])
+        self.assertEqual(self.client.active_orders(), [4])
+        # public endpoints are not dropped by account changes
+        self.client.ticker("tBTCUSD")
+        self.cache.invalidate("main", INVALIDATES["te"])
+        self.client.ticker("tBTCUSD")
+        self.assertEqual(self.calls[-1], ("ticker", "tBTCUSD"))
+        self.assertEqual(len(self.calls), 5)
+
+
+
+class ScheduledAccountTests(unittest.TestCase):
+
+    def setUp(self):
+        self.account = Account("main", "key", "secret", mock.Mock())
+        # 10 calls per second once the burst is spent
+        scheduler = RestScheduler({}, 6000, 600, 0)
+        for _index in range(600):
+            scheduler.acquire("ticker", LOW)
+        # the calls of both clients land in order on the same mock
+        self.bitfinex = mock.Mock()
+        for client in (self.account.btfx_client, self.account.btfx_client2):
+            client.cache = RestCache()
+            client.client.scheduler = scheduler
+            client.client.client = self.bitfinex
+
+    def start(self, method, *args):
+        thread = threading.Thread(target=method, args=args, daemon=True)
+        thread.start()
+        return thread
+
+    def test_trading_read_overtakes_charts(self):
+        threads = [
+            self.start(self.account.btfx_client2.candles, "1h", f"t{symbol}", "hist")
+            for symbol in ("BTCUSD", "ETHUSD", "IOTUSD")
+        ]
+        threads.append(self.start(self.account.btfx_client2.ticker, "tBTCUSD"))
+        time.sleep(0.05)
+        threads.append(self.start(self.account.btfx_client.active_orders))
+        for thread in threads:
+            thread.join(5)
+        calls = [name for name, _args, _kwargs in self.bitfinex.method_calls]
+        self.assertEqual(len(calls), 5)
+        self.assertEqual(calls[0], "active_orders")
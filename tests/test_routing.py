@@ -0,0 +1,35 @@
+# pylint: disable-msg=C0103
+import unittest
+from bfxtelegram.routing import SubscriptionIndex
+
+
+class SubscriptionIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.userdata = {
+            1: {"authenticated": "yes", "disabled_ws_message": ["pu"]},
+            2: {"authenticated": "yes", "disabled_ws_message": [], "accounts": ["sub1"]},
+            3: {"authenticated": "no", "disabled_ws_message": []}
+        }
+        self.index = SubscriptionIndex(self.userdata)
+
+    def test_recipients(self):
+        self.assertEqual(self.index.recipients("main", "wu"), (1,))
+        self.assertEqual(self.index.recipients("main", "pu"), ())
+        self.assertEqual(self.index.recipients("sub1", "pu"), (2,))
+
+    def test_update_chat(self):
+        self.userdata[1]["disabled_ws_message"].remove("pu")
+        self.userdata[3]["authenticated"] = "yes"
+        self.index.update_chat(1)
+        self.index.update_chat(3)
+        self.assertEqual(sorted(self.index.recipients("main", "pu")), [1, 3])
+
+        self.userdata[2]["accounts"] = ["main", "sub1"]
+        self.userdata[1]["authenticated"] = "no"
+        self.index.update_chat(2)
+        self.index.update_chat(1)
+        self.assertEqual(sorted(self.index.recipients("main", "wu")), [2, 3])
+
+    def test_unknown_message_type(self):
+        self.assertEqual(self.index.recipients("main", "other"), (1,))
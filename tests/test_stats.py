@@ -0,0 +1,71 @@
+# pylint: disable-msg=C0103
+import unittest
+from bfxtelegram.stats import Stats, Histogram, STATS
+from bfxtelegram.rest import TimedClient
+
+
+class FakeClient:
+    symbols_list = ['iotusd']
+
+    def symbols(self):
+        return self.symbols_list
+
+    def ticker(self, symbol):
+        raise ValueError(symbol)
+
+
+class StatsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.stats = Stats()
+
+    def test_histogram_percentiles(self):
+        histogram = Histogram(samples=100)
+        for value in range(1, 201):
+            histogram.observe(value)
+        self.assertEqual(histogram.count, 200)
+        # only the last 100 samples are kept
+        self.assertEqual(histogram.percentiles(), [151, 196, 200])
+        self.assertEqual(Histogram().percentiles(), [0.0, 0.0, 0.0])
+
+    def test_timer_counts_errors(self):
+        with self.stats.timer("stage"):
+            pass
+        with self.assertRaises(KeyError):
+            with self.stats.timer("stage"):
+                raise KeyError("boom")
+        histograms, _counters = self.stats.snapshot()
+        self.assertEqual(histograms["stage"][0], 2)
+        self.assertEqual(self.stats.count("errors", "stage"), 1)
+
+    def test_counter_rate(self):
+        for _ in range(120):
+            self.stats.increment("ws_frames", "pu")
+        _histograms, counters = self.stats.snapshot()
+        count, rate = counters[("ws_frames", "pu")]
+        self.assertEqual(count, 120)
+        self.assertAlmostEqual(rate, 2.0)
+
+    def test_frame_age(self):
+        self.assertIsNone(self.stats.frame_age())
+        self.stats.frame_received()
+        self.assertGreaterEqual(self.stats.frame_age(), 0)
+        self.stats.frame_done()
+        self.assertIsNone(self.stats.frame_age())
+
+    def test_report(self):
+        self.stats.observe("telegram send", 0.2)
+        self.stats.increment("ws_frames", "wu")
+        self.stats.increment("errors", "telegram send")
+        report = self.stats.report()
+        self.assertIn("telegram send (1)", report)
+        self.assertIn("wu 1", report)
+        self.assertIn("errors\ntelegram send 1", report)
+
+    def test_timed_client(self):
+        client = TimedClient(FakeClient())
+        self.assertEqual(client.symbols(), ['iotusd'])
+        self.assertEqual(client.symbols_list, ['iotusd'])
+        with self.assertRaises(ValueError):
+            client.ticker("tIOTUSD")
+        self.assertGreaterEqual(STATS.count("errors", "rest ticker"), 1)
@@ -0,0 +1,75 @@
+# pylint: disable-msg=C0103
+import os
+import time
+import tempfile
+import unittest
+from bfxtelegram.symbols import SymbolRegistry
+
+DETAILS = [
+    {"pair": "btcusd", "price_precision": 5, "minimum_order_size": "0.002"},
+    {"pair": "ethbtc", "price_precision": 5, "minimum_order_size": "0.04"},
+    {"pair": "iotusd", "price_precision": 5, "minimum_order_size": "22.0"},
+]
+
+
+class SymbolRegistryTests(unittest.TestCase):
+
+    def setUp(self):
+        self.loads = 0
+        self.registry = SymbolRegistry(self.load, refresh_interval=0)
+
+    def load(self):
+        self.loads += 1
+        return DETAILS[:self.loads + 1]
+
+    def test_lookup(self):
+        self.assertIn("btcusd", self.registry)
+        self.assertIn("BTCUSD", self.registry)
+        self.assertNotIn("iotusd", self.registry)
+        self.assertEqual(list(self.registry), ["btcusd", "ethbtc"])
+        self.assertEqual(self.registry.currencies, {"btc", "usd", "eth"})
+        self.assertEqual(self.registry.minimum_order_size("ethbtc"), 0.04)
+        self.assertIsNone(self.registry.minimum_order_size("xrpusd"))
+
+    def test_refresh(self):
+        self.registry.refresh()
+        self.assertIn("iotusd", self.registry)
+        self.assertEqual(len(self.registry), 3)
+
+    def test_format_price(self):
+        self.assertEqual(self.registry.format_price("btcusd", 6543.21), "6543.2")
+        self.assertEqual(self.registry.format_price("ethbtc", 0.0712345), "0.071235")
+        self.assertEqual(self.registry.format_price("btcusd", -12.5), "-12.500")
+        self.assertEqual(self.registry.format_price("btcusd", 0), "0")
+
+    def test_suggestions(self):
+        self.assertEqual(self.registry.suggest("btcsud"), ["btcusd"])
+        self.assertIn("did you mean btcusd", self.registry.unknown_message("btcusdd"))
+        self.assertIn("pairs are written like", self.registry.unknown_message("zzz"))
+
+    def test_starts_from_snapshot(self):
+        snapshot_file = os.path.join(tempfile.mkdtemp(), "data", "symbols.json")
+        SymbolRegistry(lambda: DETAILS[:2], refresh_interval=0, snapshot_file=snapshot_file)
+        self.assertTrue(os.path.exists(snapshot_file))
+
+        def slow_load():
+            time.sleep(0.2)
+            return DETAILS
+        started = time.monotonic()
+        registry = SymbolRegistry(slow_load, refresh_interval=0, snapshot_file=snapshot_file)
+        self.assertLess(time.monotonic() - started, 0.1)
+        # the saved snapshot, then reconciled in the background
+        self.assertEqual(len(registry), 2)
+        self.assertEqual(registry.currencies, {"btc", "usd", "eth"})
+        time.sleep(0.4)
+        self.assertIn("iotusd", registry)
+        self.assertIn("iot", registry.currencies)
+
+    def test_unreadable_snapshot(self):
+        snapshot_file = os.path.join(tempfile.mkdtemp(), "symbols.json")
+        with open(snapshot_file, "w") as snapshot:
+            snapshot.write("{not json")
+        registry = SymbolRegistry(self.load, refresh_interval=0, snapshot_file=snapshot_file)
+        # loaded from bitfinex like without snapshot
+        self.assertEqual(self.loads, 2)
+        self.assertIn("btcusd", registry)
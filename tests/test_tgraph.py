@@ -62,3 +62,7 @@ class TgraphTests(unittest.TestCase):
         self.assertTrue(
             glob.glob('graph.png')
         )
+
+    def test_graph_without_orderbook(self):
+        cgraph = Tgraph(CANDLES_DATA, ACTIVE_ORDERS, None, SYMBOL)
+        self.assertIsNone(cgraph.build_active_orders_graph())
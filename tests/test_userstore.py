@@ -0,0 +1,46 @@
+# pylint: disable-msg=C0103
+import os
+import tempfile
+import unittest
+from unittest import mock
+from bfxtelegram.userstore import UserStore
+
+USERDATA = {
+    1: {"authenticated": "yes", "failed_auth": 0, "getbalance": ["iot", "usd", "btc"]},
+    -200: {"authenticated": "no", "failed_auth": 3}
+}
+
+
+class UserStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), "data", "users.sqlite")
+
+    def test_save_and_reopen(self):
+        store = UserStore(self.path, import_legacy=False)
+        store.save(1, USERDATA[1])
+        store.save(-200, USERDATA[-200])
+        store.save(1, dict(USERDATA[1], defaultpair="btcusd"))
+        store.close()
+        users = UserStore(self.path, import_legacy=False).load()
+        self.assertEqual(users[1]["defaultpair"], "btcusd")
+        self.assertEqual(users[-200], USERDATA[-200])
+        self.assertEqual(len(users), 2)
+
+    @mock.patch("bfxtelegram.userstore.utils.read_userdata", return_value=USERDATA)
+    def test_imports_legacy_users_once(self, read_userdata):
+        store = UserStore(self.path)
+        self.assertEqual(store.load(), USERDATA)
+        store.save(1, {"authenticated": "no", "failed_auth": 1})
+        store.close()
+        # the store is not empty anymore, the pickle is left alone
+        store = UserStore(self.path)
+        read_userdata.assert_called_once()
+        self.assertEqual(store.load()[1], {"authenticated": "no", "failed_auth": 1})
+
+    @mock.patch("bfxtelegram.userstore.utils.read_userdata", return_value={})
+    def test_open(self, _read_userdata):
+        store, users = UserStore.open(self.path)
+        self.assertIsInstance(store, UserStore)
+        self.assertEqual(store.count(), 0)
+        self.assertEqual(users, {})
@@ -2,7 +2,6 @@
 # C0103:Method name too long
 # pylint: disable=W0613,C0103
 
-import glob
 import unittest
 from bfxtelegram import utils
 from tests.conftest import BTFX_SYMBOLS, CURRENCIES, BALANCES
@@ -27,18 +26,6 @@ class UtilsTests(unittest.TestCase):
         userdata = utils.read_userdata()
         self.assertIsInstance(userdata, dict)
 
-    def test_save_userdata(self):
-        userdata = utils.read_userdata()
-        self.assertIsNone(
-            utils.save_userdata(userdata)
-        )
-        self.assertTrue(
-            glob.glob('data/usersdata.pickle')
-        )
-        self.assertTrue(
-            glob.glob('data/usersdata.json')
-        )
-
     def test_get_currencies(self):
         self.assertIsInstance(
             utils.get_currencies(BTFX_SYMBOLS),
@@ -0,0 +1,105 @@
+# pylint: disable-msg=C0103
+import json
+import threading
+import unittest
+import urllib.request
+from urllib.error import HTTPError
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from telegram import Bot
+from bfxtelegram.webhook import WebhookServer, SECRET_HEADER
+
+
+class FakeTelegram(BaseHTTPRequestHandler):
+    """
+        bot api answering setWebhook, post_update sends an update like telegram does
+    """
+    webhook = {}
+    methods = []
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        data = json.loads(self.rfile.read(length).decode('utf8') or "{}")
+        FakeTelegram.methods.append(self.path.rsplit("/", 1)[-1])
+        if self.path.endswith("/setWebhook"):
+            FakeTelegram.webhook = data
+        body = json.dumps({"ok": True, "result": True}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+    @classmethod
+    def post_update(cls, update, secret_token=None):
+        request = urllib.request.Request(
+            cls.webhook["url"],
+            data=json.dumps(update).encode(),
+            headers={
+                "Content-Type": "application/json",
+                SECRET_HEADER: secret_token or cls.webhook["secret_token"]
+            }
+        )
+        with urllib.request.urlopen(request) as response:
+            return response.status
+
+
+class FakeDispatcher:
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.updates = []
+        self.processed = threading.Event()
+
+    def process_update(self, update):
+        self.updates.append(update)
+        self.processed.set()
+
+
+class WebhookTests(unittest.TestCase):
+
+    def setUp(self):
+        self.telegram = HTTPServer(("127.0.0.1", 0), FakeTelegram)
+        threading.Thread(target=self.telegram.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{self.telegram.server_address[1]}/bot"
+        self.dispatcher = FakeDispatcher(Bot("123:token", base_url=base_url))
+        self.server = WebhookServer(0, "s3cret", self.dispatcher, "https://example.com/hook",
+                                    host="127.0.0.1")
+        self.server.start()
+        # telegram posts to the public url, the test posts straight to the receiver
+        FakeTelegram.webhook["url"] = f"http://127.0.0.1:{self.server.server_address[1]}/hook"
+
+    def tearDown(self):
+        for server in (self.server, self.telegram):
+            server.shutdown()
+            server.server_close()
+
+    def test_updates_reach_the_dispatcher(self):
+        self.assertEqual(FakeTelegram.webhook["secret_token"], "s3cret")
+        update = {"update_id": 7, "message": {
+            "message_id": 1, "date": 0, "chat": {"id": 42, "type": "private"}, "text": "/help"
+        }}
+        self.assertEqual(FakeTelegram.post_update(update), 200)
+        # the update is handled after telegram got its answer
+        self.assertTrue(self.dispatcher.processed.wait(2))
+        self.assertEqual(len(self.dispatcher.updates), 1)
+        self.assertEqual(self.dispatcher.updates[0].update_id, 7)
+        self.assertEqual(self.dispatcher.updates[0].message.text, "/help")
+
+    def test_wrong_secret_is_rejected(self):
+        with self.assertRaises(HTTPError) as context:
+            FakeTelegram.post_update({"update_id": 8}, secret_token="guess")
+        self.assertEqual(context.exception.code, 403)
+        self.assertEqual(self.dispatcher.updates, [])
+
+    def test_secret_is_required(self):
+        with self.assertRaises(ValueError):
+            WebhookServer(0, None, self.dispatcher, "https://example.com/hook")
+
+    def test_stop_deletes_the_webhook(self):
+        self.server.stop()
+        self.assertEqual(FakeTelegram.methods[-1], "deleteWebhook")
+        with self.assertRaises(OSError):
+            FakeTelegram.post_update({"update_id": 9})